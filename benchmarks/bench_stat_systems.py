@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark the stat-system registry against the old per-call path.
+
+The legacy path rebuilt a dict of lambdas and threshold lists on every
+!stats call and rolled one stat at a time with random.randint.
+
+Usage: python -m benchmarks.bench_stat_systems [iterations]
+"""
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bot.utils.stat_blocks import roll_stat_blocks
+from bot.utils.stat_systems import get_stat_system
+
+def _legacy_4d6_drop_lowest():
+    rolls = sorted([random.randint(1, 6) for _ in range(4)], reverse=True)
+    return {'total': sum(rolls[:3]), 'kept': rolls[:3], 'dropped': rolls[3]}
+
+def legacy_lookup(system: str):
+    """Per-call dict construction as done by the old roll_stats"""
+    stat_systems = {
+        "dnd": {"name": "D&D 5e Standard", "description": "4d6, drop lowest",
+                "method": lambda: _legacy_4d6_drop_lowest(), "rating_thresholds": [78, 72, 66, 60]},
+        "adnd": {"name": "AD&D 2e Method I", "description": "3d6 straight",
+                 "method": lambda: _legacy_4d6_drop_lowest(), "rating_thresholds": [72, 66, 60, 54]},
+        "pathfinder": {"name": "Pathfinder Point Buy Equivalent", "description": "4d6, drop lowest",
+                       "method": lambda: _legacy_4d6_drop_lowest(), "rating_thresholds": [78, 74, 70, 66]},
+        "heroic": {"name": "Heroic Array", "description": "2d6+6 for each stat",
+                   "method": lambda: _legacy_4d6_drop_lowest(), "rating_thresholds": [84, 78, 72, 66]},
+        "standard": {"name": "Standard Array", "description": "Fixed values",
+                     "method": lambda: _legacy_4d6_drop_lowest(), "rating_thresholds": [72, 72, 72, 72]},
+        "special": {"name": "SPECIAL System (Fallout)", "description": "5 + 1d5",
+                    "method": lambda: _legacy_4d6_drop_lowest(), "rating_thresholds": [49, 45, 42, 39]},
+        "cortex": {"name": "Cortex System", "description": "Dice steps",
+                   "method": lambda: _legacy_4d6_drop_lowest(), "rating_thresholds": [54, 48, 42, 36]},
+    }
+    info = stat_systems[system]
+    if system == "special":
+        stat_names = ["STR", "PER", "END", "CHA", "INT", "AGI", "LCK"]
+    else:
+        stat_names = ["STR", "DEX", "CON", "INT", "WIS", "CHA"]
+    return info, stat_names
+
+def legacy_roll(system: str):
+    info, stat_names = legacy_lookup(system)
+    return [info["method"]() for _ in stat_names]
+
+def registry_lookup(system: str):
+    info = get_stat_system(system)
+    return info, info.stat_names
+
+def registry_roll(system: str):
+    info = get_stat_system(system)
+    return roll_stat_blocks(info.method, 1, len(info.stat_names))[0]
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    cases = [
+        ("lookup (legacy dict per call)", lambda: legacy_lookup("dnd")),
+        ("lookup (registry)", lambda: registry_lookup("dnd")),
+        ("lookup + roll (legacy)", lambda: legacy_roll("dnd")),
+        ("lookup + roll (registry)", lambda: registry_roll("dnd")),
+    ]
+
+    print(f"{iterations} iterations")
+    for label, func in cases:
+        seconds = timeit.timeit(func, number=iterations)
+        print(f"{label:32} {seconds / iterations * 1e6:8.2f} µs/call")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark character storage formats on a synthetic guild.
+
+Builds a guild with the given number of characters and, for every storage
+format available here, times writing and reading it as one file (the old
+single-file layout) and cold-loading it from the manifest layout: the
+manifest alone (!char list) and the manifest plus one document (!char show).
+
+Usage: python -m benchmarks.bench_storage_format [characters] [repeats]
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bot.utils.character_store import CharacterStore
+from bot.utils.stat_systems import DEFAULT_STAT_NAMES
+from bot.utils.storage_format import available_formats, decode, encode
+
+WORDS = "sword shield tavern dragon ranger village cursed ancient oath storm river king".split()
+
+def make_guild(count: int):
+    rng = random.Random(42)
+    characters = {}
+    for i in range(count):
+        user_key = str(100000 + i % 200)
+        char_id = f"{user_key}_{i}"
+        characters.setdefault(user_key, {})[char_id] = {
+            'name': f"Hero{i}",
+            'nickname': f"H{i}" if i % 3 == 0 else None,
+            'role': rng.choice(["PC", "NPC"]),
+            'system': "dnd",
+            'stats': {name: rng.randint(3, 18) for name in DEFAULT_STAT_NAMES},
+            'backstory': " ".join(rng.choice(WORDS) for _ in range(40)),
+            'notes': [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(i % 4)],
+            'created_by': int(user_key),
+            'created_at': "2024-01-01T00:00:00",
+        }
+    return characters
+
+def best_of(repeats: int, func) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+def cold_load(data_dir: Path, fmt: str, show: bool):
+    store = CharacterStore(data_dir, fmt)
+    store.manifest(1)
+    if show:
+        store.find(1, "100000", "Hero5000")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    characters = make_guild(count)
+
+    print(f"{count} characters, best of {repeats}")
+    print(f"{'format':10} {'file size':>11} {'save':>9} {'load':>9} {'dir size':>11} {'manifest':>9} {'show':>9}")
+    for fmt, usable in available_formats().items():
+        if not usable:
+            print(f"{fmt:10} (not installed)")
+            continue
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "guild"
+            save = best_of(repeats, lambda: path.write_bytes(encode(characters, fmt)))
+            load = best_of(repeats, lambda: decode(path.read_bytes()))
+            size = path.stat().st_size
+
+            store = CharacterStore(Path(tmp) / "store", fmt)
+            for user_key, user_chars in characters.items():
+                for char_id, char_data in user_chars.items():
+                    store.put(1, user_key, char_id, dict(char_data))
+            store.save(1)
+            manifest = best_of(repeats, lambda: cold_load(store.data_dir, fmt, False))
+            show = best_of(repeats, lambda: cold_load(store.data_dir, fmt, True))
+
+            print(
+                f"{fmt:10} {size:>11,} {save * 1000:7.1f}ms {load * 1000:7.1f}ms "
+                f"{dir_size(store.data_dir):>11,} {manifest * 1000:7.1f}ms {show * 1000:7.1f}ms"
+            )
+
+if __name__ == "__main__":
+    main()
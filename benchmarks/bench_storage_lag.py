@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark event loop lag while character writes hammer the storage.
+
+Runs concurrent writers that each update a character and save, the way
+!char modify does, against a guild of the given size. A ticker measures how
+late the event loop wakes it up. Storage is called directly on the loop
+(blocking), through AsyncCharacterStorage's thread pool, and in memory.
+
+Usage: python -m benchmarks.bench_storage_lag [characters] [writers] [writes per writer]
+"""
+
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bot.utils.character_storage import AsyncCharacterStorage, memory_storage
+from bot.utils.character_store import CharacterStore
+
+TICK = 0.001
+
+def make_character(i: int) -> dict:
+    return {
+        'name': f"Hero{i}",
+        'nickname': None,
+        'role': "PC",
+        'system': "dnd",
+        'stats': {'STR': 10, 'DEX': 10, 'CON': 10, 'INT': 10, 'WIS': 10, 'CHA': 10},
+        'backstory': "A long story " * 20,
+        'created_by': 1,
+        'created_at': "2024-01-01T00:00:00",
+    }
+
+async def ticker(lags: list, done: asyncio.Event):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+async def storm(storage, blocking: bool, characters: int, writers: int, writes: int):
+    store = storage.store
+    for i in range(characters):
+        store.put(1, "1", f"1_{i}", make_character(i))
+    store.save(1)
+
+    async def writer(w: int):
+        for n in range(writes):
+            char_id = f"1_{(w * writes + n) % characters}"
+            if blocking:
+                document = store.get_character(1, char_id)
+                document['role'] = f"Role {n}"
+                store.update(1, char_id, document)
+                store.save(1)
+                # Yield like a command handler awaiting its reply would
+                await asyncio.sleep(0)
+            else:
+                document = await storage.get_character(1, char_id)
+                document['role'] = f"Role {n}"
+                await storage.upsert(1, "1", char_id, document)
+                await storage.save(1)
+
+    lags = []
+    done = asyncio.Event()
+    tick = asyncio.ensure_future(ticker(lags, done))
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(w) for w in range(writers)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    return elapsed, lags
+
+def main():
+    characters = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    writes = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    print(f"{characters} characters, {writers} writers x {writes} writes")
+    print(f"{'storage':10} {'writes/s':>9} {'median lag':>11} {'p99 lag':>9} {'max lag':>9}")
+    for label in ('blocking', 'threaded', 'memory'):
+        with tempfile.TemporaryDirectory() as tmp:
+            if label == 'memory':
+                storage = memory_storage()
+            else:
+                storage = AsyncCharacterStorage(CharacterStore(Path(tmp)))
+            elapsed, lags = asyncio.run(storm(storage, label == 'blocking', characters, writers, writes))
+            storage.close()
+
+        lags.sort()
+        p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+        median = statistics.median(lags) if lags else 0.0
+        print(
+            f"{label:10} {writers * writes / elapsed:9.0f} {median * 1000:9.2f}ms "
+            f"{p99 * 1000:7.2f}ms {(lags[-1] if lags else 0.0) * 1000:7.2f}ms"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,11 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from config.config import Config
+from bot.utils.coalesce import TTLCache
+from bot.utils.handoff import StateHandoff
+from bot.utils.outbound import OutboundScheduler
+from bot.utils.rate_limiter import CommandRateLimiter, estimate_cost
+from bot.utils.tracing import tracer
 
 # Set up logging
 logging.basicConfig(
@@ -21,6 +26,26 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+class RateLimited(commands.CheckFailure):
+    """Raised when a command is throttled by the rate limiter"""
+    
+    def __init__(self, scope: str, retry_after: float, notify: bool):
+        self.scope = scope
+        self.retry_after = retry_after
+        self.notify = notify
+        super().__init__(f"Rate limited ({scope}), retry in {retry_after:.1f}s")
+
+class ScheduledContext(commands.Context):
+    """Context whose replies wait in the bot's per-channel outbound queue"""
+    
+    async def send(self, content=None, *, batchable=False, **kwargs):
+        """Queue a reply; ``batchable`` replies may share a message with others when the channel is busy"""
+        if self.interaction is not None:
+            # Slash command responses are tied to the interaction, not the channel queue
+            return await super().send(content, **kwargs)
+        with tracer.span('send'):
+            return await self.bot.outbound.send(self.channel.id, super().send, content, batchable, **kwargs)
+
 class DnDBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
@@ -33,10 +58,102 @@ class DnDBot(commands.Bot):
             intents=intents,
             help_command=None  # We'll use our custom help
         )
+        
+        self.outbound = OutboundScheduler(Config.OUTBOUND_HOT_DEPTH)
+        # Message id -> RerollPlan; kept on the bot so reloading a cog doesn't forget rolls
+        self.reroll_cache = TTLCache(Config.REROLL_TTL, Config.REROLL_CACHE_SIZE)
+        # Cog state in transit while an extension reloads
+        self.handoff = StateHandoff()
+        self.rate_limiter = CommandRateLimiter(
+            {
+                'user': (Config.RATE_LIMIT_USER_RATE, Config.RATE_LIMIT_USER_BURST),
+                'channel': (Config.RATE_LIMIT_CHANNEL_RATE, Config.RATE_LIMIT_CHANNEL_BURST),
+                'guild': (Config.RATE_LIMIT_GUILD_RATE, Config.RATE_LIMIT_GUILD_BURST),
+            },
+            max_buckets=Config.RATE_LIMIT_MAX_BUCKETS
+        )
+        if Config.ENABLE_RATE_LIMIT:
+            # Run once per invocation so group subcommands aren't charged twice
+            self.add_check(self.rate_limit_check, call_once=True)
+    
+    async def load_extension(self, name, *, package=None):
+        await super().load_extension(name, package=package)
+        self.dispatch('extensions_changed')
+    
+    async def unload_extension(self, name, *, package=None):
+        await super().unload_extension(name, package=package)
+        self.dispatch('extensions_changed')
+    
+    async def reload_extension(self, name, *, package=None):
+        """Reload an extension, handing its cogs' caches, storage and writers to their new instances"""
+        name = self._resolve_name(name, package)
+        if name not in self.extensions:
+            raise commands.ExtensionNotLoaded(name)
+        
+        for cog in list(self.cogs.values()):
+            module = type(cog).__module__
+            if (module == name or module.startswith(name + '.')) and hasattr(cog, 'export_state'):
+                self.handoff.put(cog.qualified_name, await cog.export_state(), getattr(cog, 'release_state', None))
+        try:
+            await super().reload_extension(name)
+        finally:
+            # Whatever the new code didn't adopt is flushed and closed, not leaked
+            for cog_name in await self.handoff.release_all():
+                logger.warning(f"Reloaded {name} without adopting {cog_name}'s state; flushed and closed it")
+        self.dispatch('extensions_changed')
+    
+    async def get_context(self, origin, *, cls=ScheduledContext):
+        return await super().get_context(origin, cls=cls)
+    
+    async def invoke(self, ctx):
+        """Invoke a command, traced span by span when sampled (see !traces)"""
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        with tracer.trace(ctx.command.qualified_name, user=ctx.author.id, channel=ctx.channel.id) as trace:
+            await super().invoke(ctx)
+            if trace is not None and ctx.invoked_subcommand is not None:
+                trace.name = ctx.invoked_subcommand.qualified_name
+    
+    async def close(self):
+        # Deliver queued replies while the connection is still up
+        await self.outbound.close()
+        await super().close()
+    
+    async def rate_limit_check(self, ctx):
+        """Global check charging each command's estimated cost to its buckets"""
+        command, args = self._resolve_invocation(ctx)
+        cost = estimate_cost(command.qualified_name, args, animations=Config.ENABLE_ANIMATIONS)
+        
+        throttled = self.rate_limiter.acquire(
+            {
+                'user': ctx.author.id,
+                'channel': ctx.channel.id,
+                'guild': ctx.guild.id if ctx.guild else None,
+            },
+            cost
+        )
+        if throttled:
+            raise RateLimited(*throttled)
+        return True
+    
+    @staticmethod
+    def _resolve_invocation(ctx):
+        """Find the (sub)command being invoked and its raw argument text"""
+        command = ctx.command
+        args = ctx.message.content[len(ctx.prefix or '') + len(ctx.invoked_with or ''):].strip()
+        
+        while isinstance(command, commands.Group):
+            name, _, rest = args.partition(' ')
+            subcommand = command.get_command(name)
+            if subcommand is None:
+                break
+            command, args = subcommand, rest.strip()
+        
+        return command, args
     
     async def setup_hook(self):
         """Load cogs"""
-        cogs = ['bot.cog.dice_rolling', 'bot.cog.help', 'bot.cog.characters']
+        cogs = ['bot.cog.dice_rolling', 'bot.cog.help', 'bot.cog.characters', 'bot.cog.initiative']
         
         # Load development cog if enabled
         if Config.ENABLE_DEV_COMMANDS:
@@ -61,17 +178,27 @@ class DnDBot(commands.Bot):
         if isinstance(error, commands.CommandNotFound):
             return  # Ignore command not found
         
+        if isinstance(error, RateLimited):
+            if error.notify:
+                await ctx.send(f"🐢 Slow down! Try again in {error.retry_after:.1f}s.", delete_after=5)
+            return
+        
         if isinstance(error, commands.MissingRequiredArgument):
-            await ctx.send(f"❌ Missing required argument: `{error.param.name}`")
+            await ctx.send(f"❌ Missing required argument: `{error.param.name}`", batchable=True)
+            return
+        
+        if isinstance(error, commands.MissingPermissions):
+            missing = ", ".join(perm.replace('_', ' ').title() for perm in error.missing_permissions)
+            await ctx.send(f"❌ You need the {missing} permission to use this command.", batchable=True)
             return
         
         if isinstance(error, commands.BadArgument):
-            await ctx.send(f"❌ Invalid argument provided.")
+            await ctx.send(f"❌ Invalid argument provided.", batchable=True)
             return
         
         # Log unexpected errors
         logger.error(f"Unexpected error: {error}", exc_info=True)
-        await ctx.send("❌ An unexpected error occurred.")
+        await ctx.send("❌ An unexpected error occurred.", batchable=True)
 
 def create_bot():
     """Create and return bot instance"""
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Offline tools for the character data directory.
+
+Run from the repository root while the bot is stopped:
+
+    python -m bot.cli export <guild_id> [-o FILE]
+    python -m bot.cli import <guild_id> FILE [--replace] [--batch-size N]
+    python -m bot.cli check [--workers N]
+    python -m bot.cli repair [--workers N]
+
+Archives are JSON Lines, gzip-compressed when the file name ends in .gz;
+``-`` reads from stdin or writes to stdout. ``check`` scans every guild's
+files and reports problems; ``repair`` also fixes them and compacts the
+directory into the configured format.
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from config.config import Config
+from .utils.character_archive import Progress, export_guild, import_guild, open_archive
+from .utils.character_store import DEFAULT_DATA_DIR, CharacterStore
+from .utils.maintenance import check_data_dir
+
+def _progress(label: str, unit: str = "characters") -> Progress:
+    """Progress callback printing to stderr at most once a second"""
+    last_update = [0.0]
+
+    def report(done: int, total: Optional[int]):
+        now = time.monotonic()
+        if now - last_update[0] < 1:
+            return
+        last_update[0] = now
+        progress = f"{done:,}/{total:,} {unit}" if total else f"{done:,} lines"
+        print(f"\r{label}: {progress}", end='', file=sys.stderr, flush=True)
+
+    return report
+
+def export_command(args: argparse.Namespace, store: CharacterStore) -> int:
+    progress = _progress("Exporting")
+    if args.output == '-':
+        count = export_guild(store, args.guild_id, sys.stdout, progress)
+    else:
+        with open_archive(args.output, 'w') as fp:
+            count = export_guild(store, args.guild_id, fp, progress)
+    print(f"\rExported {count:,} characters from guild {args.guild_id}", file=sys.stderr)
+    return 0
+
+def import_command(args: argparse.Namespace, store: CharacterStore) -> int:
+    progress = _progress("Importing")
+    try:
+        if args.file == '-':
+            stats = import_guild(store, args.guild_id, sys.stdin, args.replace, args.batch_size, progress)
+        else:
+            with open_archive(args.file) as fp:
+                stats = import_guild(store, args.guild_id, fp, args.replace, args.batch_size, progress)
+    except (ValueError, OSError, EOFError) as e:
+        print(f"\nImport failed: {e}", file=sys.stderr)
+        return 1
+
+    print(
+        f"\rImported {stats['imported']:,} characters into guild {args.guild_id} "
+        f"({stats['replaced']:,} replaced, {stats['skipped']:,} skipped, {stats['invalid']:,} invalid)",
+        file=sys.stderr
+    )
+    for error in stats['errors']:
+        print(f"  {error}", file=sys.stderr)
+    return 1 if stats['invalid'] else 0
+
+def check_command(args: argparse.Namespace, store: CharacterStore) -> int:
+    repair = args.command == 'repair'
+    totals = check_data_dir(
+        store.data_dir, store.format, repair, args.workers, store.cache_stats()['max_bytes'],
+        _progress("Repairing" if repair else "Checking", "guilds")
+    )
+
+    print(
+        f"\r{'Repaired' if repair else 'Checked'} {totals['guilds']:,} guilds with {totals['workers']} workers "
+        f"in {totals['seconds']:.1f}s: {totals['characters']:,} characters, {totals['notes']:,} notes",
+        file=sys.stderr
+    )
+    print(
+        f"  missing {totals['missing']:,}, corrupt {totals['corrupt']:,}, out of date {totals['stale']:,}, "
+        f"unlisted {totals['unlisted']:,}, duplicate names {totals['duplicates']:,}, "
+        f"leftover files {totals['leftovers']:,}, legacy guilds {totals['legacy']:,}, failed {totals['failed']:,}",
+        file=sys.stderr
+    )
+    if repair:
+        print(
+            f"  rewrote {totals['rewritten']:,} files; "
+            f"{totals['bytes_before']:,} bytes before, {totals['bytes_after']:,} after",
+            file=sys.stderr
+        )
+    for problem in totals['problems']:
+        print(f"  {problem}", file=sys.stderr)
+    if totals['problem_guilds'] > 0 and not repair:
+        print(f"{totals['problem_guilds']:,} guilds need repair: run `python -m bot.cli repair`", file=sys.stderr)
+    return 1 if totals['failed'] or (totals['problem_guilds'] and not repair) else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="dice-roller-bot", description="Offline character data tools")
+    parser.add_argument('--data-dir', type=Path, default=DEFAULT_DATA_DIR, help="character data directory")
+    parser.add_argument('--format', default=Config.CHARACTER_FORMAT, help="storage format for files written")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="export a guild's characters as JSON Lines")
+    export_parser.add_argument('guild_id', type=int)
+    export_parser.add_argument('-o', '--output', default='-', help="output file (.jsonl or .jsonl.gz), default stdout")
+    export_parser.set_defaults(func=export_command)
+
+    import_parser = subparsers.add_parser('import', help="import characters from a JSON Lines export")
+    import_parser.add_argument('guild_id', type=int)
+    import_parser.add_argument('file', help="export file (.jsonl or .jsonl.gz), or - for stdin")
+    import_parser.add_argument('--replace', action='store_true', help="overwrite characters with the same name")
+    import_parser.add_argument('--batch-size', type=int, default=500, help="characters saved per write")
+    import_parser.set_defaults(func=import_command)
+
+    for name, description in (
+        ('check', "check every guild's files and report problems"),
+        ('repair', "fix problems, dedupe names and compact every guild's files"),
+    ):
+        check_parser = subparsers.add_parser(name, help=description)
+        check_parser.add_argument('--workers', type=int, help="worker processes, default one per CPU")
+        check_parser.set_defaults(func=check_command)
+
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+    store = CharacterStore(args.data_dir, args.format, max_bytes=int(Config.CHARACTER_MEMORY_MB * 1024 * 1024))
+    return args.func(args, store)
+
+if __name__ == "__main__":
+    sys.exit(main())
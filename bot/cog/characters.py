@@ -1,121 +1,189 @@
 import discord
 from discord.ext import commands
-import json
-import os
-import random
+import asyncio
+import contextlib
+import functools
 import logging
-from typing import Optional, Dict, Any
+import tempfile
+import time
+import weakref
+from typing import Optional, Dict, Any, List
 from pathlib import Path
 
+from ..utils.character_archive import open_archive
+from ..utils.character_storage import AsyncCharacterStorage, CharacterStorage
+from ..utils.character_store import DEFAULT_DATA_DIR, CharacterStore
+from ..utils.coalesce import SingleFlight, TTLCache
+from ..utils.dice_parser import DiceParser
+from ..utils.memory_cache import SizedLRUCache
+from ..utils.roll_macros import MAX_MACROS, MacroBook, normalize_stats, validate_macro
+from ..utils.stat_blocks import roll_stat_blocks
+from ..utils.stat_systems import STAT_SYSTEMS, get_stat_system
+from ..utils.text_search import snippet
+from ..utils.tracing import traced, tracer
+from config.config import Config
+
 logger = logging.getLogger(__name__)
 
 class Characters(commands.Cog):
     """Character management with persistence"""
     
-    def __init__(self, bot):
+    def __init__(self, bot, storage: Optional[CharacterStorage] = None):
         self.bot = bot
-        self.data_dir = Path("data/characters")
-        self.data_dir.mkdir(parents=True, exist_ok=True)
+        # After a reload, carry on with the previous instance's storage (its cache and unsaved
+        # changes), locks and compiled macros. Its rendered embeds are dropped: that code changed
+        warm = bot.handoff.take(self.qualified_name) if storage is None else None
+        if warm is not None:
+            storage = warm['storage']
+        self._exported = False
+        
+        # All disk I/O happens on the storage's own threads, never on the event loop
+        self.storage = storage or AsyncCharacterStorage(CharacterStore(
+            DEFAULT_DATA_DIR,
+            Config.CHARACTER_FORMAT,
+            max_bytes=int(Config.CHARACTER_MEMORY_MB * 1024 * 1024)
+        ))
+        # Serializes check-then-write commands per guild now that storage calls yield
+        self._write_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+        
+        # Read path: coalesced loads plus a short-lived rendered embed cache
+        self._guild_versions: Dict[int, int] = {}
+        self._reads = SingleFlight()
+        self._embed_cache = TTLCache(Config.CHARACTER_CACHE_TTL, Config.CHARACTER_CACHE_SIZE)
+        
+        # Compiled macros per (guild, user), dropped only when the active character's stats or macros change.
+        # Every book counts as size 1, so the budget is a count
+        self._macro_books = SizedLRUCache(Config.CHARACTER_CACHE_SIZE)
+        self.parser = DiceParser(Config.MAX_DICE, Config.MAX_SIDES)
+        
+        if warm is not None:
+            self._write_locks = warm['write_locks']
+            self._guild_versions = warm['guild_versions']
+            self._reads = warm['reads']
+            self._macro_books = warm['macro_books']
     
-    def _get_server_file(self, guild_id: int) -> Path:
-        """Get the JSON file path for a specific server"""
-        return self.data_dir / f"{guild_id}.json"
+    async def export_state(self) -> Dict[str, Any]:
+        """Hand storage and caches to the reloaded cog; this instance stops owning them"""
+        self._exported = True
+        return {
+            'storage': self.storage,
+            'write_locks': self._write_locks,
+            'guild_versions': self._guild_versions,
+            'reads': self._reads,
+            'macro_books': self._macro_books,
+        }
     
-    def _load_characters(self, guild_id: int) -> Dict[str, Dict[str, Any]]:
-        """Load characters for a specific server"""
-        file_path = self._get_server_file(guild_id)
-        if file_path.exists():
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                logger.error(f"Error loading characters for guild {guild_id}: {e}")
-        return {}
-    
-    def _save_characters(self, guild_id: int, characters: Dict[str, Dict[str, Any]]) -> bool:
-        """Save characters for a specific server"""
-        file_path = self._get_server_file(guild_id)
+    @staticmethod
+    async def release_state(state: Dict[str, Any]):
+        """Write unsaved changes and close the storage"""
+        storage = state['storage']
+        if not await storage.save_all():
+            logger.error("Some unsaved character changes could not be written")
+        storage.close()
+    
+    async def cog_unload(self):
+        if not self._exported:
+            await self.release_state({'storage': self.storage})
+    
+    async def _save_characters(self, guild_id: int) -> bool:
+        """Save changed characters for a specific server"""
+        self._invalidate_guild(guild_id)
+        return await self.storage.save(guild_id)
+    
+    @contextlib.asynccontextmanager
+    async def _guild_lock(self, guild_id: int):
+        """Lock held while a command checks and then changes a guild's characters"""
+        lock = self._write_locks.get(guild_id)
+        if lock is None:
+            lock = self._write_locks[guild_id] = asyncio.Lock()
+        with tracer.span('lock wait'):
+            await lock.acquire()
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(characters, f, indent=2, ensure_ascii=False)
-            return True
-        except IOError as e:
-            logger.error(f"Error saving characters for guild {guild_id}: {e}")
-            return False
+            yield
+        finally:
+            lock.release()
     
-    def _get_user_key(self, user_id: int) -> str:
-        """Get the key for storing user characters"""
-        return str(user_id)
+    def _invalidate_guild(self, guild_id: int):
+        """Bump the guild's data version and drop its cached embeds"""
+        self._guild_versions[guild_id] = self._guild_versions.get(guild_id, 0) + 1
+        self._embed_cache.invalidate(lambda key: key[0] == guild_id)
     
-    def _generate_stats(self, system: str) -> Dict[str, int]:
-        """Generate stats using the specified system"""
-        stat_systems = {
-            "dnd": lambda: self._roll_4d6_drop_lowest(),
-            "adnd": lambda: self._roll_3d6(),
-            "pathfinder": lambda: self._roll_4d6_drop_lowest(),
-            "heroic": lambda: self._roll_heroic(),
-            "standard": lambda: self._get_standard_array(),
-            "special": lambda: self._roll_special(),
-            "cortex": lambda: self._roll_cortex()
-        }
-        
-        if system not in stat_systems:
-            system = "dnd"  # Default fallback
-        
-        method = stat_systems[system]
-        
-        if system == "special":
-            stat_names = ["STR", "PER", "END", "CHA", "INT", "AGI", "LCK"]
+    def _invalidate_macros(self, guild_id: int, user_id: Optional[int] = None):
+        """Drop compiled macro books for a user, or for the whole guild"""
+        if user_id is not None:
+            self._macro_books.pop((guild_id, user_id))
         else:
-            stat_names = ["STR", "DEX", "CON", "INT", "WIS", "CHA"]
-        
-        stats = {}
-        for stat in stat_names:
-            stats[stat] = method()
-        
-        return stats
+            self._macro_books.invalidate(lambda key: key[0] == guild_id)
     
-    def _roll_4d6_drop_lowest(self) -> int:
-        """Roll 4d6, drop lowest"""
-        rolls = sorted([random.randint(1, 6) for _ in range(4)], reverse=True)
-        return sum(rolls[:3])
+    async def macro_book(self, guild_id: int, user_id: int) -> Optional[MacroBook]:
+        """The user's active character with its macros compiled, or None if they have no active character"""
+        key = (guild_id, user_id)
+        book = self._macro_books.get(key)
+        if book is not None:
+            return book
+        return await self._reads.do(('macros',) + key, lambda: self._load_macro_book(guild_id, user_id))
     
-    def _roll_3d6(self) -> int:
-        """Roll 3d6 straight"""
-        return sum(random.randint(1, 6) for _ in range(3))
+    async def _load_macro_book(self, guild_id: int, user_id: int) -> Optional[MacroBook]:
+        version = self._guild_versions.get(guild_id, 0)
+        found = await self._active_character(guild_id, self._get_user_key(user_id))
+        if found is None:
+            return None
+        
+        book = MacroBook(*found)
+        # Skip caching if a save raced the load; the next roll loads it again
+        if self._guild_versions.get(guild_id, 0) == version:
+            self._macro_books.set((guild_id, user_id), book, 1)
+            self._macro_books.evict()
+        return book
     
-    def _roll_heroic(self) -> int:
-        """Roll 2d6+6 for heroic characters"""
-        return sum(random.randint(1, 6) for _ in range(2)) + 6
+    async def _active_character(self, guild_id: int, user_key: str):
+        """The (char_id, document) picked with !char use, or the user's only character"""
+        user_chars = await self.storage.characters_of(guild_id, user_key)
+        if len(user_chars) == 1:
+            document = await self.storage.get_character(guild_id, user_chars[0][0])
+            return (user_chars[0][0], document) if document else None
+        
+        for char_id, _ in user_chars:
+            document = await self.storage.get_character(guild_id, char_id)
+            if document and document.get('active'):
+                return char_id, document
+        return None
     
-    def _get_standard_array(self) -> int:
-        """Return standard array values"""
-        if not hasattr(self, '_standard_values'):
-            self._standard_values = [15, 14, 13, 12, 10, 8]
-            random.shuffle(self._standard_values)
-        
-        if not self._standard_values:
-            self._standard_values = [15, 14, 13, 12, 10, 8]
-            random.shuffle(self._standard_values)
-        
-        return self._standard_values.pop()
+    def _progress_reporter(self, message: discord.Message, label: str):
+        """Progress callback for worker threads that queues an edit of ``message`` at most every few seconds"""
+        loop = asyncio.get_running_loop()
+        last_update = [time.monotonic()]
+        
+        def report(done: int, total: Optional[int]):
+            now = time.monotonic()
+            if now - last_update[0] < 3:
+                return
+            last_update[0] = now
+            progress = f"{done:,}/{total:,} characters" if total else f"{done:,} lines"
+            # A frame: dropped if the final edit is already waiting behind it
+            loop.call_soon_threadsafe(functools.partial(
+                self.bot.outbound.edit, message.channel.id, message, frame=True, content=f"{label} ({progress})"
+            ))
+        
+        return report
     
-    def _roll_special(self) -> int:
-        """Roll SPECIAL stats: 5 + 1d5"""
-        return 5 + random.randint(1, 5)
+    def _get_user_key(self, user_id: int) -> str:
+        """Get the key for storing user characters"""
+        return str(user_id)
     
-    def _roll_cortex(self) -> int:
-        """Roll Cortex system dice steps"""
-        if not hasattr(self, '_cortex_dice'):
-            self._cortex_dice = [4, 6, 8, 10, 12, 6]
-            random.shuffle(self._cortex_dice)
-        
-        if not self._cortex_dice:
-            self._cortex_dice = [4, 6, 8, 10, 12, 6]
-            random.shuffle(self._cortex_dice)
-        
-        die_size = self._cortex_dice.pop()
-        return random.randint(1, die_size)
+    def _generate_stats(self, system: str) -> Dict[str, int]:
+        """Generate stats using the specified system"""
+        return self._generate_stats_batch(system, 1)[0]
+    
+    def _generate_stats_batch(self, system: str, count: int) -> List[Dict[str, int]]:
+        """Generate ``count`` stat blocks at once using the specified system"""
+        stat_system = get_stat_system(system) or STAT_SYSTEMS["dnd"]  # Default fallback
+        
+        blocks = roll_stat_blocks(stat_system.method, count, len(stat_system.stat_names))
+        return [
+            {name: stat['total'] for name, stat in zip(stat_system.stat_names, block)}
+            for block in blocks
+        ]
     
     @commands.group(name='char', aliases=['character'], invoke_without_command=True)
     async def character(self, ctx, character_name: str = None):
@@ -128,21 +196,8 @@ class Characters(commands.Cog):
     @character.command(name='create')
     async def create_character(self, ctx, name: str, *, role: str = "Adventurer"):
         """Create a new character: !char create "Gandalf" Wizard"""
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        if user_key not in characters:
-            characters[user_key] = {}
-        
-        # Check if character already exists
-        name_lower = name.lower()
-        if any(char['name'].lower() == name_lower for char in characters[user_key].values()):
-            await ctx.send(f"❌ You already have a character named '{name}'!")
-            return
-        
-        # Generate unique character ID
-        char_id = f"{ctx.author.id}_{len(characters[user_key])}"
-        
         # Create character with default D&D stats
         character_data = {
             "name": name,
@@ -156,9 +211,17 @@ class Characters(commands.Cog):
             "created_at": ctx.message.created_at.isoformat()
         }
         
-        characters[user_key][char_id] = character_data
+        async with self._guild_lock(ctx.guild.id):
+            # Check if character already exists
+            if await self.storage.name_taken(ctx.guild.id, user_key, name):
+                await ctx.send(f"❌ You already have a character named '{name}'!", batchable=True)
+                return
+            
+            await self.storage.create(ctx.guild.id, ctx.author.id, [character_data])
+            saved = await self._save_characters(ctx.guild.id)
+            self._invalidate_macros(ctx.guild.id, ctx.author.id)
         
-        if self._save_characters(ctx.guild.id, characters):
+        if saved:
             embed = discord.Embed(
                 title="✨ Character Created!",
                 description=f"**{name}** the {role}",
@@ -172,16 +235,74 @@ class Characters(commands.Cog):
             embed.set_footer(text=f"Created by {ctx.author.display_name} | Use !char modify to customize")
             await ctx.send(embed=embed)
         else:
-            await ctx.send("❌ Failed to save character. Please try again.")
+            await ctx.send("❌ Failed to save character. Please try again.", batchable=True)
+    
+    @character.command(name='bulkcreate')
+    async def bulk_create_characters(self, ctx, count: int, prefix: str, system: str = "dnd", *, role: str = "NPC"):
+        """Create many characters at once: !char bulkcreate 20 "Goblin" dnd Minion"""
+        if count < 1 or count > Config.MAX_BULK_CREATE:
+            await ctx.send(f"❌ You can create between 1 and {Config.MAX_BULK_CREATE} characters at once!", batchable=True)
+            return
+        
+        system = system.lower()
+        if system not in STAT_SYSTEMS:
+            await ctx.send(f"❌ Invalid system. Available: {', '.join(STAT_SYSTEMS)}", batchable=True)
+            return
+        
+        user_key = self._get_user_key(ctx.author.id)
+        
+        # Roll every stat block in one pooled draw
+        stat_blocks = self._generate_stats_batch(system, count)
+        created_at = ctx.message.created_at.isoformat()
+        
+        async with self._guild_lock(ctx.guild.id):
+            # Pick names that don't collide with existing characters
+            names = await self.storage.free_names(ctx.guild.id, user_key, prefix, count)
+            
+            await self.storage.create(ctx.guild.id, ctx.author.id, [
+                {
+                    "name": name,
+                    "nickname": None,
+                    "role": role,
+                    "system": system,
+                    "stats": stats,
+                    "backstory": None,
+                    "notes": [],
+                    "created_by": ctx.author.id,
+                    "created_at": created_at
+                }
+                for name, stats in zip(names, stat_blocks)
+            ])
+            
+            # Single write for the whole batch
+            saved = await self._save_characters(ctx.guild.id)
+            self._invalidate_macros(ctx.guild.id, ctx.author.id)
+        
+        if saved:
+            shown = ", ".join(names[:10])
+            if count > 10:
+                shown += f", ... and {count - 10} more"
+            
+            embed = discord.Embed(
+                title="✨ Characters Created!",
+                description=f"Created **{count}** {role} characters ({system.upper()})",
+                color=discord.Color.green()
+            )
+            embed.add_field(name="Names", value=shown, inline=False)
+            embed.set_footer(text=f"Created by {ctx.author.display_name} | Use !char list to see them")
+            await ctx.send(embed=embed)
+        else:
+            await ctx.send("❌ Failed to save characters. Please try again.", batchable=True)
     
     @character.command(name='list')
     async def list_characters(self, ctx, user: Optional[discord.Member] = None):
         """List all characters for a user"""
         target_user = user or ctx.author
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(target_user.id)
         
-        if user_key not in characters or not characters[user_key]:
+        # Listing only needs the manifest, never the character documents
+        user_chars = await self.storage.characters_of(ctx.guild.id, user_key)
+        if not user_chars:
             if target_user == ctx.author:
                 await ctx.send("You don't have any characters yet! Use `!char create` to make one.")
             else:
@@ -193,7 +314,7 @@ class Characters(commands.Cog):
             color=discord.Color.blue()
         )
         
-        for char_id, char_data in characters[user_key].items():
+        for char_id, char_data in user_chars:
             name = char_data['name']
             nickname = f" ({char_data['nickname']})" if char_data['nickname'] else ""
             role = char_data['role']
@@ -208,28 +329,70 @@ class Characters(commands.Cog):
         embed.set_footer(text=f"Use !char <name> to view details")
         await ctx.send(embed=embed)
     
-    @character.command(name='show')
-    async def show_character(self, ctx, *, character_name: str):
-        """Show detailed character information"""
-        characters = self._load_characters(ctx.guild.id)
-        user_key = self._get_user_key(ctx.author.id)
+    @character.command(name='find')
+    async def find_characters(self, ctx, *, prefix: str):
+        """Find characters in this server by name prefix: !char find Gan"""
+        matches = await self.storage.complete(ctx.guild.id, prefix, limit=25)
         
-        if user_key not in characters:
-            await ctx.send("You don't have any characters!")
+        if not matches:
+            await ctx.send(f"❌ No characters starting with '{prefix}'", batchable=True)
             return
         
-        # Find character (case insensitive)
-        character_data = None
-        for char_data in characters[user_key].values():
-            if (char_data['name'].lower() == character_name.lower() or 
-                (char_data['nickname'] and char_data['nickname'].lower() == character_name.lower())):
-                character_data = char_data
-                break
+        embed = discord.Embed(
+            title=f"🔍 Characters matching '{prefix}'",
+            color=discord.Color.blue()
+        )
         
-        if not character_data:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
-            return
+        lines = []
+        for user_key, _, char_data in matches:
+            nickname = f" ({char_data['nickname']})" if char_data['nickname'] else ""
+            lines.append(f"**{char_data['name']}**{nickname} — {char_data['role']} (<@{user_key}>)")
+        embed.description = "\n".join(lines)
         
+        embed.set_footer(text="Use !char <name> to view details")
+        await ctx.send(embed=embed)
+    
+    @character.command(name='show')
+    async def show_character(self, ctx, *, character_name: str):
+        """Show detailed character information"""
+        guild_id = ctx.guild.id
+        key = (guild_id, ctx.author.id, character_name.lower(), self._guild_versions.get(guild_id, 0))
+        
+        embed = self._embed_cache.get(key)
+        if embed is None:
+            # Concurrent identical reads share one load and render
+            embed = await self._reads.do(
+                key, lambda: self._render_character(guild_id, ctx.author.id, character_name)
+            )
+            if isinstance(embed, discord.Embed):
+                self._embed_cache.set(key, embed)
+        
+        if isinstance(embed, str):
+            await ctx.send(embed)
+        else:
+            await ctx.send(embed=embed)
+    
+    async def _render_character(self, guild_id: int, user_id: int, character_name: str):
+        """Read the manifest and a single character document and render its embed, or return an error message"""
+        user_key = self._get_user_key(user_id)
+        
+        found = await self.storage.find(guild_id, user_key, character_name)
+        if found:
+            return await self._build_character_embed(guild_id, *found)
+        
+        # Fall back to characters owned by anyone else in the guild
+        for owner_key, char_id, _ in (await self.storage.find_in_guild(guild_id, character_name))[:1]:
+            character_data = await self.storage.get_character(guild_id, char_id)
+            if character_data:
+                embed = await self._build_character_embed(guild_id, char_id, character_data)
+                embed.add_field(name="Owner", value=f"<@{owner_key}>", inline=False)
+                return embed
+        
+        return await self._not_found_message(guild_id, character_name)
+    
+    @traced('format')
+    async def _build_character_embed(self, guild_id: int, char_id: str, character_data: Dict[str, Any]) -> discord.Embed:
+        """Create the detailed embed for a character"""
         # Create detailed embed
         name = character_data['name']
         nickname = f" ({character_data['nickname']})" if character_data['nickname'] else ""
@@ -248,6 +411,12 @@ class Characters(commands.Cog):
             inline=True
         )
         
+        # Macros
+        macros = character_data.get('macros')
+        if macros:
+            macros_text = "\n".join(f"**{name}**: `{expression}`" for name, expression in macros.items())
+            embed.add_field(name="Macros", value=macros_text[:1024], inline=True)
+        
         # Backstory
         if character_data['backstory']:
             backstory = character_data['backstory']
@@ -256,45 +425,45 @@ class Characters(commands.Cog):
             embed.add_field(name="Backstory", value=backstory, inline=False)
         
         # Notes
-        if character_data['notes']:
-            notes_text = "\n".join([f"• {note}" for note in character_data['notes'][-3:]])  # Show last 3 notes
-            if len(character_data['notes']) > 3:
-                notes_text += f"\n... and {len(character_data['notes']) - 3} more"
+        note_count = await self.storage.note_count(guild_id, char_id)
+        if note_count:
+            # Show last 3 notes, reading only the chunks that hold them
+            notes_text = "\n".join([f"• {note}" for note in await self.storage.notes(guild_id, char_id, -3)])
+            if note_count > 3:
+                notes_text += f"\n... and {note_count - 3} more"
             embed.add_field(name="Notes", value=notes_text, inline=False)
         
-        embed.set_footer(text=f"Created {character_data['created_at'][:10]}")
-        await ctx.send(embed=embed)
+        footer = f"Created {character_data['created_at'][:10]}"
+        if character_data.get('active'):
+            footer += " | Active character"
+        embed.set_footer(text=footer)
+        return embed
     
     @character.command(name='delete')
     async def delete_character(self, ctx, *, character_name: str):
         """Delete a character"""
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        if user_key not in characters:
-            await ctx.send("You don't have any characters!")
-            return
-        
-        # Find and remove character
-        char_to_delete = None
-        for char_id, char_data in characters[user_key].items():
-            if (char_data['name'].lower() == character_name.lower() or 
-                (char_data['nickname'] and char_data['nickname'].lower() == character_name.lower())):
-                char_to_delete = char_id
-                break
-        
-        if not char_to_delete:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
-            return
-        
-        deleted_char = characters[user_key].pop(char_to_delete)
+        async with self._guild_lock(ctx.guild.id):
+            if not await self.storage.characters_of(ctx.guild.id, user_key):
+                await ctx.send("You don't have any characters!")
+                return
+            
+            # Find and remove character
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
+            char_to_delete, _ = found
+            deleted_char = await self.storage.delete(ctx.guild.id, char_to_delete)
+            saved = await self._save_characters(ctx.guild.id)
+            self._invalidate_macros(ctx.guild.id, ctx.author.id)
         
-        if self._save_characters(ctx.guild.id, characters):
+        if saved:
             await ctx.send(f"🗑️ Character '{deleted_char['name']}' has been deleted.")
         else:
-            # Restore character if save failed
-            characters[user_key][char_to_delete] = deleted_char
-            await ctx.send("❌ Failed to delete character. Please try again.")
+            await ctx.send("❌ Failed to delete character. Please try again.", batchable=True)
     
     @character.group(name='modify', aliases=['mod'], invoke_without_command=True)
     async def modify_character(self, ctx):
@@ -304,131 +473,239 @@ class Characters(commands.Cog):
     @modify_character.command(name='name')
     async def modify_name(self, ctx, current_name: str, *, new_name: str):
         """Change a character's name: !char modify name "Old Name" "New Name" """
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        if user_key not in characters:
-            await ctx.send("You don't have any characters!")
-            return
-        
-        # Find character
-        char_data = None
-        for char in characters[user_key].values():
-            if char['name'].lower() == current_name.lower():
-                char_data = char
-                break
-        
-        if not char_data:
-            await ctx.send(f"❌ Character '{current_name}' not found!")
-            return
-        
-        # Check if new name already exists
-        if any(char['name'].lower() == new_name.lower() for char in characters[user_key].values() if char != char_data):
-            await ctx.send(f"❌ You already have a character named '{new_name}'!")
-            return
-        
-        old_name = char_data['name']
-        char_data['name'] = new_name
+        async with self._guild_lock(ctx.guild.id):
+            if not await self.storage.characters_of(ctx.guild.id, user_key):
+                await ctx.send("You don't have any characters!")
+                return
+            
+            # Find character
+            found = await self.storage.find(ctx.guild.id, user_key, current_name)
+            if not found:
+                await ctx.send(f"❌ Character '{current_name}' not found!", batchable=True)
+                return
+            
+            char_id, char_data = found
+            
+            # Check if new name already exists
+            if await self.storage.name_taken(ctx.guild.id, user_key, new_name, exclude=char_id):
+                await ctx.send(f"❌ You already have a character named '{new_name}'!", batchable=True)
+                return
+            
+            old_name = char_data['name']
+            char_data['name'] = new_name
+            await self.storage.upsert(ctx.guild.id, user_key, char_id, char_data)
+            saved = await self._save_characters(ctx.guild.id)
+            self._invalidate_macros(ctx.guild.id, ctx.author.id)
         
-        if self._save_characters(ctx.guild.id, characters):
+        if saved:
             await ctx.send(f"✅ Character renamed from '{old_name}' to '{new_name}'")
         else:
-            char_data['name'] = old_name  # Revert
-            await ctx.send("❌ Failed to save changes. Please try again.")
+            await ctx.send("❌ Failed to save changes. Please try again.", batchable=True)
     
     @modify_character.command(name='nickname')
     async def modify_nickname(self, ctx, character_name: str, *, nickname: str = None):
         """Set or clear a character's nickname: !char modify nickname "Name" "Nick" """
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        char_data = self._find_character(characters, user_key, character_name)
-        if not char_data:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
-            return
-        
         if nickname and nickname.lower() in ['clear', 'remove', 'none']:
             nickname = None
         
-        char_data['nickname'] = nickname
+        async with self._guild_lock(ctx.guild.id):
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
+            char_id, char_data = found
+            char_data['nickname'] = nickname
+            await self.storage.upsert(ctx.guild.id, user_key, char_id, char_data)
+            saved = await self._save_characters(ctx.guild.id)
         
-        if self._save_characters(ctx.guild.id, characters):
+        if saved:
             if nickname:
                 await ctx.send(f"✅ '{char_data['name']}' nickname set to '{nickname}'")
             else:
                 await ctx.send(f"✅ Cleared nickname for '{char_data['name']}'")
         else:
-            await ctx.send("❌ Failed to save changes. Please try again.")
+            await ctx.send("❌ Failed to save changes. Please try again.", batchable=True)
     
     @modify_character.command(name='role')
     async def modify_role(self, ctx, character_name: str, *, new_role: str):
         """Change a character's role: !char modify role "Name" "New Role" """
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        char_data = self._find_character(characters, user_key, character_name)
-        if not char_data:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
-            return
-        
-        old_role = char_data['role']
-        char_data['role'] = new_role
+        async with self._guild_lock(ctx.guild.id):
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
+            char_id, char_data = found
+            old_role = char_data['role']
+            char_data['role'] = new_role
+            await self.storage.upsert(ctx.guild.id, user_key, char_id, char_data)
+            saved = await self._save_characters(ctx.guild.id)
         
-        if self._save_characters(ctx.guild.id, characters):
+        if saved:
             await ctx.send(f"✅ '{char_data['name']}' role changed from '{old_role}' to '{new_role}'")
         else:
-            char_data['role'] = old_role  # Revert
-            await ctx.send("❌ Failed to save changes. Please try again.")
+            await ctx.send("❌ Failed to save changes. Please try again.", batchable=True)
     
     @modify_character.command(name='system')
     async def modify_system(self, ctx, character_name: str, new_system: str, regenerate: str = "no"):
         """Change character's stat system: !char modify system "Name" dnd [yes/no to regenerate]"""
-        valid_systems = ["dnd", "adnd", "pathfinder", "heroic", "standard", "special", "cortex"]
-        
-        if new_system.lower() not in valid_systems:
-            await ctx.send(f"❌ Invalid system. Available: {', '.join(valid_systems)}")
+        if new_system.lower() not in STAT_SYSTEMS:
+            await ctx.send(f"❌ Invalid system. Available: {', '.join(STAT_SYSTEMS)}", batchable=True)
             return
         
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        char_data = self._find_character(characters, user_key, character_name)
-        if not char_data:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
-            return
+        async with self._guild_lock(ctx.guild.id):
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
+            char_id, char_data = found
+            old_system = char_data['system']
+            char_data['system'] = new_system.lower()
+            
+            # Regenerate stats if requested
+            if regenerate.lower() in ['yes', 'y', 'true', '1']:
+                char_data['stats'] = self._generate_stats(new_system.lower())
+                stats_msg = " and regenerated stats"
+            else:
+                stats_msg = " (stats kept)"
+            await self.storage.upsert(ctx.guild.id, user_key, char_id, char_data)
+            saved = await self._save_characters(ctx.guild.id)
+            self._invalidate_macros(ctx.guild.id, ctx.author.id)
+        
+        if saved:
+            await ctx.send(f"✅ '{char_data['name']}' system changed from '{old_system}' to '{new_system}'{stats_msg}")
+        else:
+            await ctx.send("❌ Failed to save changes. Please try again.", batchable=True)
+    
+    @character.command(name='use')
+    async def use_character(self, ctx, *, character_name: str):
+        """Pick the character whose stats and macros your rolls use: !char use Gandalf"""
+        user_key = self._get_user_key(ctx.author.id)
         
-        old_system = char_data['system']
-        old_stats = char_data['stats'].copy()
+        async with self._guild_lock(ctx.guild.id):
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
+            chosen_id, chosen = found
+            for char_id, _ in await self.storage.characters_of(ctx.guild.id, user_key):
+                char_data = chosen if char_id == chosen_id else await self.storage.get_character(ctx.guild.id, char_id)
+                if char_data is not None and bool(char_data.get('active')) != (char_id == chosen_id):
+                    char_data['active'] = char_id == chosen_id
+                    await self.storage.upsert(ctx.guild.id, user_key, char_id, char_data)
+            saved = await self._save_characters(ctx.guild.id)
+            self._invalidate_macros(ctx.guild.id, ctx.author.id)
+        
+        if saved:
+            await ctx.send(f"✅ Now rolling as '{chosen['name']}'. Try `!roll 1d20+@STR` or `!char macro set`")
+        else:
+            await ctx.send("❌ Failed to save changes. Please try again.", batchable=True)
+    
+    @character.group(name='macro', aliases=['macros'], invoke_without_command=True)
+    async def macro(self, ctx):
+        """List your active character's roll macros"""
+        book = await self.macro_book(ctx.guild.id, ctx.author.id)
+        if book is None:
+            await ctx.send("❌ No active character. Pick one with `!char use <name>`", batchable=True)
+            return
         
-        char_data['system'] = new_system.lower()
+        embed = discord.Embed(title=f"🎲 {book.name}'s Macros", color=discord.Color.blue())
+        if book.macros:
+            embed.description = "\n".join(f"**{name}**: `{expression}`" for name, expression in book.macros.items())
+        else:
+            embed.description = "No macros yet. Add one with `!char macro set attack 1d20+@STR+2`"
+        stats = " · ".join(f"@{stat}" for stat in book.stats)
+        embed.set_footer(text=f"Roll with !roll <macro> | Stat references: {stats}")
+        await ctx.send(embed=embed)
+    
+    @macro.command(name='set', aliases=['add'])
+    async def macro_set(self, ctx, name: str, *, expression: str):
+        """Save a roll macro on your active character: !char macro set attack 1d20+@STR+2"""
+        name = name.lower()
+        user_key = self._get_user_key(ctx.author.id)
         
-        # Regenerate stats if requested
-        if regenerate.lower() in ['yes', 'y', 'true', '1']:
-            char_data['stats'] = self._generate_stats(new_system.lower())
-            stats_msg = " and regenerated stats"
+        async with self._guild_lock(ctx.guild.id):
+            found = await self._active_character(ctx.guild.id, user_key)
+            if found is None:
+                await ctx.send("❌ No active character. Pick one with `!char use <name>`", batchable=True)
+                return
+            
+            char_id, char_data = found
+            problem = validate_macro(
+                name, expression, char_data.get('system') or "dnd", normalize_stats(char_data.get('stats')), self.parser
+            )
+            if problem:
+                await ctx.send(f"❌ {problem}", batchable=True)
+                return
+            
+            macros = dict(char_data.get('macros') or {})
+            if name not in macros and len(macros) >= MAX_MACROS:
+                await ctx.send(f"❌ A character can have at most {MAX_MACROS} macros!", batchable=True)
+                return
+            
+            macros[name] = expression
+            char_data['macros'] = macros
+            await self.storage.upsert(ctx.guild.id, user_key, char_id, char_data)
+            saved = await self._save_characters(ctx.guild.id)
+            self._invalidate_macros(ctx.guild.id, ctx.author.id)
+        
+        if saved:
+            await ctx.send(f"✅ Saved macro `{name}` for '{char_data['name']}': `{expression}`. Roll it with `!roll {name}`")
         else:
-            stats_msg = " (stats kept)"
+            await ctx.send("❌ Failed to save changes. Please try again.", batchable=True)
+    
+    @macro.command(name='delete', aliases=['remove'])
+    async def macro_delete(self, ctx, name: str):
+        """Remove a roll macro from your active character"""
+        name = name.lower()
+        user_key = self._get_user_key(ctx.author.id)
         
-        if self._save_characters(ctx.guild.id, characters):
-            await ctx.send(f"✅ '{char_data['name']}' system changed from '{old_system}' to '{new_system}'{stats_msg}")
+        async with self._guild_lock(ctx.guild.id):
+            found = await self._active_character(ctx.guild.id, user_key)
+            if found is None:
+                await ctx.send("❌ No active character. Pick one with `!char use <name>`", batchable=True)
+                return
+            
+            char_id, char_data = found
+            macros = dict(char_data.get('macros') or {})
+            if macros.pop(name, None) is None:
+                await ctx.send(f"❌ '{char_data['name']}' has no macro named `{name}`", batchable=True)
+                return
+            
+            char_data['macros'] = macros
+            await self.storage.upsert(ctx.guild.id, user_key, char_id, char_data)
+            saved = await self._save_characters(ctx.guild.id)
+            self._invalidate_macros(ctx.guild.id, ctx.author.id)
+        
+        if saved:
+            await ctx.send(f"🗑️ Removed macro `{name}` from '{char_data['name']}'")
         else:
-            char_data['system'] = old_system  # Revert
-            char_data['stats'] = old_stats
-            await ctx.send("❌ Failed to save changes. Please try again.")
+            await ctx.send("❌ Failed to save changes. Please try again.", batchable=True)
     
     @character.command(name='backstory')
     async def set_backstory(self, ctx, character_name: str, *, backstory: str = None):
         """Set or view character backstory: !char backstory "Name" "Their story..." """
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        char_data = self._find_character(characters, user_key, character_name)
-        if not char_data:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
-            return
-        
         if backstory is None:
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
             # Show current backstory
+            _, char_data = found
             if char_data['backstory']:
                 embed = discord.Embed(
                     title=f"📖 {char_data['name']}'s Backstory",
@@ -440,61 +717,70 @@ class Characters(commands.Cog):
                 await ctx.send(f"'{char_data['name']}' doesn't have a backstory yet.")
             return
         
-        if backstory.lower() in ['clear', 'remove', 'none']:
-            char_data['backstory'] = None
-            message = f"✅ Cleared backstory for '{char_data['name']}'"
-        else:
-            char_data['backstory'] = backstory
-            message = f"✅ Set backstory for '{char_data['name']}'"
+        async with self._guild_lock(ctx.guild.id):
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
+            char_id, char_data = found
+            if backstory.lower() in ['clear', 'remove', 'none']:
+                char_data['backstory'] = None
+                message = f"✅ Cleared backstory for '{char_data['name']}'"
+            else:
+                char_data['backstory'] = backstory
+                message = f"✅ Set backstory for '{char_data['name']}'"
+            await self.storage.upsert(ctx.guild.id, user_key, char_id, char_data)
+            saved = await self._save_characters(ctx.guild.id)
         
-        if self._save_characters(ctx.guild.id, characters):
+        if saved:
             await ctx.send(message)
         else:
-            await ctx.send("❌ Failed to save changes. Please try again.")
+            await ctx.send("❌ Failed to save changes. Please try again.", batchable=True)
     
     @character.command(name='note')
     async def add_note(self, ctx, character_name: str, *, note: str):
         """Add a note to a character: !char note "Name" "Note text" """
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        char_data = self._find_character(characters, user_key, character_name)
-        if not char_data:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
-            return
-        
-        if 'notes' not in char_data:
-            char_data['notes'] = []
-        
-        char_data['notes'].append(note)
+        async with self._guild_lock(ctx.guild.id):
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
+            char_id, char_data = found
+            
+            # Only the newest note chunk is rewritten
+            note_count = await self.storage.append_note(ctx.guild.id, char_id, note)
+            saved = await self._save_characters(ctx.guild.id)
         
-        if self._save_characters(ctx.guild.id, characters):
-            await ctx.send(f"✅ Added note to '{char_data['name']}' (Total: {len(char_data['notes'])} notes)")
+        if saved:
+            await ctx.send(f"✅ Added note to '{char_data['name']}' (Total: {note_count} notes)")
         else:
-            char_data['notes'].pop()  # Remove the note we just added
-            await ctx.send("❌ Failed to save note. Please try again.")
+            await ctx.send("❌ Failed to save note. Please try again.", batchable=True)
     
     @character.command(name='notes')
     async def list_notes(self, ctx, character_name: str, page: int = 1):
         """List all notes for a character: !char notes "Name" [page]"""
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        char_data = self._find_character(characters, user_key, character_name)
-        if not char_data:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
+        found = await self.storage.find(ctx.guild.id, user_key, character_name)
+        if not found:
+            await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
             return
         
-        if not char_data.get('notes'):
+        char_id, char_data = found
+        total_notes = await self.storage.note_count(ctx.guild.id, char_id)
+        if not total_notes:
             await ctx.send(f"'{char_data['name']}' doesn't have any notes yet.")
             return
         
         notes_per_page = 5
-        total_notes = len(char_data['notes'])
         total_pages = (total_notes + notes_per_page - 1) // notes_per_page
         
         if page < 1 or page > total_pages:
-            await ctx.send(f"❌ Page {page} doesn't exist. Available pages: 1-{total_pages}")
+            await ctx.send(f"❌ Page {page} doesn't exist. Available pages: 1-{total_pages}", batchable=True)
             return
         
         start_idx = (page - 1) * notes_per_page
@@ -505,10 +791,11 @@ class Characters(commands.Cog):
             color=discord.Color.blue()
         )
         
-        for i in range(start_idx, end_idx):
+        page_notes = await self.storage.notes(ctx.guild.id, char_id, start_idx, end_idx)
+        for i, note in enumerate(page_notes, start_idx):
             embed.add_field(
                 name=f"Note {i + 1}",
-                value=char_data['notes'][i],
+                value=note,
                 inline=False
             )
         
@@ -518,32 +805,127 @@ class Characters(commands.Cog):
     @character.command(name='clearnotes')
     async def clear_notes(self, ctx, character_name: str):
         """Clear all notes for a character: !char clearnotes "Name" """
-        characters = self._load_characters(ctx.guild.id)
         user_key = self._get_user_key(ctx.author.id)
         
-        char_data = self._find_character(characters, user_key, character_name)
-        if not char_data:
-            await ctx.send(f"❌ Character '{character_name}' not found!")
-            return
-        
-        note_count = len(char_data.get('notes', []))
-        char_data['notes'] = []
+        async with self._guild_lock(ctx.guild.id):
+            found = await self.storage.find(ctx.guild.id, user_key, character_name)
+            if not found:
+                await ctx.send(f"❌ Character '{character_name}' not found!", batchable=True)
+                return
+            
+            char_id, char_data = found
+            note_count = await self.storage.clear_notes(ctx.guild.id, char_id)
+            saved = await self._save_characters(ctx.guild.id)
         
-        if self._save_characters(ctx.guild.id, characters):
+        if saved:
             await ctx.send(f"✅ Cleared {note_count} notes from '{char_data['name']}'")
         else:
-            await ctx.send("❌ Failed to clear notes. Please try again.")
+            await ctx.send("❌ Failed to clear notes. Please try again.", batchable=True)
     
-    def _find_character(self, characters: dict, user_key: str, character_name: str) -> Optional[Dict[str, Any]]:
-        """Helper to find a character by name or nickname"""
-        if user_key not in characters:
-            return None
+    @character.command(name='search')
+    async def search_characters(self, ctx, *, query: str):
+        """Search backstories and notes in this server: !char search Black Tower"""
+        results = await self.storage.search(ctx.guild.id, query, limit=Config.SEARCH_RESULTS)
         
-        for char_data in characters[user_key].values():
-            if (char_data['name'].lower() == character_name.lower() or 
-                (char_data['nickname'] and char_data['nickname'].lower() == character_name.lower())):
-                return char_data
-        return None
+        if not results:
+            await ctx.send(f"🔍 No backstories or notes mention '{query}'")
+            return
+        
+        embed = discord.Embed(
+            title=f"🔍 Search: {query}",
+            color=discord.Color.blue()
+        )
+        
+        for doc_id, _, char_data in results:
+            user_key, _, field, note_index = doc_id
+            source = f"Note {note_index + 1}" if field == 'note' else "Backstory"
+            text = await self.storage.document_text(ctx.guild.id, doc_id)
+            
+            embed.add_field(
+                name=f"{char_data['name']} — {source}",
+                value=f"{snippet(text, query)}\n*Owner: <@{user_key}>*",
+                inline=False
+            )
+        
+        embed.set_footer(text=f"{len(results)} best matches • Use !char notes <name> [page] to read more")
+        await ctx.send(embed=embed)
+    
+    @character.command(name='export')
+    @commands.has_permissions(manage_guild=True)
+    async def export_characters(self, ctx):
+        """Export every character in this server as JSON Lines: !char export"""
+        status = await ctx.send("📦 Exporting characters...")
+        progress = self._progress_reporter(status, "📦 Exporting characters...")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / f"characters-{ctx.guild.id}.jsonl.gz"
+            with open_archive(path, 'w') as fp:
+                count = await self.storage.export_guild(ctx.guild.id, fp, progress)
+            size = path.stat().st_size
+            
+            if size > ctx.guild.filesize_limit:
+                await self.bot.outbound.edit(ctx.channel.id, status, content=(
+                    f"❌ The export is {size / (1024 * 1024):.1f} MB, over this server's upload limit. "
+                    f"Run `python -m bot.cli export {ctx.guild.id}` on the bot host instead."
+                ))
+                return
+            
+            await self.bot.outbound.edit(ctx.channel.id, status, content=f"✅ Exported {count} characters")
+            await ctx.send(file=discord.File(path, filename=path.name))
+    
+    @character.command(name='import')
+    @commands.has_permissions(manage_guild=True)
+    async def import_characters(self, ctx, mode: str = "skip"):
+        """Import characters from an attached export: !char import [replace]"""
+        attachments = [a for a in ctx.message.attachments if a.filename.endswith(('.jsonl', '.jsonl.gz'))]
+        if not attachments:
+            await ctx.send("❌ Attach a `.jsonl` or `.jsonl.gz` export made with `!char export`", batchable=True)
+            return
+        
+        replace = mode.lower() == "replace"
+        status = await ctx.send(f"📥 Importing `{attachments[0].filename}`...")
+        progress = self._progress_reporter(status, "📥 Importing characters...")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            # Never trust the uploaded file name on disk
+            path = Path(tmp) / ("import.jsonl.gz" if attachments[0].filename.endswith('.gz') else "import.jsonl")
+            await attachments[0].save(path)
+            
+            try:
+                async with self._guild_lock(ctx.guild.id):
+                    with open_archive(path) as fp:
+                        stats = await self.storage.import_guild(ctx.guild.id, fp, replace=replace, progress=progress)
+            except (ValueError, OSError, EOFError) as e:
+                await self.bot.outbound.edit(ctx.channel.id, status, content=f"❌ Import failed: {e}")
+                return
+            finally:
+                self._invalidate_guild(ctx.guild.id)
+                self._invalidate_macros(ctx.guild.id)
+        
+        embed = discord.Embed(
+            title="📥 Import Complete",
+            color=discord.Color.green() if not stats['invalid'] else discord.Color.orange()
+        )
+        embed.add_field(name="Imported", value=str(stats['imported']), inline=True)
+        embed.add_field(name="Replaced", value=str(stats['replaced']), inline=True)
+        embed.add_field(name="Skipped", value=str(stats['skipped']), inline=True)
+        embed.add_field(name="Invalid", value=str(stats['invalid']), inline=True)
+        if stats['errors']:
+            embed.add_field(name="Problems", value="\n".join(stats['errors'][:5]), inline=False)
+        if stats['skipped'] and not replace:
+            embed.set_footer(text="Existing names were skipped • Use !char import replace to overwrite them")
+        
+        await self.bot.outbound.edit(ctx.channel.id, status, content=None, embed=embed)
+    
+    async def _not_found_message(self, guild_id: int, character_name: str) -> str:
+        """Not-found error with autocomplete suggestions from the guild index"""
+        # Suggest names sharing the longest possible prefix with the query
+        suggestions = await self.storage.closest_names(guild_id, character_name, limit=5)
+        
+        message = f"❌ Character '{character_name}' not found!"
+        if suggestions:
+            message += " Did you mean: " + ", ".join(f"`{data['name']}`" for _, _, data in suggestions) + "?"
+        return message
 
 async def setup(bot):
     await bot.add_cog(Characters(bot))
\ No newline at end of file
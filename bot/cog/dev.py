@@ -1,12 +1,20 @@
 import discord
 from discord.ext import commands, tasks
+import asyncio
+import io
+import json
 import logging
+import pstats
 import sys
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.config import Config
+from bot.utils.dice_source import dice_source
+from bot.utils.profiling import LoopProfiler, MemoryProfiler, measure_loop_lag, percentiles
+from bot.utils.tracing import tracer
+from bot.utils.storage_format import available_formats
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +24,8 @@ class Development(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.file_timestamps = {}
+        self.profiler = LoopProfiler()
+        self.memory = MemoryProfiler()
         
         if Config.ENABLE_HOT_RELOAD:
             self.file_watcher.start()
@@ -25,6 +35,10 @@ class Development(commands.Cog):
         """Clean up when cog is unloaded"""
         if hasattr(self, 'file_watcher'):
             self.file_watcher.cancel()
+        if self.profiler.running:
+            self.profiler.stop()
+        if self.memory.running:
+            self.memory.stop()
     
     @tasks.loop(seconds=2.0)
     async def file_watcher(self):
@@ -135,9 +149,10 @@ class Development(commands.Cog):
                 cog_path = f"bot.cog.{cog_name}" if not cog_name.startswith('bot.cog.') else cog_name
                 
                 if cog_path not in self.bot.extensions:
-                    await ctx.send(f"❌ Cog `{cog_path}` is not loaded")
+                    await ctx.send(f"❌ Cog `{cog_path}` is not loaded", batchable=True)
                     return
                 
+                adopted = self.bot.handoff.adopted
                 await self.bot.reload_extension(cog_path)
                 logger.info(f"Reloaded cog: {cog_path}")
                 
@@ -146,11 +161,13 @@ class Development(commands.Cog):
                     description=f"Successfully reloaded `{cog_path}`",
                     color=discord.Color.green()
                 )
+                if self.bot.handoff.adopted > adopted:
+                    embed.set_footer(text="Caches, unsaved changes and running writers were kept")
                 await ctx.send(embed=embed)
                 
         except Exception as e:
             logger.error(f"Error reloading cog: {e}")
-            await ctx.send(f"❌ Error reloading cog: {str(e)}")
+            await ctx.send(f"❌ Error reloading cog: {str(e)}", batchable=True)
     
     @commands.command(name='load')
     @commands.is_owner()
@@ -163,7 +180,7 @@ class Development(commands.Cog):
             cog_path = f"bot.cog.{cog_name}" if not cog_name.startswith('bot.cog.') else cog_name
             
             if cog_path in self.bot.extensions:
-                await ctx.send(f"❌ Cog `{cog_path}` is already loaded")
+                await ctx.send(f"❌ Cog `{cog_path}` is already loaded", batchable=True)
                 return
             
             await self.bot.load_extension(cog_path)
@@ -178,7 +195,7 @@ class Development(commands.Cog):
             
         except Exception as e:
             logger.error(f"Error loading cog: {e}")
-            await ctx.send(f"❌ Error loading cog: {str(e)}")
+            await ctx.send(f"❌ Error loading cog: {str(e)}", batchable=True)
     
     @commands.command(name='unload')
     @commands.is_owner()
@@ -191,11 +208,11 @@ class Development(commands.Cog):
             cog_path = f"bot.cog.{cog_name}" if not cog_name.startswith('bot.cog.') else cog_name
             
             if cog_path == 'bot.cog.dev':
-                await ctx.send("❌ Cannot unload development cog")
+                await ctx.send("❌ Cannot unload development cog", batchable=True)
                 return
             
             if cog_path not in self.bot.extensions:
-                await ctx.send(f"❌ Cog `{cog_path}` is not loaded")
+                await ctx.send(f"❌ Cog `{cog_path}` is not loaded", batchable=True)
                 return
             
             await self.bot.unload_extension(cog_path)
@@ -210,7 +227,7 @@ class Development(commands.Cog):
             
         except Exception as e:
             logger.error(f"Error unloading cog: {e}")
-            await ctx.send(f"❌ Error unloading cog: {str(e)}")
+            await ctx.send(f"❌ Error unloading cog: {str(e)}", batchable=True)
     
     @commands.command(name='listcogs')
     @commands.is_owner()
@@ -243,7 +260,7 @@ class Development(commands.Cog):
             )
             await ctx.send(embed=embed)
         except Exception as e:
-            await ctx.send(f"❌ Error syncing commands: {str(e)}")
+            await ctx.send(f"❌ Error syncing commands: {str(e)}", batchable=True)
     
     @commands.command(name='watchstatus')
     @commands.is_owner()
@@ -276,6 +293,329 @@ class Development(commands.Cog):
         
         await ctx.send(embed=embed)
     
+    @commands.command(name='dicebuffer')
+    @commands.is_owner()
+    async def dice_buffer_status(self, ctx, action: str = None):
+        """
+        Show dice buffer hit/miss counters
+        Usage: !dicebuffer [reset]
+        """
+        if action and action.lower() == 'reset':
+            dice_source.reset_stats()
+            await ctx.send("✅ Dice buffer counters reset")
+            return
+        
+        stats = dice_source.stats()
+        embed = discord.Embed(title="🎲 Dice Buffer Stats", color=discord.Color.blue())
+        embed.add_field(name="Hits", value=str(stats['hits']), inline=True)
+        embed.add_field(name="Misses", value=str(stats['misses']), inline=True)
+        embed.add_field(name="Hit Rate", value=f"{stats['hit_rate']:.1%}", inline=True)
+        embed.add_field(name="Refills", value=str(stats['refills']), inline=True)
+        embed.add_field(
+            name="Buffer Size",
+            value=f"{stats['buffer_size']} (low water: {stats['low_water']})",
+            inline=True
+        )
+        
+        per_sides = []
+        for sides, counters in stats['sides'].items():
+            per_sides.append(
+                f"`d{sides}`: {counters['hits']} hits, {counters['misses']} misses, "
+                f"{counters['refills']} refills, level {counters['level']}"
+            )
+        embed.add_field(name="Per Die", value="\n".join(per_sides), inline=False)
+        
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='migratestorage')
+    @commands.is_owner()
+    async def migrate_storage(self, ctx, fmt: str = None):
+        """
+        Rewrite character files in another storage format
+        Usage: !migratestorage [pretty|compact|gzip|zstd|msgpack]
+        """
+        characters_cog = self.bot.get_cog('Characters')
+        if characters_cog is None:
+            await ctx.send("❌ Characters cog is not loaded", batchable=True)
+            return
+        
+        storage = characters_cog.storage
+        store = storage.store
+        formats = available_formats()
+        if fmt is None:
+            options = ", ".join(f"`{name}`" for name, usable in formats.items() if usable)
+            await ctx.send(f"💾 Characters are stored as `{store.format}`. Available formats: {options}")
+            return
+        
+        fmt = fmt.lower()
+        if not formats.get(fmt):
+            await ctx.send(f"❌ Unknown or unavailable storage format `{fmt}`", batchable=True)
+            return
+        
+        async with ctx.typing():
+            stats = await storage.run(store.migrate, fmt)
+        
+        before, after = stats['bytes_before'], stats['bytes_after']
+        embed = discord.Embed(
+            title="💾 Storage Migration",
+            description=f"Characters are now stored as `{fmt}`",
+            color=discord.Color.green() if not stats['failed'] else discord.Color.orange()
+        )
+        embed.add_field(name="Guilds", value=str(stats['guilds']), inline=True)
+        embed.add_field(name="Failed", value=str(stats['failed']), inline=True)
+        embed.add_field(
+            name="Size",
+            value=f"{before:,} → {after:,} bytes" + (f" ({after / before:.0%})" if before else ""),
+            inline=True
+        )
+        embed.set_footer(text="Set CHARACTER_FORMAT to keep this format after a restart")
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='cachestats')
+    @commands.is_owner()
+    async def cache_stats(self, ctx):
+        """
+        Show character data cache usage, hit rate and evictions
+        Usage: !cachestats
+        """
+        characters_cog = self.bot.get_cog('Characters')
+        if characters_cog is None:
+            await ctx.send("❌ Characters cog is not loaded", batchable=True)
+            return
+        
+        storage = characters_cog.storage
+        stats = await storage.run(storage.store.cache_stats)
+        used_mb = stats['bytes'] / (1024 * 1024)
+        budget_mb = stats['max_bytes'] / (1024 * 1024)
+        
+        embed = discord.Embed(title="🗄️ Character Cache Stats", color=discord.Color.blue())
+        embed.add_field(
+            name="Memory",
+            value=f"{used_mb:.1f} / {budget_mb:.0f} MB ({stats['bytes'] / stats['max_bytes']:.0%})",
+            inline=True
+        )
+        embed.add_field(name="Hit Rate", value=f"{stats['hit_rate']:.1%}", inline=True)
+        embed.add_field(name="Hits / Misses", value=f"{stats['hits']} / {stats['misses']}", inline=True)
+        embed.add_field(
+            name="Resident",
+            value=f"{stats['guilds']} guilds, {stats['documents']} characters, {stats['note_chunks']} note chunks",
+            inline=False
+        )
+        embed.add_field(name="Evictions", value=str(stats['evictions']), inline=True)
+        embed.add_field(name="Write-backs", value=str(stats['write_backs']), inline=True)
+        embed.add_field(name="Unsaved Guilds", value=str(stats['dirty_guilds']), inline=True)
+        
+        rerolls = self.bot.reroll_cache.stats()
+        embed.add_field(
+            name="Reroll Cache",
+            value=(
+                f"{rerolls['entries']} / {rerolls['max_entries']} roll messages, ~{rerolls['bytes'] / 1024:.0f} KB, "
+                f"{rerolls['hits']} hits / {rerolls['misses']} misses"
+            ),
+            inline=False
+        )
+        
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='outbound')
+    @commands.is_owner()
+    async def outbound_stats(self, ctx):
+        """
+        Show outgoing message queue depths and how much was coalesced
+        Usage: !outbound
+        """
+        stats = self.bot.outbound.stats()
+        embed = discord.Embed(title="📤 Outbound Queue Stats", color=discord.Color.blue())
+        embed.add_field(
+            name="Queued",
+            value=f"{stats['queued']} in {stats['channels']} channels ({stats['hot']} hot)",
+            inline=True
+        )
+        embed.add_field(name="Peak Depth", value=str(stats['peak_depth']), inline=True)
+        embed.add_field(name="Sent / Edits", value=f"{stats['sent']} / {stats['edits']}", inline=True)
+        embed.add_field(name="Coalesced Edits", value=str(stats['coalesced_edits']), inline=True)
+        embed.add_field(name="Dropped Frames", value=str(stats['dropped_frames']), inline=True)
+        embed.add_field(name="Batched Replies", value=str(stats['batched_replies']), inline=True)
+        if stats['deepest']:
+            embed.add_field(
+                name="Deepest Queues",
+                value="\n".join(f"<#{channel_id}>: {depth}" for depth, channel_id in stats['deepest']),
+                inline=False
+            )
+        
+        await ctx.send(embed=embed)
+    
+    @commands.group(name='profile', invoke_without_command=True)
+    @commands.is_owner()
+    async def profile(self, ctx):
+        """
+        Show whether the event loop profiler is running
+        Usage: !profile [start|stop [top] [sort] [filter]]
+        """
+        if self.profiler.running:
+            await ctx.send(f"⏱️ Profiling for {self.profiler.elapsed:.0f}s. `!profile stop` for the results")
+        else:
+            await ctx.send("⏱️ The profiler is off. `!profile start` to begin")
+    
+    @profile.command(name='start')
+    @commands.is_owner()
+    async def profile_start(self, ctx):
+        """Profile everything the event loop runs until !profile stop"""
+        try:
+            self.profiler.start()
+        except ValueError as e:
+            await ctx.send(f"❌ {e}", batchable=True)
+            return
+        logger.info("Profiler started")
+        await ctx.send("✅ Profiling the event loop. `!profile stop` for the results")
+    
+    @profile.command(name='stop')
+    @commands.is_owner()
+    async def profile_stop(self, ctx, top: int = 30, sort: str = 'cumulative', *, restrict: str = None):
+        """
+        Stop profiling and attach the top functions
+        Usage: !profile stop [top] [cumulative|tottime|calls|...] [filename regex]
+        """
+        if sort not in pstats.Stats.sort_arg_dict_default:
+            await ctx.send(f"❌ Unknown sort `{sort}`. Try `cumulative`, `tottime` or `calls`", batchable=True)
+            return
+        top = max(1, min(top, 500))
+        try:
+            report = self.profiler.stop(top, sort, restrict)
+        except ValueError as e:
+            await ctx.send(f"❌ {e}", batchable=True)
+            return
+        logger.info(f"Profiler stopped after {report.seconds:.1f}s")
+        
+        embed = discord.Embed(title="⏱️ Profile", color=discord.Color.blue())
+        embed.add_field(name="Duration", value=f"{report.seconds:.1f}s", inline=True)
+        embed.add_field(name="Calls", value=f"{report.calls:,}", inline=True)
+        embed.add_field(name="CPU in Python", value=f"{report.cpu_seconds:.2f}s", inline=True)
+        embed.set_footer(text=f"Top {top} by {sort}" + (f" matching {restrict}" if restrict else "")
+                         + " | open profile.prof with pstats or snakeviz")
+        await ctx.send(embed=embed, files=[
+            discord.File(io.BytesIO(report.text.encode()), filename="profile.txt"),
+            discord.File(io.BytesIO(report.raw), filename="profile.prof"),
+        ])
+    
+    @commands.group(name='memprofile', invoke_without_command=True)
+    @commands.is_owner()
+    async def memprofile(self, ctx, top: int = 30):
+        """
+        Snapshot allocations and attach what grew since the last snapshot
+        Usage: !memprofile [top] | !memprofile start [frames] | !memprofile stop
+        """
+        if not self.memory.running:
+            await ctx.send("❌ Memory tracing is off. `!memprofile start` to begin", batchable=True)
+            return
+        # Diffing walks every traced allocation; keep it off the event loop
+        diff = await asyncio.get_running_loop().run_in_executor(None, self.memory.snapshot, max(1, min(top, 500)))
+        
+        embed = discord.Embed(title="🧠 Memory Snapshot", color=discord.Color.blue())
+        embed.add_field(name="Traced", value=f"{diff.current / 1024 / 1024:.1f} MB", inline=True)
+        embed.add_field(name="Peak", value=f"{diff.peak / 1024 / 1024:.1f} MB", inline=True)
+        embed.add_field(
+            name=f"Change over {diff.seconds:.0f}s",
+            value=f"{diff.size_diff / 1024:+,.0f} KB in {diff.count_diff:+,} blocks",
+            inline=True
+        )
+        await ctx.send(embed=embed, file=discord.File(io.BytesIO(diff.text.encode()), filename="memory.txt"))
+    
+    @memprofile.command(name='start')
+    @commands.is_owner()
+    async def memprofile_start(self, ctx, frames: int = 1):
+        """Start tracing allocations, keeping ``frames`` of traceback for each"""
+        try:
+            self.memory.start(max(1, min(frames, 25)))
+        except ValueError as e:
+            await ctx.send(f"❌ {e}", batchable=True)
+            return
+        logger.info("Memory tracing started")
+        await ctx.send("✅ Tracing allocations. Each `!memprofile` diffs a new snapshot against the last")
+    
+    @memprofile.command(name='stop')
+    @commands.is_owner()
+    async def memprofile_stop(self, ctx):
+        """Stop tracing allocations"""
+        if not self.memory.running:
+            await ctx.send("❌ Memory tracing isn't running", batchable=True)
+            return
+        self.memory.stop()
+        logger.info("Memory tracing stopped")
+        await ctx.send("✅ Memory tracing stopped")
+    
+    @commands.command(name='looplag')
+    @commands.is_owner()
+    async def loop_lag(self, ctx, seconds: float = 10.0):
+        """
+        Sample how late the event loop runs scheduled callbacks
+        Usage: !looplag [seconds]
+        """
+        seconds = max(1.0, min(seconds, 60.0))
+        lags = await measure_loop_lag(seconds)
+        points = percentiles(lags, (50, 90, 99))
+        
+        embed = discord.Embed(title="🐌 Event Loop Lag", color=discord.Color.blue())
+        for point, lag in points.items():
+            embed.add_field(name=f"p{point}", value=f"{lag * 1000:.2f} ms", inline=True)
+        embed.add_field(name="Max", value=f"{(lags[-1] if lags else 0.0) * 1000:.2f} ms", inline=True)
+        embed.set_footer(text=f"{len(lags)} samples over {seconds:.0f}s")
+        await ctx.send(embed=embed)
+    
+    @commands.group(name='traces', invoke_without_command=True)
+    @commands.is_owner()
+    async def traces(self, ctx, count: int = 5):
+        """
+        Show the slowest recently traced invocations, span by span
+        Usage: !traces [count] | !traces sample <rate> | !traces export [count] | !traces clear
+        """
+        recent = tracer.recent()
+        embed = discord.Embed(title="🧵 Slowest Traces", color=discord.Color.blue())
+        for trace in tracer.slowest(max(1, min(count, 10))):
+            spans = "\n".join(
+                f"`{name}` {ms:.1f} ms" for name, ms in list(trace.breakdown().items())[:6]
+            ) or "No spans"
+            error = f" ({trace.attrs['error']})" if 'error' in trace.attrs else ""
+            embed.add_field(name=f"{trace.name}: {trace.duration:.1f} ms{error}", value=spans, inline=False)
+        if not recent:
+            embed.description = (
+                "Nothing traced yet." if tracer.sample_rate > 0 else "Tracing is off. Turn it on with `!traces sample 0.1`"
+            )
+        embed.set_footer(text=f"Sampling {tracer.sample_rate:.0%} | {len(recent)} recent traces | !traces export for Chrome/Perfetto")
+        await ctx.send(embed=embed)
+    
+    @traces.command(name='sample')
+    @commands.is_owner()
+    async def traces_sample(self, ctx, rate: float):
+        """Trace this share of commands and roll listeners, from 0 (off) to 1 (all)"""
+        if not 0 <= rate <= 1:
+            await ctx.send("❌ The sample rate goes from 0 (off) to 1 (every command)", batchable=True)
+            return
+        tracer.sample_rate = rate
+        logger.info(f"Trace sample rate set to {rate}")
+        await ctx.send(f"✅ Tracing {rate:.0%} of commands" if rate else "✅ Tracing is off")
+    
+    @traces.command(name='export')
+    @commands.is_owner()
+    async def traces_export(self, ctx, count: int = None):
+        """Attach recent traces (the slowest ``count``, or all) as Chrome trace-event JSON"""
+        traces = tracer.slowest(count) if count else tracer.recent()
+        if not traces:
+            await ctx.send("❌ No traces recorded", batchable=True)
+            return
+        data = json.dumps(tracer.chrome_trace(traces)).encode()
+        await ctx.send(
+            f"🧵 {len(traces)} traces. Open in chrome://tracing or ui.perfetto.dev",
+            file=discord.File(io.BytesIO(data), filename="traces.json")
+        )
+    
+    @traces.command(name='clear')
+    @commands.is_owner()
+    async def traces_clear(self, ctx):
+        """Forget recorded traces"""
+        tracer.clear()
+        await ctx.send("✅ Traces cleared")
+    
     @commands.command(name='hotreload')
     @commands.is_owner()
     async def toggle_hot_reload(self, ctx, enable: str = None):
@@ -1,21 +1,176 @@
 import discord
 from discord.ext import commands
-import random
 import logging
 import asyncio
-from typing import Optional
+import struct
+from datetime import datetime, timezone
+from typing import Any, Dict, NamedTuple, Optional
 
-from ..utils.dice_parser import DiceParser
+from ..utils.dice_parser import DiceParser, scan_inline_rolls
+from ..utils.dice_source import SeededDice, dice_source
+from ..utils.roll_audit import RollAudit
+from ..utils.roll_history import GUILD_TOTAL, RollAggregate, RollHistory
+from ..utils.rate_limiter import estimate_cost
+from ..utils.roll_macros import CompiledRoll, RerollPlan
+from ..utils.stat_blocks import roll_stat_blocks
+from ..utils.stat_systems import STAT_SYSTEMS, get_stat_system
+from ..utils.tracing import traced, tracer
 from config.config import Config
 
 logger = logging.getLogger(__name__)
 
+REROLL_EMOJI = "🔁"
+
+class RerollOrigin(NamedTuple):
+    """Who rerolled where: stands in for a Context when a reaction triggers a roll"""
+    author: discord.abc.User
+    channel: discord.abc.Messageable
+    guild: Optional[discord.Guild]
+
 class DiceRolling(commands.Cog):
     """Dice rolling commands for D&D"""
     
-    def __init__(self, bot):
+    def __init__(self, bot, history: Optional[RollHistory] = None, audit: Optional[RollAudit] = None):
         self.bot = bot
         self.parser = DiceParser(Config.MAX_DICE, Config.MAX_SIDES)
+        # After a reload, keep the previous instance's history and audit running: their aggregates,
+        # unwritten records and each channel's seeded dice carry on where they were
+        self._exported = False
+        self._warm = bot.handoff.take(self.qualified_name) if history is None and audit is None else None
+        if self._warm is not None:
+            history, audit = self._warm['history'], self._warm['audit']
+        if history is None and Config.ENABLE_ROLL_HISTORY:
+            history = RollHistory(
+                batch_size=Config.ROLL_HISTORY_BATCH_SIZE,
+                flush_interval=Config.ROLL_HISTORY_FLUSH_SECONDS
+            )
+        self.history = history
+        if audit is None and Config.ENABLE_ROLL_AUDIT:
+            audit = RollAudit(
+                batch_size=Config.ROLL_HISTORY_BATCH_SIZE,
+                flush_interval=Config.ROLL_HISTORY_FLUSH_SECONDS
+            )
+        self.audit = audit
+    
+    async def cog_load(self):
+        # Whatever the instance this one replaced handed over is already running
+        warm, self._warm = self._warm or {}, None
+        if self.history is not None and self.history is not warm.get('history'):
+            await self.history.start()
+        if self.audit is not None and self.audit is not warm.get('audit'):
+            await self.audit.start()
+    
+    async def export_state(self) -> Dict[str, Any]:
+        """Hand the running history and audit writers to the reloaded cog"""
+        self._exported = True
+        return {'history': self.history, 'audit': self.audit}
+    
+    @staticmethod
+    async def release_state(state: Dict[str, Any]):
+        """Write everything pending and stop the writers"""
+        if state['history'] is not None:
+            await state['history'].stop()
+        if state['audit'] is not None:
+            await state['audit'].stop()
+    
+    async def cog_unload(self):
+        if not self._exported:
+            await self.release_state({'history': self.history, 'audit': self.audit})
+    
+    async def _open_audit(self, ctx) -> bool:
+        """Get the channel's audit chain ready; False if rolls aren't audited"""
+        if self.audit is None:
+            return False
+        await self.audit.open(ctx.channel.id)
+        return True
+    
+    def _audited(self, ctx, kind: str, expression: str, roll):
+        """
+        Make an audited roll: ``roll(dice)`` rolls with the channel's seeded dice
+        and returns a result whose 'total' is chained to the audit log.
+        Returns (roll id or None, result). The channel must be open already.
+        """
+        if self.audit is None:
+            return None, roll(dice_source)
+        roll_id, dice = self.audit.draw(ctx.channel.id)
+        result = roll(dice)
+        try:
+            self.audit.record(ctx.channel.id, roll_id, ctx.author.id, kind, expression, result['total'])
+        except struct.error as e:
+            logger.warning(f"Roll not audited for {ctx.author}: {e}")
+            return None, result
+        return roll_id, result
+    
+    @traced('parse')
+    async def _compile_roll(self, ctx, text: str):
+        """
+        Compile what was typed after !roll: plain expressions come straight from
+        the parser's plan cache; macros and @STAT references from the roller's
+        active character. Returns (CompiledRoll, character name or None).
+        """
+        if '@' not in text:
+            plan = self.parser.compile(text)
+            if plan is not None:
+                return CompiledRoll(text, plan), None
+        
+        characters = self.bot.get_cog('Characters')
+        book = None
+        if characters is not None and ctx.guild is not None:
+            book = await characters.macro_book(ctx.guild.id, ctx.author.id)
+        if book is None:
+            if '@' in text:
+                raise ValueError("Stat references need an active character. Pick one with `!char use <name>`")
+            raise ValueError("Invalid dice expression")
+        return book.compile(text, self.parser), book.name
+    
+    def _roll_compiled(self, compiled: CompiledRoll, dice):
+        """Roll a compiled expression with the given dice"""
+        return self.parser.format_result(self.parser.roll_plan(compiled.plan, compiled.expression, dice))
+    
+    def _roll_expression(self, expression: str, dice):
+        """Parse and roll an expression with the given dice"""
+        parsed = self.parser.parse_expression(expression, source=dice)
+        if not parsed:
+            raise ValueError("Invalid dice expression")
+        return self.parser.format_result(parsed)
+    
+    @staticmethod
+    def _roll_pair(dice, modifier: int, pick):
+        """Roll 2d20 for advantage (pick=max) or disadvantage (pick=min)"""
+        roll1, roll2 = dice.roll_many(2, 20)
+        chosen = pick(roll1, roll2)
+        return {'rolls': (roll1, roll2), 'chosen': chosen, 'total': chosen + modifier}
+    
+    def _record_roll(self, ctx, kind: str, groups, modifier: int, total: int):
+        """Add a roll to the history, if one is kept"""
+        if self.history is None:
+            return
+        try:
+            self.history.record(
+                ctx.guild.id if ctx.guild else None, ctx.channel.id, ctx.author.id,
+                kind, groups, modifier, total
+            )
+        except (struct.error, ValueError) as e:
+            # Out-of-range values (e.g. a giant modifier) can't be packed; the roll itself stands
+            logger.warning(f"Roll not recorded for {ctx.author}: {e}")
+    
+    @staticmethod
+    def _roll_footer(ctx, first_id: Optional[int], last_id: Optional[int] = None,
+                     character: Optional[str] = None) -> str:
+        """Footer naming the roller (and character) and the roll ids to !verify"""
+        footer = f"Rolled by {ctx.author.display_name}"
+        if character:
+            footer += f" as {character}"
+        if first_id is not None and last_id not in (None, first_id):
+            footer += f" | Rolls #{first_id}–#{last_id}"
+        elif first_id is not None:
+            footer += f" | Roll #{first_id}"
+        return footer
+    
+    @staticmethod
+    def _roll_groups(rolls):
+        """History groups (sides, faces) for a parsed expression's rolls"""
+        return [(roll['sides'], roll['rolls']) for roll in rolls]
     
     @commands.command(name='roll', aliases=['r'])
     async def roll_dice(self, ctx, *, expression: str):
@@ -26,11 +181,27 @@ class DiceRolling(commands.Cog):
             !roll 1d20
             !roll 2d6+3
             !roll 1d20+1d4+2
+            !roll 1d20+7; 1d20+7; 2d6+4
         """
         try:
-            parsed = self.parser.parse_expression(expression)
-            if not parsed:
+            texts = [text.strip() for text in expression.split(';')] if ';' in expression else [expression]
+            texts = [text for text in texts if text]
+            if not texts:
                 raise ValueError("Invalid dice expression")
+            if len(texts) > Config.MAX_BATCH_ROLLS:
+                raise ValueError(f"Maximum {Config.MAX_BATCH_ROLLS} expressions per roll")
+            
+            # Compile the whole batch before rolling, so one bad expression rolls nothing
+            batch, character = [], None
+            for text in texts:
+                try:
+                    compiled, name = await self._compile_roll(ctx, text)
+                except ValueError as e:
+                    raise ValueError(f"`{text}`: {e}" if len(texts) > 1 else str(e)) from None
+                batch.append((text, compiled))
+                character = character or name
+            
+            rolled = await self._roll_batch(ctx, batch)
             
             # Create initial animation embed if animations are enabled
             if Config.ENABLE_ANIMATIONS:
@@ -57,45 +228,216 @@ class DiceRolling(commands.Cog):
                 for frame in animation_frames:
                     rolling_embed.colour = frame["color"]
                     rolling_embed.set_field_at(0, name="Status", value=frame["emoji"], inline=False)
-                    await message.edit(embed=rolling_embed)
+                    # Frames are dropped rather than queued when the channel is busy
+                    self.bot.outbound.edit(ctx.channel.id, message, frame=True, embed=rolling_embed.copy())
                     if not frame is animation_frames[-1]:  # Don't sleep on the last frame
                         await asyncio.sleep(Config.ANIMATION_DELAY)
             
-            # Calculate the actual result
-            result = self.parser.format_result(parsed)
-            
             # Create the final result embed
-            embed = discord.Embed(
-                title="🎲 Dice Roll",
-                color=discord.Color.blue()
-            )
-            embed.add_field(name="Expression", value=f"`{expression}`", inline=False)
-            embed.add_field(name="Details", value=result['details'], inline=False)
-            embed.add_field(name="Total", value=f"**{result['total']}**", inline=True)
-            
-            # Check for critical rolls on d20s
-            for roll in result['rolls']:
-                if roll['sides'] == 20 and roll['num_dice'] == 1:
-                    if roll['rolls'][0] == 20:
-                        embed.add_field(name="💫 Critical!", value="Natural 20!", inline=True)
-                    elif roll['rolls'][0] == 1:
-                        embed.add_field(name="💀 Critical Fail!", value="Natural 1!", inline=True)
-            
-            embed.set_footer(text=f"Rolled by {ctx.author.display_name}")
+            if len(batch) > 1:
+                embed = self._batch_embed(ctx, batch, rolled, character)
+            else:
+                (text, compiled), (roll_id, result) = batch[0], rolled[0]
+                embed = self._roll_embed(ctx, text, compiled, roll_id, result, character)
             
             # Update the message with final result if animation was shown, otherwise send new message
             if Config.ENABLE_ANIMATIONS and 'message' in locals():
-                await message.edit(embed=embed)
+                with tracer.span('edit'):
+                    await self.bot.outbound.edit(ctx.channel.id, message, embed=embed)
             else:
-                await ctx.send(embed=embed)
+                message = await ctx.send(embed=embed)
+            await self._offer_reroll(message, ctx.author.id, batch, character)
             
         except ValueError as e:
-            await ctx.send(f"❌ Error: {str(e)}")
+            await ctx.send(f"❌ Error: {str(e)}", batchable=True)
             logger.warning(f"Invalid roll from {ctx.author}: {expression}")
         except Exception as e:
-            await ctx.send("❌ An unexpected error occurred while rolling dice.")
+            await ctx.send("❌ An unexpected error occurred while rolling dice.", batchable=True)
             logger.error(f"Error in roll command: {str(e)}", exc_info=True)
     
+    @traced('roll')
+    async def _roll_batch(self, ctx, batch):
+        """Roll compiled (text, CompiledRoll) pairs through the audit chain and history"""
+        await self._open_audit(ctx)
+        rolled = []
+        for text, compiled in batch:
+            roll_id, result = self._audited(
+                ctx, 'roll', compiled.expression, lambda dice: self._roll_compiled(compiled, dice)
+            )
+            self._record_roll(ctx, 'roll', self._roll_groups(result['rolls']), result['modifier'], result['total'])
+            rolled.append((roll_id, result))
+        return rolled
+    
+    async def _offer_reroll(self, message, author_id: int, batch, character: Optional[str]):
+        """Remember what ``message`` rolled and add the 🔁 reaction that rolls it again"""
+        if not Config.ENABLE_REROLL_REACTIONS or message is None:
+            return
+        self.bot.reroll_cache.set(message.id, RerollPlan(author_id, tuple(batch), character))
+        try:
+            await message.add_reaction(REROLL_EMOJI)
+        except discord.HTTPException as e:
+            logger.debug(f"Couldn't add reroll reaction: {e}")
+    
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        """Reroll a cached roll when its roller reacts with 🔁, skipping parsing and command dispatch"""
+        if payload.emoji.name != REROLL_EMOJI or payload.user_id == self.bot.user.id:
+            return
+        plan = self.bot.reroll_cache.get(payload.message_id)
+        if plan is None or plan.author_id != payload.user_id:
+            return
+        channel = self.bot.get_channel(payload.channel_id)
+        author = payload.member or self.bot.get_user(payload.user_id)
+        if channel is None or author is None:
+            return
+        origin = RerollOrigin(author, channel, getattr(channel, 'guild', None))
+        if self._throttled(origin, [compiled.expression for _, compiled in plan.batch]):
+            return
+        
+        with tracer.trace('reroll', user=author.id, channel=channel.id):
+            try:
+                rolled = await self._roll_batch(origin, plan.batch)
+                if len(plan.batch) > 1:
+                    embed = self._batch_embed(origin, plan.batch, rolled, plan.character)
+                else:
+                    (text, compiled), (roll_id, result) = plan.batch[0], rolled[0]
+                    embed = self._roll_embed(origin, text, compiled, roll_id, result, plan.character)
+                embed.title = f"{REROLL_EMOJI} Reroll"
+                with tracer.span('send'):
+                    message = await self.bot.outbound.send(channel.id, channel.send, embed=embed)
+                await self._offer_reroll(message, author.id, plan.batch, plan.character)
+            except Exception as e:
+                logger.error(f"Error in reroll: {str(e)}", exc_info=True)
+    
+    def _throttled(self, origin, expressions) -> bool:
+        """Charge a roll made outside a command to the rate limiter; True if it's over the limit"""
+        if not Config.ENABLE_RATE_LIMIT:
+            return False
+        return bool(self.bot.rate_limiter.acquire(
+            {
+                'user': origin.author.id,
+                'channel': origin.channel.id,
+                'guild': origin.guild.id if origin.guild else None,
+            },
+            estimate_cost('roll', ' '.join(expressions))
+        ))
+    
+    @traced('format')
+    def _roll_embed(self, ctx, expression: str, compiled: CompiledRoll, roll_id: Optional[int], result,
+                    character: Optional[str]) -> discord.Embed:
+        """Result embed for a single !roll expression"""
+        embed = discord.Embed(
+            title="🎲 Dice Roll",
+            color=discord.Color.blue()
+        )
+        if compiled.expression != expression:
+            embed.add_field(name="Expression", value=f"`{expression}` → `{compiled.expression}`", inline=False)
+        else:
+            embed.add_field(name="Expression", value=f"`{expression}`", inline=False)
+        embed.add_field(name="Details", value=result['details'], inline=False)
+        embed.add_field(name="Total", value=f"**{result['total']}**", inline=True)
+        
+        # Check for critical rolls on d20s
+        for roll in result['rolls']:
+            if roll['sides'] == 20 and roll['num_dice'] == 1:
+                if roll['rolls'][0] == 20:
+                    embed.add_field(name="💫 Critical!", value="Natural 20!", inline=True)
+                elif roll['rolls'][0] == 1:
+                    embed.add_field(name="💀 Critical Fail!", value="Natural 1!", inline=True)
+        
+        embed.set_footer(text=self._roll_footer(ctx, roll_id, character=character))
+        return embed
+    
+    @traced('format')
+    def _batch_embed(self, ctx, batch, rolled, character: Optional[str]) -> discord.Embed:
+        """One embed for a ;-separated batch: a line per expression"""
+        embed = discord.Embed(
+            title="🎲 Dice Rolls",
+            description="\n".join(
+                self._roll_line(text, compiled, result) for (text, compiled), (_, result) in zip(batch, rolled)
+            ),
+            color=discord.Color.blue()
+        )
+        roll_ids = [roll_id for roll_id, _ in rolled if roll_id is not None]
+        embed.set_footer(text=self._roll_footer(
+            ctx, roll_ids[0] if roll_ids else None, roll_ids[-1] if roll_ids else None, character
+        ))
+        return embed
+    
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        """Roll every [[expression]] in an ordinary chat message and reply with one embed"""
+        content = message.content
+        # Nearly every message stops at this substring check
+        if '[[' not in content or not Config.ENABLE_INLINE_ROLLS:
+            return
+        if message.author.bot or content.startswith(Config.PREFIX):
+            return
+        expressions = scan_inline_rolls(content, Config.MAX_INLINE_ROLLS)
+        if not expressions:
+            return
+        
+        # Listeners skip the command checks, so charge the rate limiter here
+        if self._throttled(message, expressions):
+            return
+        
+        # A message carries author, channel and guild like a Context does
+        with tracer.trace('inline roll', user=message.author.id, channel=message.channel.id):
+            try:
+                lines, batch, character = [], [], None
+                for expression in expressions:
+                    try:
+                        compiled, name = await self._compile_roll(message, expression)
+                    except ValueError as e:
+                        lines.append(f"`{expression}` ❌ {e}")
+                        continue
+                    lines.append(None)
+                    batch.append((expression, compiled))
+                    character = name or character
+                
+                # Stray brackets (wiki links and the like) get no reply at all
+                if not batch:
+                    return
+                
+                # Rolled lines fill the gaps left between error lines
+                rolled = iter(zip(batch, await self._roll_batch(message, batch)))
+                roll_ids = []
+                for index, line in enumerate(lines):
+                    if line is None:
+                        (expression, compiled), (roll_id, result) = next(rolled)
+                        if roll_id is not None:
+                            roll_ids.append(roll_id)
+                        lines[index] = self._roll_line(expression, compiled, result)
+                
+                embed = discord.Embed(
+                    title="🎲 Inline Rolls" if len(expressions) > 1 else "🎲 Inline Roll",
+                    description="\n".join(lines),
+                    color=discord.Color.blue()
+                )
+                embed.set_footer(text=self._roll_footer(
+                    message, roll_ids[0] if roll_ids else None, roll_ids[-1] if roll_ids else None, character
+                ))
+                with tracer.span('send'):
+                    reply = await self.bot.outbound.send(
+                        message.channel.id, message.reply, embed=embed, mention_author=False
+                    )
+                await self._offer_reroll(reply, message.author.id, batch, character)
+            except Exception as e:
+                logger.error(f"Error in inline roll: {str(e)}", exc_info=True)
+    
+    @staticmethod
+    def _roll_line(expression: str, compiled: CompiledRoll, result) -> str:
+        """One roll of a batch: the expression, its dice and the total, with crits marked"""
+        shown = f"`{expression}` → `{compiled.expression}`" if compiled.expression != expression else f"`{expression}`"
+        line = f"{shown}: {result['details']} = **{result['total']}**"
+        for roll in result['rolls']:
+            if roll['sides'] == 20 and roll['num_dice'] == 1:
+                if roll['rolls'][0] == 20:
+                    line += " 💫"
+                elif roll['rolls'][0] == 1:
+                    line += " 💀"
+        return line
+    
     @commands.command(name='advantage', aliases=['adv'])
     async def roll_advantage(self, ctx, modifier: Optional[str] = "+0"):
         """Roll with advantage (2d20, take highest)"""
@@ -103,10 +445,12 @@ class DiceRolling(commands.Cog):
             # Parse modifier
             mod = self._parse_modifier(modifier)
             
-            roll1 = random.randint(1, 20)
-            roll2 = random.randint(1, 20)
-            highest = max(roll1, roll2)
-            total = highest + mod
+            await self._open_audit(ctx)
+            roll_id, result = self._audited(
+                ctx, 'advantage', f"{mod:+d}", lambda dice: self._roll_pair(dice, mod, max)
+            )
+            (roll1, roll2), highest, total = result['rolls'], result['chosen'], result['total']
+            self._record_roll(ctx, 'advantage', [(20, (roll1, roll2))], mod, total)
             
             embed = discord.Embed(
                 title="🎲 Advantage Roll",
@@ -128,13 +472,13 @@ class DiceRolling(commands.Cog):
             elif highest == 1:
                 embed.add_field(name="💀 Critical Fail!", value="Natural 1!", inline=False)
             
-            embed.set_footer(text=f"Rolled by {ctx.author.display_name}")
+            embed.set_footer(text=self._roll_footer(ctx, roll_id))
             await ctx.send(embed=embed)
             
         except ValueError as e:
-            await ctx.send(f"❌ Invalid modifier: {modifier}")
+            await ctx.send(f"❌ Invalid modifier: {modifier}", batchable=True)
         except Exception as e:
-            await ctx.send("❌ An error occurred while rolling.")
+            await ctx.send("❌ An error occurred while rolling.", batchable=True)
             logger.error(f"Error in advantage command: {str(e)}", exc_info=True)
     
     @commands.command(name='disadvantage', aliases=['dis'])
@@ -143,10 +487,12 @@ class DiceRolling(commands.Cog):
         try:
             mod = self._parse_modifier(modifier)
             
-            roll1 = random.randint(1, 20)
-            roll2 = random.randint(1, 20)
-            lowest = min(roll1, roll2)
-            total = lowest + mod
+            await self._open_audit(ctx)
+            roll_id, result = self._audited(
+                ctx, 'disadvantage', f"{mod:+d}", lambda dice: self._roll_pair(dice, mod, min)
+            )
+            (roll1, roll2), lowest, total = result['rolls'], result['chosen'], result['total']
+            self._record_roll(ctx, 'disadvantage', [(20, (roll1, roll2))], mod, total)
             
             embed = discord.Embed(
                 title="🎲 Disadvantage Roll",
@@ -168,101 +514,68 @@ class DiceRolling(commands.Cog):
             elif lowest == 1:
                 embed.add_field(name="💀 Critical Fail!", value="Natural 1!", inline=False)
             
-            embed.set_footer(text=f"Rolled by {ctx.author.display_name}")
+            embed.set_footer(text=self._roll_footer(ctx, roll_id))
             await ctx.send(embed=embed)
             
         except ValueError as e:
-            await ctx.send(f"❌ Invalid modifier: {modifier}")
+            await ctx.send(f"❌ Invalid modifier: {modifier}", batchable=True)
         except Exception as e:
-            await ctx.send("❌ An error occurred while rolling.")
+            await ctx.send("❌ An error occurred while rolling.", batchable=True)
             logger.error(f"Error in disadvantage command: {str(e)}", exc_info=True)
     
     @commands.command(name='stats')
-    async def roll_stats(self, ctx, system: Optional[str] = "dnd"):
-        """Roll ability scores using different systems (dnd, adnd, pathfinder, heroic, standard)"""
+    async def roll_stats(self, ctx, system: Optional[str] = "dnd", count: Optional[str] = None):
+        """Roll ability scores using different systems (dnd, adnd, pathfinder, heroic, standard). Add xN for N blocks"""
         try:
             system = system.lower().strip()
             
-            # Define stat rolling systems
-            stat_systems = {
-                "dnd": {
-                    "name": "D&D 5e Standard",
-                    "description": "4d6, drop lowest",
-                    "method": lambda: self._roll_4d6_drop_lowest(),
-                    "rating_thresholds": [78, 72, 66, 60]
-                },
-                "adnd": {
-                    "name": "AD&D 2e Method I",
-                    "description": "3d6 straight",
-                    "method": lambda: self._roll_3d6(),
-                    "rating_thresholds": [72, 66, 60, 54]
-                },
-                "pathfinder": {
-                    "name": "Pathfinder Point Buy Equivalent",
-                    "description": "4d6, drop lowest, reroll if total < 70",
-                    "method": lambda: self._roll_pathfinder_style(),
-                    "rating_thresholds": [78, 74, 70, 66]
-                },
-                "heroic": {
-                    "name": "Heroic Array",
-                    "description": "2d6+6 for each stat",
-                    "method": lambda: self._roll_heroic(),
-                    "rating_thresholds": [84, 78, 72, 66]
-                },
-                "standard": {
-                    "name": "Standard Array",
-                    "description": "Fixed values: 15, 14, 13, 12, 10, 8",
-                    "method": lambda: self._roll_standard_array(),
-                    "rating_thresholds": [72, 72, 72, 72]  # Always the same
-                },
-                "special": {
-                    "name": "SPECIAL System (Fallout)",
-                    "description": "5 + 1d5 for each SPECIAL stat",
-                    "method": lambda: self._roll_special(),
-                    "rating_thresholds": [49, 45, 42, 39]
-                },
-                "cortex": {
-                    "name": "Cortex System",
-                    "description": "Dice steps: d4, d6, d8, d10, d12 distributed",
-                    "method": lambda: self._roll_cortex(),
-                    "rating_thresholds": [54, 48, 42, 36]  # Based on average die values
-                }
-            }
-            
-            if system not in stat_systems:
-                available = ", ".join(stat_systems.keys())
-                await ctx.send(f"❌ Unknown system `{system}`. Available: {available}")
+            # Allow "!stats x5" as shorthand for "!stats dnd x5"
+            if count is None and self._parse_block_count(system) is not None:
+                system, count = "dnd", system
+            
+            system_info = get_stat_system(system)
+            if system_info is None:
+                available = ", ".join(STAT_SYSTEMS.keys())
+                await ctx.send(f"❌ Unknown system `{system}`. Available: {available}", batchable=True)
                 return
             
-            system_info = stat_systems[system]
-            stats = []
+            blocks = 1
+            if count is not None:
+                blocks = self._parse_block_count(count)
+                if blocks is None:
+                    await ctx.send(f"❌ Invalid block count `{count}`. Use e.g. `x5`", batchable=True)
+                    return
+                if blocks < 1 or blocks > Config.MAX_STAT_BLOCKS:
+                    await ctx.send(f"❌ You can roll between 1 and {Config.MAX_STAT_BLOCKS} stat blocks at once!", batchable=True)
+                    return
+            
+            stat_names = system_info.stat_names
+            
+            # Roll every block in one pooled draw
+            stat_blocks = roll_stat_blocks(system_info.method, blocks, len(stat_names))
+            
+            if blocks > 1:
+                embed = self._build_stat_blocks_embed(system_info, stat_blocks)
+                embed.set_footer(text=f"Rolled by {ctx.author.display_name} | System: {system} | {blocks} blocks")
+                await ctx.send(embed=embed)
+                return
             
-            # Roll stats based on the system
-            num_stats = 7 if system == "special" else 6
-            for _ in range(num_stats):
-                stat_data = system_info["method"]()
-                stats.append(stat_data)
+            stats = stat_blocks[0]
             
             embed = discord.Embed(
-                title=f"📊 {system_info['name']}",
-                description=f"{system_info['description']}",
+                title=f"📊 {system_info.name}",
+                description=f"{system_info.description}",
                 color=discord.Color.gold()
             )
             
-            # Choose stat names based on system
-            if system == "special":
-                stat_names = ["STR", "PER", "END", "CHA", "INT", "AGI", "LCK"]
-            else:
-                stat_names = ["STR", "DEX", "CON", "INT", "WIS", "CHA"]
-            
             for _, (stat_data, name) in enumerate(zip(stats, stat_names)):
-                if system == "standard":
+                if system_info.method == "standard_array":
                     embed.add_field(
                         name=f"{name}",
                         value=f"**Total: {stat_data['total']}**",
                         inline=True
                     )
-                elif system == "cortex":
+                elif system_info.method == "cortex":
                     embed.add_field(
                         name=f"{name}",
                         value=f"{stat_data['rolls'][0]}\n**Total: {stat_data['total']}**",
@@ -285,24 +598,18 @@ class DiceRolling(commands.Cog):
             total = sum(stat['total'] for stat in stats)
             avg = total / len(stats)
             
+            summary = f"**Total: {total}** (Average: {avg:.1f})"
+            if system_info.expected_total is not None:
+                summary += f"\nExpected total: {system_info.expected_total:.1f}"
+            
             embed.add_field(
                 name="Summary",
-                value=f"**Total: {total}** (Average: {avg:.1f})",
+                value=summary,
                 inline=False
             )
             
             # Add a rating based on total and system
-            thresholds = system_info["rating_thresholds"]
-            if total >= thresholds[0]:
-                rating = "🌟 Exceptional!"
-            elif total >= thresholds[1]:
-                rating = "✨ Great!"
-            elif total >= thresholds[2]:
-                rating = "👍 Good"
-            elif total >= thresholds[3]:
-                rating = "👌 Average"
-            else:
-                rating = "💪 Challenging"
+            rating = system_info.rate(total)
             
             embed.add_field(name="Rating", value=rating, inline=False)
             embed.set_footer(text=f"Rolled by {ctx.author.display_name} | System: {system}")
@@ -310,105 +617,60 @@ class DiceRolling(commands.Cog):
             await ctx.send(embed=embed)
             
         except Exception as e:
-            await ctx.send("❌ An error occurred while rolling stats.")
+            await ctx.send("❌ An error occurred while rolling stats.", batchable=True)
             logger.error(f"Error in stats command: {str(e)}", exc_info=True)
     
-    def _roll_4d6_drop_lowest(self):
-        """Roll 4d6, drop lowest"""
-        rolls = sorted([random.randint(1, 6) for _ in range(4)], reverse=True)
-        return {
-            'total': sum(rolls[:3]),
-            'kept': rolls[:3],
-            'dropped': rolls[3]
-        }
-    
-    def _roll_3d6(self):
-        """Roll 3d6 straight"""
-        rolls = [random.randint(1, 6) for _ in range(3)]
-        return {
-            'total': sum(rolls),
-            'rolls': rolls
-        }
-    
-    def _roll_pathfinder_style(self):
-        """Roll 4d6 drop lowest, but ensure reasonable stats"""
-        rolls = sorted([random.randint(1, 6) for _ in range(4)], reverse=True)
-        return {
-            'total': sum(rolls[:3]),
-            'kept': rolls[:3],
-            'dropped': rolls[3]
-        }
-    
-    def _roll_heroic(self):
-        """Roll 2d6+6 for heroic characters"""
-        rolls = [random.randint(1, 6) for _ in range(2)]
-        total = sum(rolls) + 6
-        return {
-            'total': total,
-            'rolls': rolls + [6]  # Show the +6 bonus
-        }
-    
-    def _roll_standard_array(self):
-        """Return standard array values in random order"""
-        if not hasattr(self, '_standard_values'):
-            self._standard_values = [15, 14, 13, 12, 10, 8]
-            random.shuffle(self._standard_values)
-        
-        if not self._standard_values:
-            self._standard_values = [15, 14, 13, 12, 10, 8]
-            random.shuffle(self._standard_values)
+    def _build_stat_blocks_embed(self, system_info, stat_blocks):
+        """Build a compact embed showing several stat blocks"""
+        embed = discord.Embed(
+            title=f"📊 {system_info.name} × {len(stat_blocks)}",
+            description=f"{system_info.description}",
+            color=discord.Color.gold()
+        )
         
-        value = self._standard_values.pop()
-        return {
-            'total': value
-        }
-    
-    def _roll_special(self):
-        """Roll SPECIAL stats: 5 + 1d5"""
-        roll = random.randint(1, 5)
-        total = 5 + roll
-        return {
-            'total': total,
-            'rolls': [5, roll]  # Show base 5 + roll
-        }
-    
-    def _roll_cortex(self):
-        """Roll Cortex system dice steps"""
-        if not hasattr(self, '_cortex_dice'):
-            self._cortex_dice = [4, 6, 8, 10, 12, 6]  # d4, d6, d8, d10, d12, extra d6
-            random.shuffle(self._cortex_dice)
-        
-        if not self._cortex_dice:
-            self._cortex_dice = [4, 6, 8, 10, 12, 6]
-            random.shuffle(self._cortex_dice)
+        for i, stats in enumerate(stat_blocks, 1):
+            total = sum(stat['total'] for stat in stats)
+            rating = system_info.rate(total)
+            values = " · ".join(f"**{name}** {stat['total']}" for stat, name in zip(stats, system_info.stat_names))
+            embed.add_field(
+                name=f"Block {i} — Total {total} ({rating})",
+                value=values,
+                inline=False
+            )
         
-        die_size = self._cortex_dice.pop()
-        roll = random.randint(1, die_size)
-        return {
-            'total': roll,
-            'rolls': [f"d{die_size}: {roll}"]
-        }
+        return embed
+    
+    @staticmethod
+    def _parse_block_count(count: str) -> Optional[int]:
+        """Parse a block count like x5, ×5 or 5"""
+        count = count.lower().strip().lstrip('x×')
+        return int(count) if count.isdigit() else None
     
     @commands.command(name='multiroll', aliases=['m'])
     async def multi_roll(self, ctx, times: int, *, expression: str):
         """Roll the same dice expression multiple times"""
         try:
             if times > Config.MAX_MULTIROLL:
-                await ctx.send(f"❌ Maximum {Config.MAX_MULTIROLL} rolls at once!")
+                await ctx.send(f"❌ Maximum {Config.MAX_MULTIROLL} rolls at once!", batchable=True)
                 return
             
             if times < 1:
-                await ctx.send("❌ Must roll at least once!")
+                await ctx.send("❌ Must roll at least once!", batchable=True)
                 return
             
             results = []
+            roll_ids = []
             
+            compiled, character = await self._compile_roll(ctx, expression)
+            await self._open_audit(ctx)
             for i in range(times):
-                parsed = self.parser.parse_expression(expression)
-                if not parsed:
-                    raise ValueError("Invalid dice expression")
-                
-                result = self.parser.format_result(parsed)
+                roll_id, result = self._audited(
+                    ctx, 'multiroll', compiled.expression, lambda dice: self._roll_compiled(compiled, dice)
+                )
+                roll_ids.append(roll_id)
+                self._record_roll(
+                    ctx, 'multiroll', self._roll_groups(result['rolls']), result['modifier'], result['total']
+                )
                 results.append(result['total'])
             
             embed = discord.Embed(
@@ -426,15 +688,147 @@ class DiceRolling(commands.Cog):
             embed.add_field(name="Average", value=f"{sum(results)/len(results):.1f}", inline=True)
             embed.add_field(name="Min/Max", value=f"{min(results)} / {max(results)}", inline=True)
             
-            embed.set_footer(text=f"Rolled by {ctx.author.display_name}")
+            embed.set_footer(text=self._roll_footer(ctx, roll_ids[0], roll_ids[-1], character))
             await ctx.send(embed=embed)
             
         except ValueError as e:
-            await ctx.send(f"❌ Error: {str(e)}")
+            await ctx.send(f"❌ Error: {str(e)}", batchable=True)
         except Exception as e:
-            await ctx.send("❌ An error occurred while rolling.")
+            await ctx.send("❌ An error occurred while rolling.", batchable=True)
             logger.error(f"Error in multiroll command: {str(e)}", exc_info=True)
     
+    @commands.command(name='rollstats')
+    async def roll_statistics(self, ctx, member: Optional[discord.Member] = None, scope: Optional[str] = None):
+        """Show roll statistics for you, another player or the whole server (!rollstats server)"""
+        if self.history is None:
+            await ctx.send("❌ Roll history is disabled on this bot.", batchable=True)
+            return
+        
+        if member is None and scope is not None:
+            if scope.lower() != 'server':
+                await ctx.send("❌ Use `!rollstats`, `!rollstats @user` or `!rollstats server`", batchable=True)
+                return
+            user_id, name = GUILD_TOTAL, ctx.guild.name if ctx.guild else "this chat"
+        else:
+            member = member or ctx.author
+            user_id, name = member.id, member.display_name
+        
+        guild_id = ctx.guild.id if ctx.guild else None
+        lifetime = self.history.stats(guild_id, user_id)
+        session = self.history.stats(guild_id, user_id, session=True)
+        
+        embed = discord.Embed(title=f"📈 Roll Stats: {name}", color=discord.Color.purple())
+        if not lifetime.rolls:
+            embed.description = "No rolls recorded yet."
+            await ctx.send(embed=embed)
+            return
+        
+        embed.add_field(name="All Time", value=self._format_aggregate(lifetime), inline=True)
+        embed.add_field(name="This Session", value=self._format_aggregate(session), inline=True)
+        
+        histogram = lifetime.faces.get(20)
+        if histogram and any(histogram):
+            embed.add_field(
+                name="d20 Faces (1 → 20)",
+                value=f"`{self._sparkline(histogram)}`",
+                inline=False
+            )
+        
+        embed.set_footer(text="Session counts start when the bot starts | Expected nat 20 rate 5.0%")
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='verify')
+    async def verify_roll(self, ctx, roll_id: int, channel: Optional[discord.TextChannel] = None):
+        """Check a roll against the channel's audit chain and replay it from its seed"""
+        if self.audit is None:
+            await ctx.send("❌ Roll auditing is disabled on this bot.", batchable=True)
+            return
+        
+        channel = channel or ctx.channel
+        if channel != ctx.channel and (channel.guild != ctx.guild or not channel.permissions_for(ctx.author).read_messages):
+            # The log shows who rolled what, so only to those who can read the channel
+            await ctx.send(f"❌ You can't read {channel.mention}.", batchable=True)
+            return
+        
+        try:
+            verified = await self.audit.verify(channel.id, roll_id)
+        except Exception as e:
+            await ctx.send("❌ An error occurred while reading the audit log.", batchable=True)
+            logger.error(f"Error in verify command: {str(e)}", exc_info=True)
+            return
+        
+        if verified.broken_at is not None:
+            embed = discord.Embed(
+                title="❌ Audit Chain Broken",
+                description=(
+                    f"The audit log for this channel doesn't match its hash chain at roll #{verified.broken_at}, "
+                    f"so roll #{roll_id} can't be trusted."
+                ),
+                color=discord.Color.red()
+            )
+            await ctx.send(embed=embed)
+            return
+        
+        entry = verified.entry
+        if entry is None:
+            await ctx.send(f"❌ No roll #{roll_id} in the audit log for {channel.mention}.", batchable=True)
+            return
+        
+        dice = SeededDice(entry.seed, entry.roll_id)
+        try:
+            if entry.kind in ('advantage', 'disadvantage'):
+                result = self._roll_pair(dice, int(entry.expression), max if entry.kind == 'advantage' else min)
+                details = f"{result['rolls'][0]}, {result['rolls'][1]} → {result['chosen']} {entry.expression}"
+            else:
+                result = self._roll_expression(entry.expression, dice)
+                details = result['details']
+        except ValueError as e:
+            await ctx.send(f"❌ Roll #{roll_id} can't be replayed with the current dice limits: {e}", batchable=True)
+            return
+        
+        matches = result['total'] == entry.total
+        embed = discord.Embed(
+            title=f"{'✅' if matches else '❌'} Roll #{roll_id} {'Verified' if matches else 'Does Not Match'}",
+            color=discord.Color.green() if matches else discord.Color.red()
+        )
+        embed.add_field(name="Roll", value=f"{entry.kind} `{entry.expression}` by <@{entry.user_id}>", inline=False)
+        embed.add_field(name="Replayed", value=details, inline=False)
+        embed.add_field(name="Recorded Total", value=f"**{entry.total}**", inline=True)
+        embed.add_field(name="Replayed Total", value=f"**{result['total']}**", inline=True)
+        embed.add_field(
+            name="Chain",
+            value=f"{verified.entries_checked} entries intact, digest `{entry.digest.hex()[:16]}`",
+            inline=False
+        )
+        embed.timestamp = datetime.fromtimestamp(entry.timestamp, timezone.utc)
+        await ctx.send(embed=embed)
+    
+    @staticmethod
+    def _format_aggregate(aggregate: RollAggregate) -> str:
+        """Summarize an aggregate for a stats embed field"""
+        if not aggregate.rolls:
+            return "No rolls yet"
+        
+        lines = [f"Rolls: **{aggregate.rolls}** ({aggregate.dice} dice)"]
+        d20s = aggregate.count(20)
+        if d20s:
+            nat20s, nat1s = aggregate.count(20, 20), aggregate.count(20, 1)
+            lines.append(f"d20s: **{d20s}** (avg {aggregate.average(20):.2f})")
+            lines.append(f"Nat 20s: **{nat20s}** ({nat20s / d20s:.1%})")
+            lines.append(f"Nat 1s: **{nat1s}** ({nat1s / d20s:.1%})")
+        
+        most_rolled = sorted(aggregate.faces.items(), key=lambda item: sum(item[1]), reverse=True)[:3]
+        if most_rolled:
+            lines.append("Dice: " + ", ".join(f"d{sides} ×{sum(counts)}" for sides, counts in most_rolled))
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _sparkline(counts) -> str:
+        """One bar character per face, scaled to the most common face"""
+        bars = "▁▂▃▄▅▆▇█"
+        highest = max(counts) or 1
+        return "".join(bars[min(len(bars) - 1, count * len(bars) // (highest + 1))] for count in counts)
+    
     def _parse_modifier(self, modifier: str) -> int:
         """Parse a modifier string into an integer"""
         if not modifier:
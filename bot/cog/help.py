@@ -1,7 +1,9 @@
 import discord
 from discord.ext import commands
+import difflib
 import sys
 from pathlib import Path
+from typing import Dict, Optional
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent.parent))
@@ -14,103 +16,189 @@ class Help(commands.Cog):
         self.bot = bot
         self._original_help_command = bot.help_command
         bot.help_command = None
+        
+        # Rendered once per set of loaded commands; dropped whenever an extension changes
+        self._general_embed: Optional[discord.Embed] = None
+        self._examples_embed: Optional[discord.Embed] = None
+        self._command_embeds: Dict[str, discord.Embed] = {}
+        # Every command and subcommand by qualified name and alias path, lower case
+        self._index: Optional[Dict[str, commands.Command]] = None
     
     def cog_unload(self):
         self.bot.help_command = self._original_help_command
     
+    @commands.Cog.listener()
+    async def on_extensions_changed(self):
+        """Commands were added or removed, so everything rendered is stale"""
+        self._general_embed = None
+        self._command_embeds.clear()
+        self._index = None
+    
+    def _command_index(self) -> Dict[str, commands.Command]:
+        if self._index is None:
+            index = {}
+            
+            def add(cmds, prefixes):
+                for cmd in cmds:
+                    paths = [f"{prefix}{name}".lower() for prefix in prefixes for name in (cmd.name, *cmd.aliases)]
+                    index.update(dict.fromkeys(paths, cmd))
+                    if isinstance(cmd, commands.Group):
+                        add(cmd.commands, [f"{path} " for path in paths])
+            
+            add(self.bot.commands, [''])
+            self._index = index
+        return self._index
+    
     @commands.command(name='help', aliases=['h', 'commands'])
-    async def help_command(self, ctx, command: str = None):
+    async def help_command(self, ctx, *, command: str = None):
         """Show help for commands"""
         
         if command:
             # Show help for specific command
-            cmd = self.bot.get_command(command)
+            query = " ".join(command.lower().lstrip(Config.PREFIX).split())
+            index = self._command_index()
+            cmd = index.get(query)
             if not cmd:
-                await ctx.send(f"❌ Command `{command}` not found.")
+                # One suggestion per command, by its closest name or alias
+                suggestions = {}
+                for name in difflib.get_close_matches(query, index.keys(), n=10, cutoff=0.6):
+                    suggestions.setdefault(index[name], name)
+                suggestions = list(suggestions.values())[:3]
+                hint = f" Did you mean {', '.join(f'`{name}`' for name in suggestions)}?" if suggestions else ""
+                await ctx.send(f"❌ Command `{command}` not found.{hint}", batchable=True)
                 return
             
-            embed = discord.Embed(
-                title=f"Help: {cmd.name}",
-                description=cmd.help or "No description available.",
-                color=discord.Color.blue()
-            )
-            
-            if cmd.aliases:
-                embed.add_field(
-                    name="Aliases",
-                    value=", ".join(f"`{alias}`" for alias in cmd.aliases),
-                    inline=False
-                )
-            
+            embed = self._command_embeds.get(cmd.qualified_name)
+            if embed is None:
+                embed = self._command_embeds[cmd.qualified_name] = self._build_command_embed(cmd)
             await ctx.send(embed=embed)
         else:
-            # Show general help
-            embed = discord.Embed(
-                title="🎲 D&D Dice Bot Help",
-                description="A feature-rich dice rolling bot for D&D 5e",
-                color=discord.Color.blue()
+            if self._general_embed is None:
+                self._general_embed = self._build_general_embed()
+            await ctx.send(embed=self._general_embed)
+    
+    @staticmethod
+    def _build_command_embed(cmd: commands.Command) -> discord.Embed:
+        """Help for one command, shown by !help <command>"""
+        embed = discord.Embed(
+            title=f"Help: {cmd.qualified_name}",
+            description=cmd.help or "No description available.",
+            color=discord.Color.blue()
+        )
+        
+        if cmd.aliases:
+            embed.add_field(
+                name="Aliases",
+                value=", ".join(f"`{alias}`" for alias in cmd.aliases),
+                inline=False
             )
-            
-            # Group commands by category
-            categories = {
-                "🎲 Dice Rolling": [
-                    ("roll [expression]", "Roll dice (e.g., 1d20+5)", "r"),
-                    ("multiroll [times] [expression]", "Roll multiple times", "m"),
-                ],
-                "⚔️ D&D Specific": [
-                    ("advantage [modifier]", "Roll with advantage", "adv"),
-                    ("disadvantage [modifier]", "Roll with disadvantage", "dis"),
-                    ("stats [system]", "Roll ability scores (dnd, adnd, pathfinder, heroic, standard, special, cortex)", None),
-                ],
-                "🎭 Character Manager": [
-                    ("char [name]", "View character or list all characters", None),
-                    ("char create <name> [role]", "Create a new character", None),
-                    ("char modify <subcommand>", "Modify character (name, nickname, role, system)", None),
-                    ("char backstory <name> [story]", "Set or view character backstory", None),
-                    ("char note <name> <text>", "Add a note to character", None),
-                    ("char notes <name>", "View all notes", None),
-                    ("char clearnotes <name>", "Clear all notes", None),
-                    ("char delete <name>", "Delete a character", None),
-                ],
-                "❓ Help": [
-                    ("help [command]", "Show this help or command details", "h"),
-                    ("examples", "Show usage examples for commands", "ex"),
-                ],
-            }
-            
-            # Add developer commands if enabled
-            if Config.ENABLE_DEV_COMMANDS:
-                categories["🔧 Developer"] = [
-                    ("reload [cog]", "Reload cog(s) for development", None),
-                    ("load [cog]", "Load a cog", None),
-                    ("unload [cog]", "Unload a cog", None),
-                    ("listcogs", "List all loaded cogs", None),
-                    ("sync", "Sync slash commands", None),
-                    ("hotreload [on/off]", "Toggle automatic code reloading", None),
-                    ("watchstatus", "Show file watcher debug info", None),
-                ]
-            
-            for category, commands in categories.items():
-                value = []
-                for cmd, desc, alias in commands:
-                    if alias:
-                        value.append(f"`!{cmd}` - {desc} (alias: `!{alias}`)")
-                    else:
-                        value.append(f"`!{cmd}` - {desc}")
-                
-                embed.add_field(
-                    name=category,
-                    value="\n".join(value),
-                    inline=False
-                )
-            
-            embed.set_footer(text=f"Prefix: {self.bot.command_prefix}\n Use !help [command] for more info\n Use !examples for usage examples")
-            await ctx.send(embed=embed)
+        
+        if isinstance(cmd, commands.Group) and cmd.commands:
+            embed.add_field(
+                name="Subcommands",
+                value=", ".join(f"`{sub.name}`" for sub in sorted(cmd.commands, key=lambda sub: sub.name)),
+                inline=False
+            )
+        return embed
 
     @commands.command(name='examples', aliases=['ex'])
-    async def examples(self, ctx,):
+    async def examples(self, ctx):
         """Show usage examples for commands"""
+        if self._examples_embed is None:
+            self._examples_embed = self._build_examples_embed()
+        await ctx.send(embed=self._examples_embed)
+    
+    def _build_general_embed(self) -> discord.Embed:
+        """The command overview shown by !help"""
+        embed = discord.Embed(
+            title="🎲 D&D Dice Bot Help",
+            description="A feature-rich dice rolling bot for D&D 5e",
+            color=discord.Color.blue()
+        )
         
+        # Group commands by category
+        categories = {
+            "🎲 Dice Rolling": [
+                ("roll [expression]", "Roll dice (e.g., 1d20+5, 1d20+@STR or a macro)", "r"),
+                ("multiroll [times] [expression]", "Roll multiple times", "m"),
+                ("rollstats [@user|server]", "Show roll statistics and nat 20 rates", None),
+                ("verify <roll-id>", "Prove a roll wasn't tampered with by replaying it", None),
+            ],
+            "⚔️ D&D Specific": [
+                ("advantage [modifier]", "Roll with advantage", "adv"),
+                ("disadvantage [modifier]", "Roll with disadvantage", "dis"),
+                ("stats [system] [xN]", "Roll ability scores (dnd, adnd, pathfinder, heroic, standard, special, cortex)", None),
+            ],
+            "🎭 Character Manager": [
+                ("char [name]", "View character or list all characters", None),
+                ("char create <name> [role]", "Create a new character", None),
+                ("char find <prefix>", "Find characters in this server by name", None),
+                ("char bulkcreate <count> <prefix> [system] [role]", "Create many characters at once", None),
+                ("char modify <subcommand>", "Modify character (name, nickname, role, system)", None),
+                ("char use <name>", "Roll as this character (@STR references and macros)", None),
+                ("char macro [set|delete] <name> [expression]", "List, save or remove roll macros", None),
+                ("char backstory <name> [story]", "Set or view character backstory", None),
+                ("char note <name> <text>", "Add a note to character", None),
+                ("char notes <name>", "View all notes", None),
+                ("char search <query>", "Search backstories and notes", None),
+                ("char export", "Download this server's characters", None),
+                ("char import [replace]", "Import characters from an attached export", None),
+                ("char clearnotes <name>", "Clear all notes", None),
+                ("char delete <name>", "Delete a character", None),
+            ],
+            "🛡️ Initiative": [
+                ("init", "Show this channel's initiative tracker", None),
+                ("init add <name> [+mod|=roll] [xN]; ...", "Roll initiative for combatants", None),
+                ("init remove <name>", "Remove a combatant", None),
+                ("init next", "Pass the turn to the next combatant", None),
+                ("init end", "End the encounter", None),
+            ],
+            "❓ Help": [
+                ("help [command]", "Show this help or command details", "h"),
+                ("examples", "Show usage examples for commands", "ex"),
+            ],
+        }
+        
+        # Add developer commands if enabled
+        if Config.ENABLE_DEV_COMMANDS:
+            categories["🔧 Developer"] = [
+                ("reload [cog]", "Reload cog(s) for development", None),
+                ("load [cog]", "Load a cog", None),
+                ("unload [cog]", "Unload a cog", None),
+                ("listcogs", "List all loaded cogs", None),
+                ("sync", "Sync slash commands", None),
+                ("hotreload [on/off]", "Toggle automatic code reloading", None),
+                ("watchstatus", "Show file watcher debug info", None),
+                ("dicebuffer [reset]", "Show dice buffer hit/miss counters", None),
+                ("migratestorage [format]", "Rewrite character files in another format", None),
+                ("cachestats", "Show character data cache usage", None),
+                ("outbound", "Show outgoing message queue depths", None),
+                ("profile [start/stop]", "Profile the event loop with cProfile", None),
+                ("memprofile [start/stop]", "Diff tracemalloc snapshots", None),
+                ("looplag [seconds]", "Measure event loop latency", None),
+                ("traces [sample/export/clear]", "Show the slowest traced commands", None),
+            ]
+        
+        for category, commands in categories.items():
+            value = []
+            for cmd, desc, alias in commands:
+                if alias:
+                    value.append(f"`!{cmd}` - {desc} (alias: `!{alias}`)")
+                else:
+                    value.append(f"`!{cmd}` - {desc}")
+            
+            embed.add_field(
+                name=category,
+                value="\n".join(value),
+                inline=False
+            )
+        
+        embed.set_footer(text=f"Prefix: {self.bot.command_prefix}\n Use !help [command] for more info\n Use !examples for usage examples")
+        return embed
+    
+    @staticmethod
+    def _build_examples_embed() -> discord.Embed:
+        """The usage examples shown by !examples"""
         embed = discord.Embed(
             title="Usage Examples",
             description="Here are some examples of how to use the commands:",
@@ -140,7 +228,10 @@ class Help(commands.Cog):
                 "`!roll 3d8+2d6+5` - Complex damage roll\n"
                 "`!roll 1d100` - Percentile dice roll\n"
                 "`!m 6 4d6` - Roll 4d6 six times (for stats)\n"
-                "`!m 3 1d20+5` - Roll attack 3 times"
+                "`!m 3 1d20+5` - Roll attack 3 times\n"
+                "`!roll 1d20+7; 1d20+7; 2d6+4` - Several rolls in one reply\n"
+                "`I swing [[1d20+5]] for [[1d8+3]]` - Inline rolls in any message\n"
+                "React 🔁 on your roll result to roll it again"
             ),
             inline=False
         )
@@ -167,7 +258,8 @@ class Help(commands.Cog):
                 "`!stats heroic` - Heroic (2d6+6)\n"
                 "`!stats standard` - Standard array\n"
                 "`!stats special` - SPECIAL (Fallout)\n"
-                "`!stats cortex` - Cortex system dice"
+                "`!stats cortex` - Cortex system dice\n"
+                "`!stats dnd x5` - Roll five D&D stat blocks at once"
             ),
             inline=False
         )
@@ -176,6 +268,7 @@ class Help(commands.Cog):
             name="🎭 Character Management",
             value=(
                 "`!char create Gandalf Wizard` - Create character\n"
+                "`!char bulkcreate 20 Goblin dnd Minion` - Create Goblin 1-20 in one go\n"
                 "`!char Gandalf` - View character details\n"
                 "`!char list` - List all characters\n"
                 "`!char delete Gandalf` - Delete character\n"
@@ -195,8 +288,7 @@ class Help(commands.Cog):
             ),
             inline=False
         )
-    
-        await ctx.send(embed=embed)
+        return embed
 
 async def setup(bot):
     await bot.add_cog(Help(bot))
\ No newline at end of file
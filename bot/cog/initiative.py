@@ -0,0 +1,250 @@
+import discord
+from discord.ext import commands
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.coalesce import SingleFlight
+from ..utils.dice_source import dice_source
+from ..utils.initiative import Encounter, parse_combatants
+from ..utils.roll_macros import normalize_stats, stat_value
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Lines the tracker shows from the current turn on; big fights show a window, not the whole order
+TRACKER_WINDOW = 15
+# Changes within this many seconds are saved together
+SAVE_DELAY = 2.0
+
+class Initiative(commands.Cog):
+    """Initiative tracking for combat encounters"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Live encounters by (guild, channel); loaded from the character store on first use
+        self._encounters: Dict[Tuple[int, int], Encounter] = {}
+        self._loads = SingleFlight()
+        self._saves: Dict[Tuple[int, int], asyncio.Task] = {}
+        # After a reload, pick up the live encounters and the saves they still owe
+        warm = bot.handoff.take(self.qualified_name)
+        if warm is not None:
+            self._encounters = warm['encounters']
+            for key in warm['unsaved']:
+                self._save_later(key)
+
+    def _take_unsaved(self) -> List[Tuple[int, int]]:
+        """Cancel the scheduled saves, returning the encounters they were for"""
+        for task in self._saves.values():
+            task.cancel()
+        unsaved = list(self._saves)
+        self._saves.clear()
+        return unsaved
+
+    async def export_state(self) -> Dict[str, Any]:
+        """Hand live encounters, and the saves they still owe, to the reloaded cog"""
+        return {'encounters': self._encounters, 'unsaved': self._take_unsaved()}
+
+    async def release_state(self, state: Dict[str, Any]):
+        """Write the encounters that still owe a save"""
+        for key in state['unsaved']:
+            await self._save(key)
+
+    async def cog_unload(self):
+        # Write pending changes now rather than dropping them
+        await self.release_state({'unsaved': self._take_unsaved()})
+
+    def _storage(self):
+        """The character storage encounters are kept in, or None to keep them in memory only"""
+        characters = self.bot.get_cog('Characters')
+        return characters.storage if characters is not None else None
+
+    async def _encounter(self, ctx, create: bool = False) -> Optional[Encounter]:
+        """The channel's encounter, loaded from storage the first time; a new one if ``create``"""
+        key = (ctx.guild.id, ctx.channel.id)
+        encounter = self._encounters.get(key)
+        if encounter is None:
+            encounter = await self._loads.do(key, lambda: self._load(key))
+        if encounter is None and create:
+            encounter = self._encounters[key] = Encounter()
+        return encounter
+
+    async def _load(self, key: Tuple[int, int]) -> Optional[Encounter]:
+        storage = self._storage()
+        state = await storage.get_encounter(*key) if storage is not None else None
+        # Another command may have started one while storage was read
+        if key not in self._encounters and state:
+            self._encounters[key] = Encounter.from_dict(state)
+        return self._encounters.get(key)
+
+    def _save_later(self, key: Tuple[int, int]):
+        """Save the encounter shortly, once for any number of changes made meanwhile"""
+        if key not in self._saves:
+            self._saves[key] = asyncio.create_task(self._save_after_delay(key))
+
+    async def _save_after_delay(self, key: Tuple[int, int]):
+        await asyncio.sleep(SAVE_DELAY)
+        self._saves.pop(key, None)
+        await self._save(key)
+
+    async def _save(self, key: Tuple[int, int]):
+        storage = self._storage()
+        if storage is None:
+            return
+        encounter = self._encounters.get(key)
+        try:
+            await storage.put_encounter(*key, encounter.to_dict() if encounter is not None else None)
+        except Exception as e:
+            logger.error(f"Error saving encounter for channel {key[1]} in guild {key[0]}: {e}")
+
+    def _tracker_embed(self, encounter: Encounter) -> discord.Embed:
+        """Tracker showing the next TRACKER_WINDOW turns, however many combatants there are"""
+        embed = discord.Embed(
+            title=f"⚔️ Initiative: Round {encounter.round}",
+            color=discord.Color.dark_red()
+        )
+        lines = []
+        previous_round = encounter.round
+        for round_number, combatant in encounter.upcoming(TRACKER_WINDOW):
+            if round_number != previous_round:
+                lines.append(f"── Round {round_number} ──")
+                previous_round = round_number
+            lines.append(combatant.line if lines else f"▶ {combatant.line} ◀")
+        if len(encounter) > TRACKER_WINDOW:
+            lines.append(f"*…and {len(encounter) - TRACKER_WINDOW} more*")
+        embed.description = "\n".join(lines) or "No combatants yet. Add some with `!init add Goblin +2 x4`"
+        embed.set_footer(text=f"{len(encounter)} combatants | !init next to pass the turn")
+        return embed
+
+    async def _update_tracker(self, ctx, encounter: Encounter, repost: bool = False):
+        """Edit the tracker message in place, posting a new one only if it's gone (or ``repost``)"""
+        embed = self._tracker_embed(encounter)
+        if encounter.message_id is not None and not repost:
+            try:
+                # Quick successive turns collapse into one edit
+                await self.bot.outbound.edit(
+                    ctx.channel.id, ctx.channel.get_partial_message(encounter.message_id), embed=embed
+                )
+                return
+            except discord.HTTPException:
+                pass
+        message = await ctx.send(embed=embed)
+        encounter.message_id = message.id
+        self._save_later((ctx.guild.id, ctx.channel.id))
+
+    async def _character_modifier(self, guild_id: int, name: str) -> Optional[int]:
+        """Initiative modifier (@DEX) of a character in this server with this name, if there is one"""
+        storage = self._storage()
+        if storage is None:
+            return None
+        for _, char_id, _ in await storage.find_in_guild(guild_id, name):
+            document = await storage.get_character(guild_id, char_id)
+            stats = normalize_stats(document.get('stats')) if document else {}
+            if 'DEX' in stats:
+                return stat_value(document.get('system') or "dnd", stats['DEX'])
+        return None
+
+    @commands.group(name='init', aliases=['initiative'], invoke_without_command=True)
+    async def initiative(self, ctx):
+        """Show the initiative tracker for this channel"""
+        encounter = await self._encounter(ctx)
+        if encounter is None:
+            await ctx.send("❌ No encounter in this channel. Start one with `!init add Goblin +2 x4; Gandalf`", batchable=True)
+            return
+        await self._update_tracker(ctx, encounter, repost=True)
+
+    @initiative.command(name='add')
+    async def init_add(self, ctx, *, entries: str):
+        """
+        Roll initiative for combatants: !init add Goblin +2 x6; Gandalf; Ambush =18
+
+        A character's name with no modifier rolls with its DEX modifier.
+        """
+        try:
+            specs = parse_combatants(entries)
+        except ValueError as e:
+            await ctx.send(f"❌ {e}", batchable=True)
+            return
+        if not specs:
+            await ctx.send("❌ Name at least one combatant, like `!init add Goblin +2 x4`", batchable=True)
+            return
+
+        encounter = await self._encounter(ctx, create=True)
+        if len(encounter) + sum(spec.count for spec in specs) > Config.MAX_COMBATANTS:
+            await ctx.send(f"❌ An encounter can have at most {Config.MAX_COMBATANTS} combatants!", batchable=True)
+            return
+
+        # Name every combatant first, so the whole batch rolls in one draw
+        pending: List[Tuple[str, int, Optional[int]]] = []
+        taken = set()
+        for spec in specs:
+            modifier = spec.modifier
+            if modifier is None and spec.fixed is None:
+                modifier = await self._character_modifier(ctx.guild.id, spec.name)
+            number = 0
+            for _ in range(spec.count):
+                name = spec.name
+                if spec.count > 1:
+                    number += 1
+                    while f"{spec.name} {number}" in encounter or f"{spec.name} {number}".lower() in taken:
+                        number += 1
+                    name = f"{spec.name} {number}"
+                if name in encounter or name.lower() in taken:
+                    await ctx.send(f"❌ {name} is already in the initiative order", batchable=True)
+                    return
+                taken.add(name.lower())
+                pending.append((name, modifier or 0, spec.fixed))
+
+        rolls = iter(dice_source.roll_many(sum(fixed is None for _, _, fixed in pending), 20))
+        added = []
+        for name, modifier, fixed in pending:
+            total = fixed if fixed is not None else next(rolls) + modifier
+            added.append(encounter.add(name, total, modifier, ctx.author.id))
+
+        self._save_later((ctx.guild.id, ctx.channel.id))
+        await self._update_tracker(ctx, encounter)
+        summary = ", ".join(f"{combatant.name} **{combatant.initiative}**" for combatant in added)
+        if len(summary) > 1800:
+            summary = summary[:1800].rsplit(", ", 1)[0] + ", …"
+        await ctx.send(f"✅ Added {len(added)} to initiative: {summary}")
+
+    @initiative.command(name='remove', aliases=['rm'])
+    async def init_remove(self, ctx, *, name: str):
+        """Take a combatant out of the initiative order"""
+        encounter = await self._encounter(ctx)
+        removed = encounter.remove(name) if encounter is not None else None
+        if removed is None:
+            await ctx.send(f"❌ No combatant named '{name}' in this channel's encounter!", batchable=True)
+            return
+        self._save_later((ctx.guild.id, ctx.channel.id))
+        await self._update_tracker(ctx, encounter)
+        await ctx.send(f"✅ Removed {removed.name} from initiative")
+
+    @initiative.command(name='next', aliases=['n'])
+    async def init_next(self, ctx):
+        """Pass the turn to the next combatant; the tracker is updated in place"""
+        encounter = await self._encounter(ctx)
+        if encounter is None or not len(encounter):
+            await ctx.send("❌ No combatants in this channel. Add some with `!init add`", batchable=True)
+            return
+        encounter.advance()
+        self._save_later((ctx.guild.id, ctx.channel.id))
+        await self._update_tracker(ctx, encounter)
+
+    @initiative.command(name='end')
+    async def init_end(self, ctx):
+        """End this channel's encounter"""
+        key = (ctx.guild.id, ctx.channel.id)
+        encounter = await self._encounter(ctx)
+        if encounter is None:
+            await ctx.send("❌ No encounter in this channel!", batchable=True)
+            return
+        del self._encounters[key]
+        task = self._saves.pop(key, None)
+        if task is not None:
+            task.cancel()
+        await self._save(key)
+        await ctx.send(f"✅ Encounter ended after {encounter.round} round{'s' if encounter.round != 1 else ''}")
+
+async def setup(bot):
+    await bot.add_cog(Initiative(bot))
@@ -0,0 +1,194 @@
+import gzip
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, Optional, Tuple, Union
+
+from .character_store import CharacterStore
+
+EXPORT_FORMAT = 'dice-roller-characters'
+EXPORT_VERSION = 1
+
+# Ids become file names, so only accept the shape the bot generates
+CHAR_ID_PATTERN = re.compile(r"\d+_\d+")
+
+MAX_REPORTED_ERRORS = 10
+PROGRESS_EVERY = 1000
+
+# Called with (records done, total records or None if unknown)
+Progress = Callable[[int, Optional[int]], None]
+
+def open_archive(path: Union[str, Path], mode: str = 'r') -> IO[str]:
+    """Open a JSON Lines archive for text I/O, gzip-compressed if its name ends in .gz"""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def export_guild(store: CharacterStore, guild_id: int, fp: IO[str], progress: Optional[Progress] = None) -> int:
+    """
+    Write a guild's characters to ``fp`` as JSON Lines, returning how many were written.
+
+    The first line is a header; every following line is one character with
+    its owner, id and notes. Characters are streamed one at a time.
+    """
+    total = len(store.manifest(guild_id))
+    fp.write(json.dumps({
+        'format': EXPORT_FORMAT,
+        'version': EXPORT_VERSION,
+        'guild_id': guild_id,
+        'characters': total,
+    }) + '\n')
+
+    count = 0
+    for user_key, char_id, document, notes in store.iter_characters(guild_id):
+        record = {'id': char_id, 'owner': user_key, **document, 'notes': notes}
+        fp.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        count += 1
+        if progress and count % PROGRESS_EVERY == 0:
+            progress(count, total)
+
+    if progress:
+        progress(count, total)
+    return count
+
+def check_header(header: Dict[str, Any]) -> None:
+    if header.get('format') != EXPORT_FORMAT:
+        raise ValueError(f"not a character export (format '{header.get('format')}')")
+    if not isinstance(header.get('version'), int) or header['version'] > EXPORT_VERSION:
+        raise ValueError(f"unsupported export version {header.get('version')}")
+
+def validate_record(record: Any) -> Tuple[str, Optional[str], Dict[str, Any]]:
+    """
+    Check one imported character, returning (owner, char_id or None, data).
+
+    Known fields are type-checked and defaulted; unknown fields are kept as
+    they are. Raises ValueError describing the first problem found.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record is not a JSON object")
+
+    data = dict(record)
+    owner = str(data.pop('owner', ''))
+    if not owner.isdigit():
+        raise ValueError("'owner' must be a Discord user id")
+
+    char_id = data.pop('id', None)
+    if not isinstance(char_id, str) or not CHAR_ID_PATTERN.fullmatch(char_id) or not char_id.startswith(f"{owner}_"):
+        char_id = None
+
+    name = data.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("'name' must be a non-empty string")
+    data['name'] = name.strip()
+
+    for field in ('nickname', 'backstory'):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f"'{field}' must be a string or null")
+        data[field] = data.get(field) or None
+
+    stats = data.get('stats') or {}
+    if not isinstance(stats, dict) or not all(
+        isinstance(stat, str) and isinstance(value, int) and not isinstance(value, bool)
+        for stat, value in stats.items()
+    ):
+        raise ValueError("'stats' must map stat names to integers")
+    data['stats'] = stats
+
+    notes = data.get('notes') or []
+    if not isinstance(notes, list) or not all(isinstance(note, str) for note in notes):
+        raise ValueError("'notes' must be a list of strings")
+    data['notes'] = notes
+
+    macros = data.get('macros') or {}
+    if not isinstance(macros, dict) or not all(
+        isinstance(name, str) and isinstance(expression, str) for name, expression in macros.items()
+    ):
+        raise ValueError("'macros' must map macro names to dice expressions")
+    if macros:
+        data['macros'] = macros
+    else:
+        data.pop('macros', None)
+
+    data['role'] = str(data.get('role') or "Adventurer")
+    data['system'] = str(data.get('system') or "dnd").lower()
+    created_by = data.get('created_by')
+    data['created_by'] = created_by if isinstance(created_by, int) and not isinstance(created_by, bool) else int(owner)
+    data['created_at'] = str(data.get('created_at') or "")
+    return owner, char_id, data
+
+def _reject(stats: Dict[str, Any], line_no: int, problem: str) -> None:
+    stats['invalid'] += 1
+    if len(stats['errors']) < MAX_REPORTED_ERRORS:
+        stats['errors'].append(f"line {line_no}: {problem}")
+
+def import_guild(
+    store: CharacterStore,
+    guild_id: int,
+    lines: Iterable[str],
+    replace: bool = False,
+    batch_size: int = 500,
+    progress: Optional[Progress] = None,
+) -> Dict[str, Any]:
+    """
+    Stream JSON Lines character records into a guild.
+
+    Records are validated as they are read and saved every ``batch_size``
+    characters (or every tenth of the guild, once that is more), so memory
+    stays flat however large the archive is. A
+    character whose owner already has one with the same name is skipped,
+    or replaces it when ``replace`` is set. Returns counts plus the first
+    few problems with their line numbers. Raises ValueError for a file that
+    isn't a character export and OSError if a batch can't be saved.
+    """
+    stats = {'lines': 0, 'imported': 0, 'replaced': 0, 'skipped': 0, 'invalid': 0, 'errors': []}
+    unsaved = 0
+
+    for line_no, line in enumerate(lines, 1):
+        stats['lines'] = line_no
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            _reject(stats, line_no, f"invalid JSON ({e})")
+            continue
+
+        if line_no == 1 and isinstance(record, dict) and 'format' in record:
+            check_header(record)
+            continue
+
+        try:
+            owner, char_id, data = validate_record(record)
+        except ValueError as e:
+            _reject(stats, line_no, str(e))
+            continue
+
+        existing = store.character_id(guild_id, owner, data['name'])
+        if existing is not None:
+            if not replace:
+                stats['skipped'] += 1
+                continue
+            store.remove(guild_id, existing)
+            stats['replaced'] += 1
+
+        if char_id is None or char_id in store.manifest(guild_id):
+            char_id = store.new_char_id(guild_id, int(owner))
+        store.put(guild_id, owner, char_id, data)
+        stats['imported'] += 1
+        unsaved += 1
+
+        # Each save rewrites the guild's manifest, so big guilds save less often
+        if unsaved >= max(batch_size, len(store.manifest(guild_id)) // 10):
+            if not store.save(guild_id):
+                raise OSError("could not save imported characters")
+            unsaved = 0
+            if progress:
+                progress(line_no, None)
+
+    if unsaved and not store.save(guild_id):
+        raise OSError("could not save imported characters")
+    if progress:
+        progress(stats['lines'], None)
+    return stats
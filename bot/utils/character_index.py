@@ -0,0 +1,161 @@
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# A character reference: (owner user key, character id)
+CharRef = Tuple[str, str]
+
+def normalize_name(name: str) -> str:
+    """Key used for case-insensitive name lookups"""
+    return name.strip().casefold()
+
+class _TrieNode:
+    __slots__ = ('children', 'refs')
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.refs: Set[CharRef] = set()
+
+class PrefixTrie:
+    """Prefix tree over normalized names, used for autocomplete"""
+
+    def __init__(self):
+        self._root = _TrieNode()
+
+    def add(self, key: str, ref: CharRef) -> None:
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        node.refs.add(ref)
+
+    def remove(self, key: str, ref: CharRef) -> None:
+        path = [self._root]
+        for char in key:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+
+        path[-1].refs.discard(ref)
+        # Prune nodes that no longer lead anywhere
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.refs or node.children:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+    def complete(self, prefix: str, limit: int = 25) -> List[Tuple[str, CharRef]]:
+        """Return up to ``limit`` (key, ref) pairs whose key starts with ``prefix``"""
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        results = []
+        for key, ref in self._walk(node, prefix):
+            results.append((key, ref))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _walk(self, node: _TrieNode, key: str) -> Iterator[Tuple[str, CharRef]]:
+        """Depth-first walk yielding keys in alphabetical order"""
+        for ref in sorted(node.refs):
+            yield key, ref
+        for char in sorted(node.children):
+            yield from self._walk(node.children[char], key + char)
+
+class CharacterIndex:
+    """
+    Secondary indexes over one guild's characters.
+
+    Keeps per-owner name and nickname maps, a guild-wide map from name or
+    nickname to characters, and a prefix trie for autocomplete that is
+    only built once something is autocompleted. Call
+    ``put`` after any change to a character's name or nickname and
+    ``remove`` when it is deleted; both only touch that character's keys.
+    """
+
+    def __init__(self):
+        self.names: Dict[str, Dict[str, str]] = {}
+        self.nicknames: Dict[str, Dict[str, str]] = {}
+        self.guild_names: Dict[str, Set[CharRef]] = {}
+        self._trie: Optional[PrefixTrie] = None
+        self._keys: Dict[CharRef, Tuple[str, Optional[str]]] = {}
+
+    def put(self, user_key: str, char_id: str, char_data: dict) -> None:
+        """Index a new character or re-index a changed one"""
+        ref = (user_key, char_id)
+        name = normalize_name(char_data['name'])
+        nickname = normalize_name(char_data['nickname']) if char_data.get('nickname') else None
+
+        if self._keys.get(ref) == (name, nickname):
+            return
+        self.remove(user_key, char_id)
+
+        self.names.setdefault(user_key, {})[name] = char_id
+        self._add_guild_key(name, ref)
+        if nickname:
+            self.nicknames.setdefault(user_key, {})[nickname] = char_id
+            self._add_guild_key(nickname, ref)
+        self._keys[ref] = (name, nickname)
+
+    def remove(self, user_key: str, char_id: str) -> None:
+        """Drop a character from every index"""
+        ref = (user_key, char_id)
+        keys = self._keys.pop(ref, None)
+        if keys is None:
+            return
+
+        name, nickname = keys
+        self._discard(self.names, user_key, name, char_id)
+        self._remove_guild_key(name, ref)
+        if nickname:
+            self._discard(self.nicknames, user_key, nickname, char_id)
+            self._remove_guild_key(nickname, ref)
+
+    def find(self, user_key: str, name: str) -> Optional[str]:
+        """Find one of a user's characters by name, then by nickname"""
+        key = normalize_name(name)
+        char_id = self.names.get(user_key, {}).get(key)
+        if char_id is None:
+            char_id = self.nicknames.get(user_key, {}).get(key)
+        return char_id
+
+    def find_in_guild(self, name: str) -> List[CharRef]:
+        """Find characters of any owner by name or nickname"""
+        return sorted(self.guild_names.get(normalize_name(name), ()))
+
+    @property
+    def trie(self) -> PrefixTrie:
+        if self._trie is None:
+            self._trie = PrefixTrie()
+            for key, refs in self.guild_names.items():
+                for ref in refs:
+                    self._trie.add(key, ref)
+        return self._trie
+
+    def complete(self, prefix: str, limit: int = 25) -> List[Tuple[str, CharRef]]:
+        """Autocomplete names and nicknames across the guild"""
+        return self.trie.complete(normalize_name(prefix), limit)
+
+    def _add_guild_key(self, key: str, ref: CharRef) -> None:
+        self.guild_names.setdefault(key, set()).add(ref)
+        if self._trie is not None:
+            self._trie.add(key, ref)
+
+    def _remove_guild_key(self, key: str, ref: CharRef) -> None:
+        refs = self.guild_names.get(key)
+        if refs is not None:
+            refs.discard(ref)
+            if not refs:
+                del self.guild_names[key]
+        if self._trie is not None:
+            self._trie.remove(key, ref)
+
+    @staticmethod
+    def _discard(mapping: Dict[str, Dict[str, str]], user_key: str, key: str, char_id: str) -> None:
+        user_map = mapping.get(user_key)
+        if user_map is not None and user_map.get(key) == char_id:
+            del user_map[key]
+            if not user_map:
+                del mapping[user_key]
@@ -0,0 +1,357 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Tuple, TypeVar
+
+from .character_archive import Progress, export_guild, import_guild
+from .character_index import CharacterIndex, normalize_name
+from .character_store import MANIFEST_FIELDS
+from .text_search import DocId, TextIndex
+from .tracing import tracer
+
+T = TypeVar('T')
+
+def _copy_entries(found: List[Tuple[str, str, Dict[str, Any]]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """(user_key, char_id, entry) results with the manifest entries copied off the store"""
+    return [(user_key, char_id, dict(entry)) for user_key, char_id, entry in found]
+
+class CharacterStorage(Protocol):
+    """
+    Async character storage, as used by the Characters cog.
+
+    Changes apply as soon as they're made and are persisted by ``save``.
+    Documents handed out are copies: edit them and pass them to ``upsert``.
+    """
+
+    def close(self) -> None: ...
+    async def get_guild(self, guild_id: int) -> Dict[str, Dict[str, Any]]: ...
+    async def characters_of(self, guild_id: int, user_key: str) -> List[Tuple[str, Dict[str, Any]]]: ...
+    async def get_character(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]: ...
+    async def find(self, guild_id: int, user_key: str, name: str) -> Optional[Tuple[str, Dict[str, Any]]]: ...
+    async def find_in_guild(self, guild_id: int, name: str) -> List[Tuple[str, str, Dict[str, Any]]]: ...
+    async def complete(self, guild_id: int, prefix: str, limit: int = 25) -> List[Tuple[str, str, Dict[str, Any]]]: ...
+    async def name_taken(self, guild_id: int, user_key: str, name: str, exclude: Optional[str] = None) -> bool: ...
+    async def free_names(self, guild_id: int, user_key: str, prefix: str, count: int) -> List[str]: ...
+    async def closest_names(self, guild_id: int, name: str, limit: int = 5) -> List[Tuple[str, str, Dict[str, Any]]]: ...
+    async def create(self, guild_id: int, user_id: int, documents: List[Dict[str, Any]]) -> List[str]: ...
+    async def upsert(self, guild_id: int, user_key: str, char_id: str, document: Dict[str, Any]) -> None: ...
+    async def append_note(self, guild_id: int, char_id: str, note: str) -> int: ...
+    async def clear_notes(self, guild_id: int, char_id: str) -> int: ...
+    async def delete(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]: ...
+    async def note_count(self, guild_id: int, char_id: str) -> int: ...
+    async def notes(self, guild_id: int, char_id: str, start: int = 0, stop: Optional[int] = None) -> List[str]: ...
+    async def search(self, guild_id: int, query: str, limit: int = 10) -> List[Tuple[DocId, float, Dict[str, Any]]]: ...
+    async def document_text(self, guild_id: int, doc_id: DocId) -> str: ...
+    async def save(self, guild_id: int) -> bool: ...
+    async def save_all(self) -> bool: ...
+    async def get_encounter(self, guild_id: int, channel_id: int) -> Optional[Dict[str, Any]]: ...
+    async def put_encounter(self, guild_id: int, channel_id: int, state: Optional[Dict[str, Any]]) -> None: ...
+    async def export_guild(self, guild_id: int, fp: IO[str], progress: Optional[Progress] = None) -> int: ...
+    async def import_guild(
+        self, guild_id: int, lines: Iterable[str], replace: bool = False, progress: Optional[Progress] = None
+    ) -> Dict[str, Any]: ...
+
+class AsyncCharacterStorage:
+    """
+    CharacterStorage over a synchronous store such as CharacterStore.
+
+    Every call runs on a bounded pool of ``max_workers`` threads, so disk
+    reads and writes never block the event loop and a burst of saves queues
+    up rather than spawning threads. CharacterStore serializes its calls
+    anyway, so one thread is enough. With ``max_workers=0`` calls run
+    inline, for stores that never touch the disk.
+    """
+
+    def __init__(self, store: Any, max_workers: int = 1):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='character-io') if max_workers else None
+        # Keeps multi-step changes whole if the pool has several threads
+        self._writes = threading.Lock()
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking call on the storage threads"""
+        # Traced as the store method called, including the wait for a free thread
+        target = args[0] if func == self._write else func
+        with tracer.span(f"storage.{getattr(target, '__name__', 'call')}"):
+            if self._executor is None:
+                return func(*args, **kwargs)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def close(self) -> None:
+        """Finish queued calls and stop the storage threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def get_guild(self, guild_id: int) -> Dict[str, Dict[str, Any]]:
+        """The guild's ``{char_id: manifest entry}``"""
+        return await self.run(lambda: dict(self.store.manifest(guild_id)))
+
+    async def characters_of(self, guild_id: int, user_key: str) -> List[Tuple[str, Dict[str, Any]]]:
+        def characters_of():
+            return [(char_id, dict(entry)) for char_id, entry in self.store.characters_of(guild_id, user_key)]
+        return await self.run(characters_of)
+
+    async def get_character(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]:
+        def get_character():
+            document = self.store.get_character(guild_id, char_id)
+            return dict(document) if document is not None else None
+        return await self.run(get_character)
+
+    async def find(self, guild_id: int, user_key: str, name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        def find():
+            found = self.store.find(guild_id, user_key, name)
+            return (found[0], dict(found[1])) if found else None
+        return await self.run(find)
+
+    async def find_in_guild(self, guild_id: int, name: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+        def find_in_guild():
+            return _copy_entries(self.store.find_in_guild(guild_id, name))
+        return await self.run(find_in_guild)
+
+    async def complete(self, guild_id: int, prefix: str, limit: int = 25) -> List[Tuple[str, str, Dict[str, Any]]]:
+        def complete():
+            return _copy_entries(self.store.complete(guild_id, prefix, limit))
+        return await self.run(complete)
+
+    async def name_taken(self, guild_id: int, user_key: str, name: str, exclude: Optional[str] = None) -> bool:
+        return await self.run(self.store.name_taken, guild_id, user_key, name, exclude)
+
+    async def free_names(self, guild_id: int, user_key: str, prefix: str, count: int) -> List[str]:
+        """The first ``count`` names "prefix N" the user doesn't have yet, checked in one storage call"""
+        def free_names():
+            names, number = [], 1
+            while len(names) < count:
+                name = f"{prefix} {number}"
+                if not self.store.name_taken(guild_id, user_key, name):
+                    names.append(name)
+                number += 1
+            return names
+        return await self.run(free_names)
+
+    async def closest_names(self, guild_id: int, name: str, limit: int = 5) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Characters sharing the longest prefix with ``name`` that any character shares, in one storage call"""
+        def closest_names():
+            for length in range(len(name), 0, -1):
+                found = self.store.complete(guild_id, name[:length], limit)
+                if found:
+                    return _copy_entries(found)
+            return []
+        return await self.run(closest_names)
+
+    async def create(self, guild_id: int, user_id: int, documents: List[Dict[str, Any]]) -> List[str]:
+        """Add new characters owned by ``user_id``, returning their ids"""
+        def create():
+            char_ids = []
+            with self._writes:
+                for document in documents:
+                    char_id = self.store.new_char_id(guild_id, user_id)
+                    self.store.put(guild_id, str(user_id), char_id, dict(document))
+                    char_ids.append(char_id)
+            return char_ids
+        return await self.run(create)
+
+    async def upsert(self, guild_id: int, user_key: str, char_id: str, document: Dict[str, Any]) -> None:
+        """Add a character or replace an existing one's document (its notes are kept)"""
+        def upsert():
+            with self._writes:
+                if char_id in self.store.manifest(guild_id):
+                    self.store.update(guild_id, char_id, dict(document))
+                else:
+                    self.store.put(guild_id, user_key, char_id, dict(document))
+        await self.run(upsert)
+
+    async def append_note(self, guild_id: int, char_id: str, note: str) -> int:
+        return await self.run(self._write, self.store.append_note, guild_id, char_id, note)
+
+    async def clear_notes(self, guild_id: int, char_id: str) -> int:
+        return await self.run(self._write, self.store.clear_notes, guild_id, char_id)
+
+    async def delete(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a character, returning its manifest entry"""
+        return await self.run(self._write, self.store.remove, guild_id, char_id)
+
+    async def note_count(self, guild_id: int, char_id: str) -> int:
+        return await self.run(self.store.note_count, guild_id, char_id)
+
+    async def notes(self, guild_id: int, char_id: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        return await self.run(self.store.notes, guild_id, char_id, start, stop)
+
+    async def search(self, guild_id: int, query: str, limit: int = 10) -> List[Tuple[DocId, float, Dict[str, Any]]]:
+        return await self.run(self.store.search, guild_id, query, limit)
+
+    async def document_text(self, guild_id: int, doc_id: DocId) -> str:
+        return await self.run(self.store.document_text, guild_id, doc_id)
+
+    async def save(self, guild_id: int) -> bool:
+        return await self.run(self._write, self.store.save, guild_id)
+
+    async def save_all(self) -> bool:
+        return await self.run(self._write, self.store.save_all)
+
+    async def get_encounter(self, guild_id: int, channel_id: int) -> Optional[Dict[str, Any]]:
+        return await self.run(self.store.get_encounter, guild_id, channel_id)
+
+    async def put_encounter(self, guild_id: int, channel_id: int, state: Optional[Dict[str, Any]]) -> None:
+        await self.run(self._write, self.store.put_encounter, guild_id, channel_id, state)
+
+    async def export_guild(self, guild_id: int, fp: IO[str], progress: Optional[Progress] = None) -> int:
+        return await self.run(export_guild, self.store, guild_id, fp, progress)
+
+    async def import_guild(
+        self, guild_id: int, lines: Iterable[str], replace: bool = False, progress: Optional[Progress] = None
+    ) -> Dict[str, Any]:
+        return await self.run(self._write, import_guild, self.store, guild_id, lines, replace, progress=progress)
+
+    def _write(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._writes:
+            return func(*args, **kwargs)
+
+class MemoryCharacterStore:
+    """
+    Character store kept entirely in dicts, with CharacterStore's interface.
+
+    Nothing touches the disk and ``save`` only counts calls, so wrapped in
+    ``AsyncCharacterStorage(store, max_workers=0)`` it stands in for the real
+    storage in tests and benchmarks. The full-text index is rebuilt on the
+    first search after a change.
+    """
+
+    def __init__(self):
+        self._manifests: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._indexes: Dict[int, CharacterIndex] = {}
+        self._text_indexes: Dict[int, TextIndex] = {}
+        self._documents: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self._notes: Dict[Tuple[int, str], List[str]] = {}
+        self._encounters: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.saves = 0
+
+    def manifest(self, guild_id: int) -> Dict[str, Dict[str, Any]]:
+        return self._manifests.setdefault(guild_id, {})
+
+    def index(self, guild_id: int) -> CharacterIndex:
+        return self._indexes.setdefault(guild_id, CharacterIndex())
+
+    def characters_of(self, guild_id: int, user_key: str) -> List[Tuple[str, Dict[str, Any]]]:
+        return [(char_id, entry) for char_id, entry in self.manifest(guild_id).items() if entry['owner'] == user_key]
+
+    def get_character(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]:
+        return self._documents.get((guild_id, char_id))
+
+    def note_count(self, guild_id: int, char_id: str) -> int:
+        return len(self._notes.get((guild_id, char_id), ()))
+
+    def notes(self, guild_id: int, char_id: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        return self._notes.get((guild_id, char_id), [])[start:stop]
+
+    def find(self, guild_id: int, user_key: str, name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        char_id = self.index(guild_id).find(user_key, name)
+        return (char_id, self._documents[(guild_id, char_id)]) if char_id is not None else None
+
+    def find_in_guild(self, guild_id: int, name: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+        manifest = self.manifest(guild_id)
+        return [
+            (user_key, char_id, manifest[char_id])
+            for user_key, char_id in self.index(guild_id).find_in_guild(name)
+        ]
+
+    def complete(self, guild_id: int, prefix: str, limit: int = 25) -> List[Tuple[str, str, Dict[str, Any]]]:
+        manifest = self.manifest(guild_id)
+        refs = dict.fromkeys(ref for _, ref in self.index(guild_id).complete(prefix, limit * 2))
+        return [(user_key, char_id, manifest[char_id]) for user_key, char_id in list(refs)[:limit]]
+
+    def character_id(self, guild_id: int, user_key: str, name: str) -> Optional[str]:
+        return self.index(guild_id).names.get(user_key, {}).get(normalize_name(name))
+
+    def name_taken(self, guild_id: int, user_key: str, name: str, exclude: Optional[str] = None) -> bool:
+        char_id = self.character_id(guild_id, user_key, name)
+        return char_id is not None and char_id != exclude
+
+    def new_char_id(self, guild_id: int, user_id: int) -> str:
+        index = len(self.index(guild_id).names.get(str(user_id), ()))
+        while f"{user_id}_{index}" in self.manifest(guild_id):
+            index += 1
+        return f"{user_id}_{index}"
+
+    def put(self, guild_id: int, user_key: str, char_id: str, char_data: Dict[str, Any]) -> None:
+        if char_id in self.manifest(guild_id):
+            self.remove(guild_id, char_id)
+        self._notes[(guild_id, char_id)] = list(char_data.pop('notes', None) or [])
+        self._documents[(guild_id, char_id)] = char_data
+        self.manifest(guild_id)[char_id] = {'owner': user_key}
+        self.update(guild_id, char_id, char_data)
+
+    def update(self, guild_id: int, char_id: str, document: Dict[str, Any]) -> None:
+        self._documents[(guild_id, char_id)] = document
+        entry = self.manifest(guild_id)[char_id]
+        for field in MANIFEST_FIELDS:
+            entry[field] = document.get(field)
+        entry['notes'] = self.note_count(guild_id, char_id)
+        self.index(guild_id).put(entry['owner'], char_id, document)
+        self._text_indexes.pop(guild_id, None)
+
+    def append_note(self, guild_id: int, char_id: str, note: str) -> int:
+        notes = self._notes[(guild_id, char_id)]
+        notes.append(note)
+        self.manifest(guild_id)[char_id]['notes'] = len(notes)
+        self._text_indexes.pop(guild_id, None)
+        return len(notes)
+
+    def clear_notes(self, guild_id: int, char_id: str) -> int:
+        count = len(self._notes[(guild_id, char_id)])
+        self._notes[(guild_id, char_id)] = []
+        self.manifest(guild_id)[char_id]['notes'] = 0
+        self._text_indexes.pop(guild_id, None)
+        return count
+
+    def remove(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]:
+        entry = self.manifest(guild_id).pop(char_id, None)
+        if entry is None:
+            return None
+        self.index(guild_id).remove(entry['owner'], char_id)
+        del self._documents[(guild_id, char_id)]
+        del self._notes[(guild_id, char_id)]
+        self._text_indexes.pop(guild_id, None)
+        return entry
+
+    def save(self, guild_id: int) -> bool:
+        self.saves += 1
+        return True
+
+    def save_all(self) -> bool:
+        return True
+
+    def get_encounter(self, guild_id: int, channel_id: int) -> Optional[Dict[str, Any]]:
+        return self._encounters.get((guild_id, channel_id))
+
+    def put_encounter(self, guild_id: int, channel_id: int, state: Optional[Dict[str, Any]]) -> None:
+        if state is None:
+            self._encounters.pop((guild_id, channel_id), None)
+        else:
+            self._encounters[(guild_id, channel_id)] = state
+
+    def iter_characters(self, guild_id: int) -> Iterator[Tuple[str, str, Dict[str, Any], List[str]]]:
+        for char_id, entry in list(self.manifest(guild_id).items()):
+            yield entry['owner'], char_id, self._documents[(guild_id, char_id)], list(self._notes[(guild_id, char_id)])
+
+    def text_index(self, guild_id: int) -> TextIndex:
+        text_index = self._text_indexes.get(guild_id)
+        if text_index is None:
+            text_index = self._text_indexes[guild_id] = TextIndex()
+            for user_key, char_id, document, notes in self.iter_characters(guild_id):
+                text_index.index_character(user_key, char_id, {'backstory': document.get('backstory'), 'notes': notes})
+        return text_index
+
+    def search(self, guild_id: int, query: str, limit: int = 10) -> List[Tuple[DocId, float, Dict[str, Any]]]:
+        manifest = self.manifest(guild_id)
+        return [(doc_id, score, manifest[doc_id[1]]) for doc_id, score in self.text_index(guild_id).search(query, limit)]
+
+    def document_text(self, guild_id: int, doc_id: DocId) -> str:
+        _, char_id, field, note_index = doc_id
+        if field == 'note':
+            return self._notes[(guild_id, char_id)][note_index]
+        return self._documents[(guild_id, char_id)]['backstory']
+
+def memory_storage() -> AsyncCharacterStorage:
+    """Storage backed by a fresh MemoryCharacterStore, for tests and benchmarks"""
+    return AsyncCharacterStorage(MemoryCharacterStore(), max_workers=0)
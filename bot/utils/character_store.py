@@ -0,0 +1,869 @@
+import functools
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .character_index import CharacterIndex, normalize_name
+from .memory_cache import SizedLRUCache, approx_mapping_size, approx_size
+from .storage_format import FORMAT_SUFFIXES, decode, encode, resolve_format
+from .text_search import DocId, TextIndex
+
+logger = logging.getLogger(__name__)
+
+# Where the bot keeps character data, relative to the working directory
+DEFAULT_DATA_DIR = Path("data/characters")
+
+MANIFEST_VERSION = 1
+NOTE_CHUNK_SIZE = 50
+
+# Document fields mirrored into the manifest so listings never open documents
+MANIFEST_FIELDS = ('name', 'nickname', 'role', 'system')
+
+# A guild's name indexes take roughly as much memory as its manifest
+GUILD_INDEX_FACTOR = 2
+
+# Problems listed per guild by ``check``; the counts include every one
+MAX_REPORTED_PROBLEMS = 20
+
+# A channel's initiative tracker is saved beside the characters as encounter.<channel id>
+ENCOUNTER_PREFIX = "encounter."
+
+def _split_suffix(filename: str) -> Tuple[str, Optional[str]]:
+    """Split a storage file name into its base name and format suffix"""
+    for suffix in sorted(set(FORMAT_SUFFIXES.values()), key=len, reverse=True):
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)], suffix
+    return filename, None
+
+def _bounded(method):
+    """Run a store method under the lock, then shrink the cache once the outermost call returns"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            self._depth += 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    if args and isinstance(args[0], int):
+                        # The guild just used goes last: its documents are cheap to reload, its manifest isn't
+                        self._cache.touch(('guild', args[0]))
+                    self._cache.evict()
+    return wrapper
+
+class _GuildData:
+    """A guild's manifest and the indexes built from it"""
+    __slots__ = ('manifest', 'index', 'text_index')
+
+    def __init__(self, manifest: Dict[str, Dict[str, Any]], index: CharacterIndex):
+        self.manifest = manifest
+        self.index = index
+        self.text_index: Optional[TextIndex] = None
+
+class _PendingWrites:
+    """Changes to one guild that haven't been written yet"""
+    __slots__ = ('manifest', 'documents', 'chunks', 'deleted')
+
+    def __init__(self):
+        self.manifest = False
+        self.documents: Set[str] = set()
+        self.chunks: Set[Tuple[str, int]] = set()
+        # Deleted character id -> number of note chunks it had
+        self.deleted: Dict[str, int] = {}
+
+
+class CharacterStore:
+    """
+    Per-guild character data, loaded a piece at a time.
+
+    Each guild is a directory holding a small ``manifest`` (id, owner, name,
+    nickname, role, system and note count of every character), one document
+    per character and its notes in chunks of ``NOTE_CHUNK_SIZE``. Lookups
+    and listings only read the manifest; documents and note chunks are read
+    the first time they are needed. Guilds saved by older versions as a
+    single file are split on first load.
+
+    Everything read is kept in one LRU cache bounded by ``max_bytes``, so
+    memory follows the working set rather than the number of guilds.
+    Callers mutate documents, pass them back to ``update`` and persist with
+    ``save``, which writes only what changed; unsaved changes are written
+    back before any of a guild's entries is evicted.
+    """
+
+    def __init__(self, data_dir: Path, fmt: str = 'compact', max_bytes: int = 64 * 1024 * 1024):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.format = resolve_format(fmt)
+        # Keys: ('guild', guild_id), ('doc', guild_id, char_id), ('notes', guild_id, char_id, chunk)
+        self._cache = SizedLRUCache(max_bytes, on_evict=self._write_back)
+        self._pending: Dict[int, _PendingWrites] = {}
+        self.write_backs = 0
+        # Guilds may be loaded from executor threads as well as the event loop
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    # -- Files --------------------------------------------------------------
+
+    def _guild_dir(self, guild_id: int) -> Path:
+        return self.data_dir / str(guild_id)
+
+    def _chunk_base(self, guild_id: int, char_id: str, chunk: int) -> Path:
+        return self._guild_dir(guild_id) / f"{char_id}.notes.{chunk}"
+
+    def _variants(self, base: Path) -> List[Path]:
+        """Existing files for a base path in any format, the configured one first"""
+        suffixes = dict.fromkeys([FORMAT_SUFFIXES[self.format], *FORMAT_SUFFIXES.values()])
+        # Plain string paths: this runs for every file written, and pathlib adds up
+        base = str(base)
+        return [Path(base + suffix) for suffix in suffixes if os.path.exists(base + suffix)]
+
+    def _read_file(self, base: Path) -> Optional[Any]:
+        files = self._variants(base)
+        return decode(files[0].read_bytes()) if files else None
+
+    def _write_file(self, base: Path, data: Any, fmt: Optional[str] = None) -> int:
+        """Atomically write a file and drop copies in other formats, returning its size"""
+        fmt = fmt or self.format
+        path = Path(f"{base}{FORMAT_SUFFIXES[fmt]}")
+        raw = encode(data, fmt)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+
+        for other in self._variants(base):
+            if other.name != path.name:
+                other.unlink()
+        return len(raw)
+
+    def _delete_file(self, base: Path) -> None:
+        for path in self._variants(base):
+            path.unlink()
+
+    def _write_manifest(self, guild_id: int, manifest: Dict[str, Dict[str, Any]]) -> None:
+        self._write_file(
+            self._guild_dir(guild_id) / 'manifest',
+            {'version': MANIFEST_VERSION, 'characters': manifest}
+        )
+
+    def _read_document(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self._read_file(self._guild_dir(guild_id) / char_id)
+        except (ValueError, OSError, EOFError) as e:
+            logger.error(f"Error loading character {char_id} for guild {guild_id}: {e}")
+            return None
+
+    def _read_chunk(self, guild_id: int, char_id: str, chunk: int) -> List[str]:
+        try:
+            return self._read_file(self._chunk_base(guild_id, char_id, chunk)) or []
+        except (ValueError, OSError, EOFError) as e:
+            logger.error(f"Error loading notes for {char_id} in guild {guild_id}: {e}")
+            return []
+
+    def guild_ids(self) -> Iterator[int]:
+        """Iterate over the ids of every guild with stored characters"""
+        seen = set()
+        for path in self.data_dir.iterdir():
+            guild_id = path.name if path.is_dir() else _split_suffix(path.name)[0]
+            if guild_id.isdigit() and guild_id not in seen and (path.is_dir() or _split_suffix(path.name)[1]):
+                seen.add(guild_id)
+                yield int(guild_id)
+
+    # -- Manifest -----------------------------------------------------------
+
+    def _guild(self, guild_id: int) -> _GuildData:
+        guild = self._cache.get(('guild', guild_id))
+        if guild is None:
+            manifest = self._read_manifest(guild_id)
+            index = CharacterIndex()
+            for char_id, entry in manifest.items():
+                index.put(entry['owner'], char_id, entry)
+            guild = _GuildData(manifest, index)
+            self._cache.set(('guild', guild_id), guild, approx_mapping_size(manifest) * GUILD_INDEX_FACTOR)
+        return guild
+
+    @_bounded
+    def manifest(self, guild_id: int) -> Dict[str, Dict[str, Any]]:
+        """Return the guild's ``{char_id: entry}`` manifest"""
+        return self._guild(guild_id).manifest
+
+    def _read_manifest(self, guild_id: int) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = self._read_file(self._guild_dir(guild_id) / 'manifest')
+            if data is not None:
+                return data['characters']
+
+            legacy = self._read_file(self.data_dir / str(guild_id))
+            if legacy is not None:
+                return self._split_legacy(guild_id, legacy)
+        except (ValueError, KeyError, OSError, EOFError) as e:
+            logger.error(f"Error loading characters for guild {guild_id}: {e}")
+        return {}
+
+    def _split_legacy(self, guild_id: int, characters: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Convert a single-file ``{user_key: {char_id: data}}`` guild into the manifest layout"""
+        self._guild_dir(guild_id).mkdir(exist_ok=True)
+        manifest = {}
+        for user_key, user_chars in characters.items():
+            for char_id, char_data in user_chars.items():
+                notes = char_data.pop('notes', None) or []
+                self._write_file(self._guild_dir(guild_id) / char_id, char_data)
+                for chunk, start in enumerate(range(0, len(notes), NOTE_CHUNK_SIZE)):
+                    self._write_file(
+                        self._chunk_base(guild_id, char_id, chunk),
+                        notes[start:start + NOTE_CHUNK_SIZE]
+                    )
+                manifest[char_id] = self._entry(user_key, char_data, len(notes))
+
+        # Manifest last, so an interrupted split is simply redone
+        self._write_manifest(guild_id, manifest)
+        self._delete_file(self.data_dir / str(guild_id))
+        logger.info(f"Split characters for guild {guild_id} into {len(manifest)} documents")
+        return manifest
+
+    @staticmethod
+    def _entry(user_key: str, char_data: Dict[str, Any], note_count: int) -> Dict[str, Any]:
+        entry = {'owner': user_key}
+        for field in MANIFEST_FIELDS:
+            entry[field] = char_data.get(field)
+        entry['notes'] = note_count
+        return entry
+
+    def _pending_writes(self, guild_id: int) -> _PendingWrites:
+        pending = self._pending.get(guild_id)
+        if pending is None:
+            pending = self._pending[guild_id] = _PendingWrites()
+        return pending
+
+    @_bounded
+    def characters_of(self, guild_id: int, user_key: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """A user's characters as (char_id, manifest entry)"""
+        return [
+            (char_id, entry) for char_id, entry in self._guild(guild_id).manifest.items()
+            if entry['owner'] == user_key
+        ]
+
+    # -- Documents ----------------------------------------------------------
+
+    def _document(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]:
+        document = self._cache.get(('doc', guild_id, char_id))
+        if document is None and char_id in self._guild(guild_id).manifest:
+            document = self._read_document(guild_id, char_id)
+            if document is not None:
+                self._cache.set(('doc', guild_id, char_id), document, approx_size(document))
+        return document
+
+    @_bounded
+    def get_character(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]:
+        """Return a character's document (everything except notes), reading it if it isn't cached"""
+        return self._document(guild_id, char_id)
+
+    def _note_chunk(self, guild_id: int, char_id: str, chunk: int) -> List[str]:
+        notes = self._cache.get(('notes', guild_id, char_id, chunk))
+        if notes is None:
+            notes = self._read_chunk(guild_id, char_id, chunk)
+            self._cache.set(('notes', guild_id, char_id, chunk), notes, approx_size(notes))
+        return notes
+
+    @_bounded
+    def note_count(self, guild_id: int, char_id: str) -> int:
+        return self._guild(guild_id).manifest[char_id]['notes']
+
+    @_bounded
+    def notes(self, guild_id: int, char_id: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Return notes ``start:stop`` of a character, reading only the chunks that hold them"""
+        count = self.note_count(guild_id, char_id)
+        start = max(0, start + count if start < 0 else start)
+        stop = count if stop is None else min(stop, count)
+        if stop <= start:
+            return []
+
+        notes = []
+        for chunk in range(start // NOTE_CHUNK_SIZE, (stop - 1) // NOTE_CHUNK_SIZE + 1):
+            offset = chunk * NOTE_CHUNK_SIZE
+            notes.extend(self._note_chunk(guild_id, char_id, chunk)[max(0, start - offset):stop - offset])
+        return notes
+
+    # -- Lookups ------------------------------------------------------------
+
+    @_bounded
+    def index(self, guild_id: int) -> CharacterIndex:
+        """Return the guild's lookup indexes"""
+        return self._guild(guild_id).index
+
+    @_bounded
+    def find(self, guild_id: int, user_key: str, name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Find a user's character by name or nickname, returning (char_id, document)"""
+        char_id = self._guild(guild_id).index.find(user_key, name)
+        if char_id is None:
+            return None
+        document = self._document(guild_id, char_id)
+        return (char_id, document) if document is not None else None
+
+    @_bounded
+    def find_in_guild(self, guild_id: int, name: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Find characters of any owner by name or nickname, returning (user_key, char_id, entry)"""
+        guild = self._guild(guild_id)
+        return [
+            (user_key, char_id, guild.manifest[char_id])
+            for user_key, char_id in guild.index.find_in_guild(name)
+        ]
+
+    @_bounded
+    def complete(self, guild_id: int, prefix: str, limit: int = 25) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Autocomplete character names across the guild, returning (user_key, char_id, entry)"""
+        guild = self._guild(guild_id)
+        results = []
+        seen = set()
+        for _, (user_key, char_id) in guild.index.complete(prefix, limit * 2):
+            if (user_key, char_id) in seen:
+                continue
+            seen.add((user_key, char_id))
+            results.append((user_key, char_id, guild.manifest[char_id]))
+            if len(results) >= limit:
+                break
+        return results
+
+    @_bounded
+    def character_id(self, guild_id: int, user_key: str, name: str) -> Optional[str]:
+        """Id of the user's character with exactly this name (nicknames aside)"""
+        return self._guild(guild_id).index.names.get(user_key, {}).get(normalize_name(name))
+
+    def name_taken(self, guild_id: int, user_key: str, name: str, exclude: Optional[str] = None) -> bool:
+        """Check whether a user already has a character with this name"""
+        char_id = self.character_id(guild_id, user_key, name)
+        return char_id is not None and char_id != exclude
+
+    @_bounded
+    def new_char_id(self, guild_id: int, user_id: int) -> str:
+        """Generate a character id that isn't in use for this user"""
+        guild = self._guild(guild_id)
+        # Names are unique per owner, so this is the owner's character count
+        index = len(guild.index.names.get(str(user_id), ()))
+        while f"{user_id}_{index}" in guild.manifest:
+            index += 1
+        return f"{user_id}_{index}"
+
+    # -- Changes ------------------------------------------------------------
+
+    @_bounded
+    def put(self, guild_id: int, user_key: str, char_id: str, char_data: Dict[str, Any]) -> None:
+        """Add or replace a character; a ``notes`` list in ``char_data`` becomes its notes"""
+        guild = self._guild(guild_id)
+        if char_id in guild.manifest:
+            self.remove(guild_id, char_id)
+
+        notes = char_data.pop('notes', None) or []
+        pending = self._pending_writes(guild_id)
+        # A replaced character's leftover chunks are emptied rather than deleted with it
+        for chunk in range(pending.deleted.pop(char_id, 0)):
+            self._cache.set(('notes', guild_id, char_id, chunk), [], approx_size([]))
+            pending.chunks.add((char_id, chunk))
+        for chunk, start in enumerate(range(0, len(notes), NOTE_CHUNK_SIZE)):
+            chunk_notes = notes[start:start + NOTE_CHUNK_SIZE]
+            self._cache.set(('notes', guild_id, char_id, chunk), chunk_notes, approx_size(chunk_notes))
+            pending.chunks.add((char_id, chunk))
+
+        self._cache.set(('doc', guild_id, char_id), char_data, approx_size(char_data))
+        entry = guild.manifest[char_id] = self._entry(user_key, char_data, len(notes))
+        self._cache.resize(('guild', guild_id), approx_size(entry) * GUILD_INDEX_FACTOR)
+        guild.index.put(user_key, char_id, char_data)
+        pending.documents.add(char_id)
+        pending.manifest = True
+
+        if guild.text_index is not None:
+            guild.text_index.index_character(user_key, char_id, {'backstory': char_data.get('backstory'), 'notes': notes})
+
+    @_bounded
+    def update(self, guild_id: int, char_id: str, document: Dict[str, Any]) -> None:
+        """Record changes made to a character's document"""
+        guild = self._guild(guild_id)
+        self._cache.set(('doc', guild_id, char_id), document, approx_size(document))
+        entry = guild.manifest[char_id]
+        for field in MANIFEST_FIELDS:
+            entry[field] = document.get(field)
+        guild.index.put(entry['owner'], char_id, document)
+
+        pending = self._pending_writes(guild_id)
+        pending.documents.add(char_id)
+        pending.manifest = True
+
+        if guild.text_index is not None:
+            guild.text_index.add_document((entry['owner'], char_id, 'backstory', -1), document.get('backstory'))
+
+    @_bounded
+    def append_note(self, guild_id: int, char_id: str, note: str) -> int:
+        """Add a note to a character, returning its new note count"""
+        guild = self._guild(guild_id)
+        entry = guild.manifest[char_id]
+        count = entry['notes']
+        chunk = count // NOTE_CHUNK_SIZE
+        self._note_chunk(guild_id, char_id, chunk).append(note)
+        self._cache.resize(('notes', guild_id, char_id, chunk), approx_size(note) + 8)
+        entry['notes'] = count + 1
+
+        pending = self._pending_writes(guild_id)
+        pending.chunks.add((char_id, chunk))
+        pending.manifest = True
+
+        if guild.text_index is not None:
+            guild.text_index.add_document((entry['owner'], char_id, 'note', count), note)
+        return count + 1
+
+    @_bounded
+    def clear_notes(self, guild_id: int, char_id: str) -> int:
+        """Remove every note from a character, returning how many there were"""
+        guild = self._guild(guild_id)
+        entry = guild.manifest[char_id]
+        count = entry['notes']
+        pending = self._pending_writes(guild_id)
+        for chunk in range((count + NOTE_CHUNK_SIZE - 1) // NOTE_CHUNK_SIZE):
+            self._cache.set(('notes', guild_id, char_id, chunk), [], approx_size([]))
+            pending.chunks.add((char_id, chunk))
+        entry['notes'] = 0
+        pending.manifest = True
+
+        if guild.text_index is not None:
+            for i in range(count):
+                guild.text_index.remove_document((entry['owner'], char_id, 'note', i))
+        return count
+
+    @_bounded
+    def remove(self, guild_id: int, char_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a character, returning its manifest entry"""
+        guild = self._guild(guild_id)
+        entry = guild.manifest.pop(char_id, None)
+        if entry is None:
+            return None
+        self._cache.resize(('guild', guild_id), -approx_size(entry) * GUILD_INDEX_FACTOR)
+        guild.index.remove(entry['owner'], char_id)
+        if guild.text_index is not None:
+            guild.text_index.remove_character(entry['owner'], char_id)
+
+        chunks = (entry['notes'] + NOTE_CHUNK_SIZE - 1) // NOTE_CHUNK_SIZE
+        self._cache.pop(('doc', guild_id, char_id))
+        for chunk in range(chunks):
+            self._cache.pop(('notes', guild_id, char_id, chunk))
+
+        pending = self._pending_writes(guild_id)
+        pending.documents.discard(char_id)
+        # Chunks emptied by an unsaved clear_notes are still on disk
+        unsaved = [chunk + 1 for key, chunk in pending.chunks if key == char_id]
+        pending.chunks = {key for key in pending.chunks if key[0] != char_id}
+        pending.deleted[char_id] = max([chunks, *unsaved])
+        pending.manifest = True
+        return entry
+
+    @_bounded
+    def save(self, guild_id: int) -> bool:
+        """Write the guild's unsaved changes to disk"""
+        return self._flush(guild_id)
+
+    @_bounded
+    def save_all(self) -> bool:
+        """Write every guild's unsaved changes; False if any guild failed"""
+        saved = True
+        for guild_id in list(self._pending):
+            saved = self._flush(guild_id) and saved
+        return saved
+
+    # -- Encounters ---------------------------------------------------------
+
+    @_bounded
+    def get_encounter(self, guild_id: int, channel_id: int) -> Optional[Dict[str, Any]]:
+        """A channel's saved encounter, read straight from disk (callers keep live ones themselves)"""
+        try:
+            return self._read_file(self._guild_dir(guild_id) / f"{ENCOUNTER_PREFIX}{channel_id}")
+        except (ValueError, OSError, EOFError) as e:
+            logger.error(f"Error loading encounter for channel {channel_id} in guild {guild_id}: {e}")
+            return None
+
+    @_bounded
+    def put_encounter(self, guild_id: int, channel_id: int, state: Optional[Dict[str, Any]]) -> None:
+        """Write a channel's encounter, or delete it when ``state`` is None"""
+        base = self._guild_dir(guild_id) / f"{ENCOUNTER_PREFIX}{channel_id}"
+        if state is None:
+            self._delete_file(base)
+            return
+        # Split a legacy guild first, so its directory never exists without a manifest
+        self._guild(guild_id)
+        self._guild_dir(guild_id).mkdir(exist_ok=True)
+        self._write_file(base, state)
+
+    def _write_document(self, guild_id: int, char_id: str) -> None:
+        self._write_file(self._guild_dir(guild_id) / char_id, self._cache.peek(('doc', guild_id, char_id)))
+
+    def _write_chunk(self, guild_id: int, char_id: str, chunk: int) -> None:
+        notes = self._cache.peek(('notes', guild_id, char_id, chunk))
+        if notes:
+            self._write_file(self._chunk_base(guild_id, char_id, chunk), notes)
+        else:
+            self._delete_file(self._chunk_base(guild_id, char_id, chunk))
+
+    def _flush(self, guild_id: int) -> bool:
+        pending = self._pending.pop(guild_id, None)
+        if pending is None:
+            return True
+        try:
+            self._guild_dir(guild_id).mkdir(exist_ok=True)
+            # Unsaved entries are never evicted before this runs, so peek always finds them
+            for char_id in pending.documents:
+                self._write_document(guild_id, char_id)
+            for char_id, chunk in pending.chunks:
+                self._write_chunk(guild_id, char_id, chunk)
+            # Manifest after documents and before deletions, so it never lists missing files
+            if pending.manifest:
+                self._write_manifest(guild_id, self._cache.peek(('guild', guild_id)).manifest)
+            for char_id, chunks in pending.deleted.items():
+                self._delete_file(self._guild_dir(guild_id) / char_id)
+                for chunk in range(chunks):
+                    self._delete_file(self._chunk_base(guild_id, char_id, chunk))
+            return True
+        except OSError as e:
+            logger.error(f"Error saving characters for guild {guild_id}: {e}")
+            # Memory no longer matches disk; reload on next access
+            self.evict(guild_id)
+            return False
+
+    def _write_back(self, key: Tuple, value: Any) -> None:
+        """
+        Cache eviction hook: write the entry out first if it has unsaved changes.
+
+        A document or non-empty note chunk is written on its own, which is
+        safe before the manifest lists it; anything else saves the whole
+        guild. Writing single entries keeps a large unsaved guild (a bulk
+        import, say) from rewriting its manifest on every eviction.
+        """
+        guild_id = key[1]
+        pending = self._pending.get(guild_id)
+        if pending is None:
+            return
+        if key[0] == 'guild':
+            self.write_backs += 1
+            self._flush(guild_id)
+            return
+
+        dirty, item = (pending.documents, key[2]) if key[0] == 'doc' else (pending.chunks, (key[2], key[3]))
+        if item not in dirty:
+            return
+        self.write_backs += 1
+        if key[0] == 'notes' and not value:
+            # Deleting an emptied chunk has to wait for the manifest
+            self._flush(guild_id)
+            return
+
+        try:
+            self._guild_dir(guild_id).mkdir(exist_ok=True)
+            if key[0] == 'doc':
+                self._write_document(guild_id, key[2])
+            else:
+                self._write_chunk(guild_id, key[2], key[3])
+            dirty.discard(item)
+        except OSError as e:
+            logger.error(f"Error saving characters for guild {guild_id}: {e}")
+            self.evict(guild_id)
+
+    def evict(self, guild_id: int) -> None:
+        """Forget a guild's in-memory data, indexes and unsaved changes"""
+        with self._lock:
+            self._pending.pop(guild_id, None)
+            self._cache.invalidate(lambda key: key[1] == guild_id)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Cache counters plus how many guilds, documents and note chunks are resident"""
+        with self._lock:
+            stats = self._cache.stats()
+            kinds = {'guild': 0, 'doc': 0, 'notes': 0}
+            for key in self._cache:
+                kinds[key[0]] += 1
+            stats.update(
+                guilds=kinds['guild'],
+                documents=kinds['doc'],
+                note_chunks=kinds['notes'],
+                write_backs=self.write_backs,
+                dirty_guilds=len(self._pending),
+            )
+            return stats
+
+    @_bounded
+    def migrate(self, fmt: str) -> Dict[str, int]:
+        """
+        Rewrite every guild's files in another storage format.
+
+        Subsequent saves also use the new format. Returns counts of migrated
+        and failed guilds plus total bytes before and after.
+        """
+        fmt = resolve_format(fmt)
+        stats = {'guilds': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+        self.format = fmt
+        for guild_id in list(self.guild_ids()):
+            try:
+                before = self._guild_size(guild_id)
+                # Loading splits legacy files; flushing writes resident changes
+                self._guild(guild_id)
+                if not self._flush(guild_id):
+                    raise OSError("unsaved changes could not be written")
+                for path in list(self._guild_dir(guild_id).iterdir()):
+                    base_name, suffix = _split_suffix(path.name)
+                    if suffix is not None and path.exists():
+                        self._write_file(path.with_name(base_name), decode(path.read_bytes()), fmt)
+                stats['bytes_after'] += self._guild_size(guild_id)
+                stats['bytes_before'] += before
+                stats['guilds'] += 1
+            except (ValueError, OSError, EOFError) as e:
+                logger.error(f"Error migrating characters for guild {guild_id}: {e}")
+                stats['failed'] += 1
+            # Keep memory bounded while walking every guild
+            self._cache.evict()
+
+        return stats
+
+    @_bounded
+    def check(self, guild_id: int, repair: bool = False) -> Dict[str, Any]:
+        """
+        Check a guild's files on disk, optionally repairing them.
+
+        Every document and note chunk is read and its manifest entry rebuilt
+        from it. The report counts entries whose document is missing or
+        unreadable, entries that disagree with their files, documents the
+        manifest doesn't list, leftover files (temporary files, copies in
+        another format, chunks nothing refers to) and names an owner has in
+        more than one capitalization. Legacy single-file guilds are only
+        counted unless repairing.
+
+        With ``repair`` the manifest is rewritten from what was found, so
+        unlisted documents are listed again rather than lost; duplicate
+        names get a number, notes are rechunked where needed, leftovers are
+        deleted and everything is rewritten in the store's format.
+        """
+        report: Dict[str, Any] = {
+            'characters': 0, 'notes': 0, 'bytes_before': self._guild_size(guild_id), 'bytes_after': 0,
+            'legacy': False, 'missing': 0, 'corrupt': 0, 'stale': 0, 'unlisted': 0,
+            'leftovers': 0, 'duplicates': 0, 'rewritten': 0, 'problems': [],
+        }
+
+        def problem(kind: str, text: str) -> None:
+            report[kind] += 1
+            if len(report['problems']) < MAX_REPORTED_PROBLEMS:
+                report['problems'].append(text)
+
+        guild_dir = self._guild_dir(guild_id)
+        if not guild_dir.is_dir():
+            report['legacy'] = True
+            if not repair:
+                try:
+                    legacy = self._read_file(self.data_dir / str(guild_id)) or {}
+                    report['characters'] = sum(len(user_chars) for user_chars in legacy.values())
+                except (ValueError, AttributeError, OSError, EOFError) as e:
+                    problem('corrupt', f"legacy file unreadable: {e}")
+                report['bytes_after'] = report['bytes_before']
+                return report
+            # Loading splits it into the manifest layout
+            self._guild(guild_id)
+        if not self._flush(guild_id):
+            raise OSError("unsaved changes could not be written")
+        self.evict(guild_id)
+
+        # Group files by base name; the preferred format comes first
+        suffix_rank = {suffix: rank for rank, suffix in enumerate(dict.fromkeys([FORMAT_SUFFIXES[self.format], *FORMAT_SUFFIXES.values()]))}
+        variants: Dict[str, List[Tuple[int, Path]]] = {}
+        leftovers: List[Path] = []
+        for path in guild_dir.iterdir():
+            base_name, suffix = _split_suffix(path.name)
+            if suffix is not None:
+                variants.setdefault(base_name, []).append((suffix_rank[suffix], path))
+            elif path.name.endswith('.tmp'):
+                leftovers.append(path)
+
+        files: Dict[str, Path] = {}
+        stale_format: Set[str] = set()
+        for base_name, paths in variants.items():
+            paths.sort()
+            files[base_name] = paths[0][1]
+            leftovers.extend(path for _, path in paths[1:])
+            if paths[0][0]:
+                stale_format.add(base_name)
+
+        manifest: Dict[str, Dict[str, Any]] = {}
+        if 'manifest' in files:
+            try:
+                manifest = decode(files['manifest'].read_bytes())['characters']
+                if not all(isinstance(entry, dict) for entry in manifest.values()):
+                    raise ValueError("malformed entries")
+            except (ValueError, KeyError, TypeError, AttributeError, OSError, EOFError) as e:
+                manifest = {}
+                problem('corrupt', f"manifest unreadable: {e}")
+
+        documents: Dict[str, Path] = {}
+        chunks: Dict[str, Dict[int, Path]] = {}
+        for base_name, path in files.items():
+            char_id, notes_marker, chunk = base_name.rpartition('.notes.')
+            if notes_marker and chunk.isdigit():
+                chunks.setdefault(char_id, {})[int(chunk)] = path
+            elif base_name != 'manifest' and not base_name.startswith(ENCOUNTER_PREFIX):
+                documents[base_name] = path
+
+        # Rebuild every entry from its files
+        rebuilt: Dict[str, Dict[str, Any]] = {}
+        # Characters whose notes need rechunking -> sizes of their chunks (None if unreadable)
+        rechunk: Dict[str, List[Optional[int]]] = {}
+        for char_id in [*manifest, *sorted(documents.keys() - manifest.keys())]:
+            path = documents.get(char_id)
+            if path is None:
+                problem('missing', f"{char_id}: document missing")
+                continue
+            try:
+                document = decode(path.read_bytes())
+                if not isinstance(document, dict) or not isinstance(document.get('name'), str):
+                    raise ValueError("not a character document")
+            except (ValueError, OSError, EOFError) as e:
+                problem('corrupt', f"{char_id}: document unreadable: {e}")
+                continue
+
+            if char_id in manifest:
+                owner = manifest[char_id].get('owner') or char_id.split('_')[0]
+            else:
+                problem('unlisted', f"{char_id}: not in the manifest")
+                owner = char_id.split('_')[0]
+
+            sizes: List[Optional[int]] = []
+            char_chunks = chunks.pop(char_id, {})
+            while len(sizes) in char_chunks:
+                try:
+                    notes = decode(char_chunks.pop(len(sizes)).read_bytes())
+                    if not isinstance(notes, list):
+                        raise ValueError("not a list of notes")
+                    sizes.append(len(notes))
+                except (ValueError, OSError, EOFError) as e:
+                    problem('corrupt', f"{char_id}: notes chunk {len(sizes)} unreadable: {e}")
+                    sizes.append(None)
+            # Chunks after a gap can't be reached
+            leftovers.extend(char_chunks.values())
+            if any(size != NOTE_CHUNK_SIZE for size in sizes[:-1]) or sizes[-1:] == [None] or any(
+                f"{char_id}.notes.{chunk}" in stale_format for chunk in range(len(sizes))
+            ):
+                rechunk[char_id] = sizes
+
+            entry = rebuilt[char_id] = self._entry(owner, document, sum(size or 0 for size in sizes))
+            if char_id in manifest and manifest[char_id] != entry:
+                problem('stale', f"{char_id}: manifest entry out of date")
+
+        for char_chunks in chunks.values():
+            leftovers.extend(char_chunks.values())
+        report['leftovers'] = len(leftovers)
+        if leftovers and len(report['problems']) < MAX_REPORTED_PROBLEMS:
+            report['problems'].append(f"{len(leftovers)} leftover files")
+
+        # Names are unique per owner, ignoring case; later duplicates get a number
+        taken: Set[Tuple[str, str]] = set()
+        renames: Dict[str, str] = {}
+        for char_id, entry in rebuilt.items():
+            key = (entry['owner'], normalize_name(entry['name']))
+            if key not in taken:
+                taken.add(key)
+                continue
+            number = 2
+            while (entry['owner'], normalize_name(f"{entry['name']} ({number})")) in taken:
+                number += 1
+            renames[char_id] = f"{entry['name']} ({number})"
+            taken.add((entry['owner'], normalize_name(renames[char_id])))
+            problem('duplicates', f"{char_id}: '{entry['name']}' duplicates another of <@{entry['owner']}>'s names")
+
+        report['characters'] = len(rebuilt)
+        report['notes'] = sum(entry['notes'] for entry in rebuilt.values())
+        if not repair:
+            report['bytes_after'] = report['bytes_before']
+            return report
+
+        for path in leftovers:
+            if path.exists():
+                path.unlink()
+        for char_id, entry in rebuilt.items():
+            if char_id in renames or char_id in stale_format:
+                document = decode(documents[char_id].read_bytes())
+                if char_id in renames:
+                    document['name'] = entry['name'] = renames[char_id]
+                self._write_file(guild_dir / char_id, document)
+                report['rewritten'] += 1
+            if char_id in rechunk:
+                sizes = rechunk[char_id]
+                notes = []
+                for chunk, size in enumerate(sizes):
+                    if size is not None:
+                        notes.extend(self._read_file(self._chunk_base(guild_id, char_id, chunk)))
+                for chunk in range(len(sizes)):
+                    chunk_notes = notes[chunk * NOTE_CHUNK_SIZE:(chunk + 1) * NOTE_CHUNK_SIZE]
+                    if chunk_notes:
+                        self._write_file(self._chunk_base(guild_id, char_id, chunk), chunk_notes)
+                    else:
+                        self._delete_file(self._chunk_base(guild_id, char_id, chunk))
+                report['rewritten'] += 1
+        if rebuilt != manifest or 'manifest' in stale_format:
+            self._write_manifest(guild_id, rebuilt)
+            report['rewritten'] += 1
+
+        report['bytes_after'] = self._guild_size(guild_id)
+        return report
+
+    def iter_characters(self, guild_id: int) -> Iterator[Tuple[str, str, Dict[str, Any], List[str]]]:
+        """
+        Stream (user_key, char_id, document, notes) for every character in a guild.
+
+        Cached copies are used where present and everything else is read
+        straight from disk without entering the cache, so walking a large
+        guild doesn't push out the working set.
+        """
+        characters = [(char_id, entry['owner'], entry['notes']) for char_id, entry in self.manifest(guild_id).items()]
+        for char_id, user_key, note_count in characters:
+            with self._lock:
+                document = self._cache.peek(('doc', guild_id, char_id)) or self._read_document(guild_id, char_id)
+                notes = []
+                for chunk in range((note_count + NOTE_CHUNK_SIZE - 1) // NOTE_CHUNK_SIZE):
+                    chunk_notes = self._cache.peek(('notes', guild_id, char_id, chunk))
+                    notes.extend(chunk_notes if chunk_notes is not None else self._read_chunk(guild_id, char_id, chunk))
+            if document is not None:
+                yield user_key, char_id, document, notes
+
+    def _guild_size(self, guild_id: int) -> int:
+        paths = self._variants(self.data_dir / str(guild_id))
+        if self._guild_dir(guild_id).is_dir():
+            paths += [path for path in self._guild_dir(guild_id).iterdir() if _split_suffix(path.name)[1]]
+        return sum(path.stat().st_size for path in paths)
+
+    # -- Full-text search ---------------------------------------------------
+
+    @_bounded
+    def text_index(self, guild_id: int) -> TextIndex:
+        """Return the guild's full-text index, building it on first use"""
+        guild = self._guild(guild_id)
+        if guild.text_index is None:
+            text_index = TextIndex()
+            for user_key, char_id, document, notes in self.iter_characters(guild_id):
+                text_index.index_character(user_key, char_id, {
+                    'backstory': document.get('backstory'),
+                    'notes': notes,
+                })
+            guild.text_index = text_index
+            self._cache.resize(('guild', guild_id), text_index.approx_size())
+        return guild.text_index
+
+    @_bounded
+    def search(self, guild_id: int, query: str, limit: int = 10) -> List[Tuple[DocId, float, Dict[str, Any]]]:
+        """Search backstories and notes across the guild, returning (doc_id, score, entry)"""
+        manifest = self._guild(guild_id).manifest
+        return [
+            (doc_id, score, manifest[doc_id[1]])
+            for doc_id, score in self.text_index(guild_id).search(query, limit)
+        ]
+
+    @_bounded
+    def document_text(self, guild_id: int, doc_id: DocId) -> str:
+        """Return the backstory or note a search result refers to"""
+        _, char_id, field, note_index = doc_id
+        if field == 'note':
+            return self.notes(guild_id, char_id, note_index, note_index + 1)[0]
+        return self._document(guild_id, char_id)['backstory']
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .memory_cache import approx_mapping_size
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+
+    The first caller for a key runs the work; callers arriving while it is
+    still in flight await the same future instead of repeating it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``func`` for ``key`` unless an identical call is already running"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            # Shield so one cancelled waiter doesn't cancel the shared work
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(func())
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+class TTLCache:
+    """Small dict-backed cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        self._entries[key] = (now + self.ttl, value)
+
+        if len(self._entries) > self.max_entries:
+            self._purge(now)
+            # Still full: drop the oldest insertions
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches ``predicate``"""
+        stale = [key for key in self._entries if predicate(key)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _purge(self, now: float) -> None:
+        expired = [key for key, (expires, _) in self._entries.items() if expires < now]
+        for key in expired:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes': approx_mapping_size(self._entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
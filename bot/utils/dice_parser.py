@@ -1,39 +1,72 @@
+import functools
 import re
-import random
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .dice_source import DiceSource, SeededDice, dice_source
+
+# A dice group like 2d6 (with its sign) or a signed constant like -1
+TERM_PATTERN = re.compile(r'([+-]?)(\d*)d(\d+)|([+-]\d+)')
+
+def scan_inline_rolls(text: str, limit: int = 10, max_length: int = 100) -> List[str]:
+    """
+    Find the expressions inside [[...]] markers in one left-to-right pass.
+    
+    Only the expressions themselves are sliced out of ``text``. Empty,
+    unclosed or over-long markers are skipped, and scanning stops after
+    ``limit`` expressions.
+    """
+    found = []
+    start = text.find('[[')
+    while start != -1 and len(found) < limit:
+        end = text.find(']]', start + 2)
+        if end == -1:
+            break
+        # In "[[a [[1d20]]" only the innermost marker counts
+        inner = text.rfind('[[', start + 2, end)
+        inner = start + 2 if inner == -1 else inner + 2
+        if inner < end and end - inner <= max_length:
+            expression = text[inner:end].strip()
+            if expression:
+                found.append(expression)
+        start = text.find('[[', end + 2)
+    return found
+
+class RollPlan(NamedTuple):
+    """A compiled expression: dice groups as (count, sides) and the summed modifier"""
+    groups: Tuple[Tuple[int, int], ...]
+    modifier: int
 
 class DiceParser:
     """Utility class for parsing and rolling dice expressions"""
     
-    def __init__(self, max_dice: int = 100, max_sides: int = 1000):
+    def __init__(self, max_dice: int = 100, max_sides: int = 1000, source: Optional[DiceSource] = None,
+                 cache_size: int = 1024):
         self.max_dice = max_dice
         self.max_sides = max_sides
+        self.source = source or dice_source
+        # Common expressions compile once; rolling a cached plan skips the regex
+        self.compile = functools.lru_cache(maxsize=cache_size)(self._compile)
     
-    def parse_expression(self, expression: str) -> Optional[Dict]:
+    def _compile(self, expression: str) -> Optional[RollPlan]:
         """
-        Parse dice expressions like 1d20+5, 2d6-1, etc.
+        Compile an expression like 1d20+5 or 2d6+1d4-1 into a RollPlan.
         
-        Args:
-            expression: Dice expression string
-            
-        Returns:
-            Parsed result dictionary or None if invalid
+        Returns None if it has no dice; raises ValueError if it breaks the limits.
         """
-        pattern = r'(\d*)d(\d+)([+-]?\d*)'
-        matches = re.findall(pattern, expression.lower().replace(' ', ''))
-        
-        if not matches:
-            return None
+        groups = []
+        modifier = 0
         
-        rolls = []
-        total_modifier = 0
-        
-        for match in matches:
-            num_dice = int(match[0]) if match[0] else 1
-            dice_sides = int(match[1])
-            modifier = int(match[2]) if match[2] else 0
+        for sign, count, sides, constant in TERM_PATTERN.findall(expression.lower().replace(' ', '')):
+            if constant:
+                modifier += int(constant)
+                continue
+            
+            num_dice = int(count) if count else 1
+            dice_sides = int(sides)
             
             # Validate limits
+            if sign == '-':
+                raise ValueError("Dice can't be subtracted")
             if num_dice > self.max_dice:
                 raise ValueError(f"Too many dice! Maximum is {self.max_dice}")
             if dice_sides > self.max_sides:
@@ -41,7 +74,20 @@ class DiceParser:
             if dice_sides < 1:
                 raise ValueError("Dice must have at least 1 side")
             
-            dice_rolls = [random.randint(1, dice_sides) for _ in range(num_dice)]
+            groups.append((num_dice, dice_sides))
+        
+        if not groups:
+            return None
+        return RollPlan(tuple(groups), modifier)
+    
+    def roll_plan(self, plan: RollPlan, expression: str,
+                  source: Optional[Union[DiceSource, SeededDice]] = None) -> Dict:
+        """Roll a compiled plan, giving the same result shape as parse_expression"""
+        source = source or self.source
+        rolls = []
+        
+        for num_dice, dice_sides in plan.groups:
+            dice_rolls = source.roll_many(num_dice, dice_sides)
             rolls.append({
                 'notation': f"{num_dice}d{dice_sides}",
                 'rolls': dice_rolls,
@@ -49,26 +95,29 @@ class DiceParser:
                 'num_dice': num_dice,
                 'sides': dice_sides
             })
-            total_modifier += modifier
         
         return {
             'rolls': rolls,
-            'modifier': total_modifier,
+            'modifier': plan.modifier,
             'expression': expression
         }
     
-    def roll_simple(self, num_dice: int, sides: int, modifier: int = 0) -> Dict:
-        """Simple dice roll helper"""
-        if num_dice > self.max_dice or sides > self.max_sides:
-            raise ValueError("Dice or sides exceed maximum allowed")
+    def parse_expression(self, expression: str,
+                         source: Optional[Union[DiceSource, SeededDice]] = None) -> Optional[Dict]:
+        """
+        Parse dice expressions like 1d20+5, 2d6-1, etc.
         
-        rolls = [random.randint(1, sides) for _ in range(num_dice)]
-        return {
-            'rolls': rolls,
-            'sum': sum(rolls),
-            'modifier': modifier,
-            'total': sum(rolls) + modifier
-        }
+        Args:
+            expression: Dice expression string
+            source: Dice to roll with instead of the parser's own source
+            
+        Returns:
+            Parsed result dictionary or None if invalid
+        """
+        plan = self.compile(expression)
+        if plan is None:
+            return None
+        return self.roll_plan(plan, expression, source)
     
     @staticmethod
     def format_result(parsed_result: Dict) -> str:
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import random
+import struct
+from collections import deque
+from typing import Deque, Dict, Iterable, List, MutableSequence, Optional
+
+from config.config import Config
+
+# Dice sizes that get a pre-drawn buffer (everything else is rolled directly)
+BUFFERED_SIDES = (4, 6, 8, 10, 12, 20, 100)
+
+class DiceSource:
+    """
+    Source of dice faces backed by per-sides ring buffers.
+
+    Faces for common dice are drawn in bulk with ``random.choices`` and served
+    one at a time from a deque, so a single roll costs a ``popleft`` instead of
+    a ``random.randint`` call. Buffers are topped up once they drop below the
+    low-water mark, in the background when an event loop is running.
+    Audited rolls come from SeededDice instead and never touch the buffers.
+    """
+
+    def __init__(self, buffer_size: int = 1024, low_water: int = 128,
+                 sides: Iterable[int] = BUFFERED_SIDES, rng: Optional[random.Random] = None):
+        self.buffer_size = max(1, buffer_size)
+        self.low_water = min(max(0, low_water), self.buffer_size)
+        self._rng = rng or random.Random()
+        self._faces: Dict[int, range] = {s: range(1, s + 1) for s in sides}
+        self._buffers: Dict[int, Deque[int]] = {s: deque() for s in self._faces}
+        self._pending_refill = set()
+
+        self._hits = dict.fromkeys(self._faces, 0)
+        self._misses = dict.fromkeys(self._faces, 0)
+        self._refills = dict.fromkeys(self._faces, 0)
+        self._unbuffered = 0
+
+    def roll(self, sides: int) -> int:
+        """Roll a single die"""
+        buffer = self._buffers.get(sides)
+        if not buffer:
+            return self._roll_miss(sides)
+
+        self._hits[sides] += 1
+        value = buffer.popleft()
+        if len(buffer) < self.low_water:
+            self._schedule_refill(sides)
+        return value
+
+    def _roll_miss(self, sides: int) -> int:
+        """Slow path for a single roll: unbuffered size or empty buffer"""
+        if sides not in self._buffers:
+            self._unbuffered += 1
+            return self._rng.randint(1, sides)
+
+        self._misses[sides] += 1
+        self._refill(sides)
+        return self._buffers[sides].popleft()
+
+    def roll_many(self, count: int, sides: int) -> List[int]:
+        """Roll ``count`` dice with the same number of sides"""
+        if count <= 0:
+            return []
+
+        buffer = self._buffers.get(sides)
+        if buffer is None:
+            self._unbuffered += 1
+            return self._rng.choices(range(1, sides + 1), k=count)
+
+        if count > self.buffer_size:
+            # Larger than the whole buffer: draw in one bulk call instead
+            self._misses[sides] += 1
+            return self._rng.choices(self._faces[sides], k=count)
+
+        if len(buffer) >= count:
+            self._hits[sides] += 1
+        else:
+            self._misses[sides] += 1
+            self._refill(sides)
+
+        popleft = buffer.popleft
+        values = [popleft() for _ in range(count)]
+        if len(buffer) < self.low_water:
+            self._schedule_refill(sides)
+        return values
+
+    def shuffle(self, values: MutableSequence) -> None:
+        """Shuffle a sequence in place using the source's generator"""
+        self._rng.shuffle(values)
+
+    def _refill(self, sides: int) -> None:
+        """Top the buffer for ``sides`` back up to its full size"""
+        self._pending_refill.discard(sides)
+        buffer = self._buffers[sides]
+        missing = self.buffer_size - len(buffer)
+        if missing > 0:
+            buffer.extend(self._rng.choices(self._faces[sides], k=missing))
+            self._refills[sides] += 1
+
+    def _schedule_refill(self, sides: int) -> None:
+        """Refill after the current callback if a loop is running, otherwise right away"""
+        if sides in self._pending_refill:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._refill(sides)
+            return
+
+        self._pending_refill.add(sides)
+        loop.call_soon(self._refill, sides)
+
+    @property
+    def hits(self) -> int:
+        """Rolls served straight from a buffer"""
+        return sum(self._hits.values())
+
+    @property
+    def misses(self) -> int:
+        """Rolls that could not be served from a buffer (including unbuffered sizes)"""
+        return sum(self._misses.values()) + self._unbuffered
+
+    @property
+    def refills(self) -> int:
+        """Bulk refills performed across all buffers"""
+        return sum(self._refills.values())
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and buffer levels"""
+        hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'unbuffered': self._unbuffered,
+            'refills': self.refills,
+            'hit_rate': hits / total if total else 0.0,
+            'buffer_size': self.buffer_size,
+            'low_water': self.low_water,
+            'sides': {
+                sides: {
+                    'hits': self._hits[sides],
+                    'misses': self._misses[sides],
+                    'refills': self._refills[sides],
+                    'level': len(self._buffers[sides])
+                }
+                for sides in self._buffers
+            }
+        }
+
+    def reset_stats(self) -> None:
+        """Reset hit/miss counters"""
+        for counters in (self._hits, self._misses, self._refills):
+            for sides in counters:
+                counters[sides] = 0
+        self._unbuffered = 0
+
+class SeededDice:
+    """
+    Dice drawn from a keyed hash of ``seed`` and ``position``.
+
+    Faces come from BLAKE2b blocks of eight 64-bit words, each mapped onto a
+    die by multiply-shift (bias below sides / 2**64). Any roll can be replayed
+    from its seed and position alone, without replaying the rolls before it.
+    Same interface as DiceSource, so it can stand in for one.
+    """
+
+    WORDS = struct.Struct('<8Q')
+
+    def __init__(self, seed: bytes, position: int):
+        self.seed = seed
+        self.position = position
+        self._block = 0
+        self._words: List[int] = []
+
+    def _next_word(self) -> int:
+        if not self._words:
+            digest = hashlib.blake2b(struct.pack('<QQ', self.position, self._block), key=self.seed).digest()
+            self._words = list(reversed(self.WORDS.unpack(digest)))
+            self._block += 1
+        return self._words.pop()
+
+    def roll(self, sides: int) -> int:
+        """Roll a single die"""
+        return 1 + ((self._next_word() * sides) >> 64)
+
+    def roll_many(self, count: int, sides: int) -> List[int]:
+        """Roll ``count`` dice with the same number of sides"""
+        return [self.roll(sides) for _ in range(count)]
+
+    def shuffle(self, values: MutableSequence) -> None:
+        """Fisher-Yates shuffle in place"""
+        for i in range(len(values) - 1, 0, -1):
+            j = self.roll(i + 1) - 1
+            values[i], values[j] = values[j], values[i]
+
+# Shared source used by the parser and the cogs
+dice_source = DiceSource(Config.DICE_BUFFER_SIZE, Config.DICE_BUFFER_LOW_WATER)
@@ -0,0 +1,50 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+State = Dict[str, Any]
+Release = Callable[[State], Awaitable[None]]
+
+class StateHandoff:
+    """
+    Live cog state carried across an extension reload.
+
+    Before a reload, each of the extension's cogs that has ``export_state``
+    hands over its caches, open storage and running writers. From then on
+    its ``cog_unload`` leaves them open, and the reloaded cog ``take``s them
+    when it is constructed. If nothing takes a state (the new code dropped
+    the cog, or failed to load), ``release_all`` closes it with the callback
+    it was put with. Pending writes are then flushed, never lost or leaked.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, Tuple[State, Optional[Release]]] = {}
+        self.adopted = 0
+        self.released = 0
+
+    def put(self, cog_name: str, state: State, release: Optional[Release] = None) -> None:
+        self._states[cog_name] = (state, release)
+
+    def take(self, cog_name: str) -> Optional[State]:
+        """The state handed over by the cog's previous instance, if any; each state is taken once"""
+        entry = self._states.pop(cog_name, None)
+        if entry is None:
+            return None
+        self.adopted += 1
+        return entry[0]
+
+    async def release_all(self) -> List[str]:
+        """Close every state nobody took; returns their cog names"""
+        released = []
+        while self._states:
+            cog_name, (state, release) = self._states.popitem()
+            released.append(cog_name)
+            self.released += 1
+            if release is None:
+                continue
+            try:
+                await release(state)
+            except Exception:
+                logger.exception(f"Error releasing state handed over by {cog_name}")
+        return released
@@ -0,0 +1,152 @@
+import bisect
+import re
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# "Goblin +2 x6", "Gandalf", "Ambush =18": a name, then an optional modifier or fixed roll and count
+COMBATANT_PATTERN = re.compile(r'(?P<name>.+?)(?:\s+(?:(?P<modifier>[+-]\d+)|=(?P<fixed>\d+)))?(?:\s+x(?P<count>\d+))?')
+MAX_NAME_LENGTH = 32
+
+class CombatantSpec(NamedTuple):
+    """One entry of !init add: ``modifier`` and ``fixed`` are None unless given"""
+    name: str
+    modifier: Optional[int]
+    fixed: Optional[int]
+    count: int
+
+def parse_combatants(text: str) -> List[CombatantSpec]:
+    """Parse ``;``-separated combatant entries; raises ValueError on a malformed one"""
+    specs = []
+    for entry in text.split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        match = COMBATANT_PATTERN.fullmatch(entry)
+        if match is None or len(match.group('name')) > MAX_NAME_LENGTH:
+            raise ValueError(f"Can't read `{entry}`. Use a name of up to {MAX_NAME_LENGTH} characters, then +mod or =roll, then xN")
+        specs.append(CombatantSpec(
+            match.group('name').strip(),
+            int(match.group('modifier')) if match.group('modifier') else None,
+            int(match.group('fixed')) if match.group('fixed') else None,
+            int(match.group('count') or 1),
+        ))
+    return specs
+
+class Combatant:
+    """A place in the turn order. Never changes once added, so its key and tracker line are built once"""
+    __slots__ = ('name', 'initiative', 'modifier', 'seq', 'owner_id', 'key', 'line')
+
+    def __init__(self, name: str, initiative: int, modifier: int, seq: int, owner_id: int):
+        self.name = name
+        self.initiative = initiative
+        self.modifier = modifier
+        self.seq = seq
+        self.owner_id = owner_id
+        # Highest initiative first, then highest modifier, then whoever joined first
+        self.key = (-initiative, -modifier, seq)
+        self.line = f"`{initiative:>3}` {name}"
+
+class Encounter:
+    """
+    A channel's turn order, kept sorted as combatants come and go.
+
+    Combatants sit in a list ordered by their keys with a parallel list of
+    keys, so inserts and removals find their place by bisection and nothing
+    is ever re-sorted; a name index finds a combatant's key without a scan.
+    Until the first ``advance`` the encounter hasn't started and the turn
+    stays with whoever is first in order, however combatants join. After
+    that ``turn`` points at whoever is acting and is moved along when
+    someone is added or removed ahead of it, so advancing is just a step
+    forward.
+    """
+
+    def __init__(self, round_number: int = 1, turn: int = 0, seq: int = 0, message_id: Optional[int] = None,
+                 started: bool = False):
+        self.round = round_number
+        self.turn = turn
+        self.seq = seq
+        self.message_id = message_id
+        self.started = started
+        self._order: List[Combatant] = []
+        self._keys: List[Tuple[int, int, int]] = []
+        self._names: Dict[str, Combatant] = {}
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._names
+
+    @property
+    def current(self) -> Optional[Combatant]:
+        return self._order[self.turn] if self._order else None
+
+    def add(self, name: str, initiative: int, modifier: int, owner_id: int) -> Combatant:
+        """Put a combatant in its place; the current combatant keeps the turn"""
+        if name in self:
+            raise ValueError(f"{name} is already in the initiative order")
+        self.seq += 1
+        combatant = Combatant(name, initiative, modifier, self.seq, owner_id)
+        index = bisect.bisect_left(self._keys, combatant.key)
+        self._keys.insert(index, combatant.key)
+        self._order.insert(index, combatant)
+        self._names[name.lower()] = combatant
+        if self.started and index <= self.turn and len(self._order) > 1:
+            self.turn += 1
+        return combatant
+
+    def remove(self, name: str) -> Optional[Combatant]:
+        """Take a combatant out by name; if it was their turn, the next one in order has it"""
+        combatant = self._names.pop(name.lower(), None)
+        if combatant is None:
+            return None
+        index = bisect.bisect_left(self._keys, combatant.key)
+        del self._keys[index]
+        del self._order[index]
+        if index < self.turn:
+            self.turn -= 1
+        elif self.turn >= len(self._order):
+            # The last combatant of the round left on their own turn
+            self.turn = 0
+            if self._order:
+                self.round += 1
+        return combatant
+
+    def advance(self) -> Optional[Combatant]:
+        """Pass the turn to the next combatant, starting a new round after the last"""
+        if not self._order:
+            return None
+        self.started = True
+        self.turn += 1
+        if self.turn == len(self._order):
+            self.turn = 0
+            self.round += 1
+        return self._order[self.turn]
+
+    def upcoming(self, count: int) -> Iterator[Tuple[int, Combatant]]:
+        """Up to ``count`` combatants from the current one on, as (round, combatant)"""
+        size = len(self._order)
+        for offset in range(min(count, size)):
+            index = self.turn + offset
+            yield self.round + index // size, self._order[index % size]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'round': self.round,
+            'turn': self.turn,
+            'seq': self.seq,
+            'message_id': self.message_id,
+            'started': self.started,
+            'combatants': [[c.name, c.initiative, c.modifier, c.seq, c.owner_id] for c in self._order],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Encounter":
+        # Saves from before 'started' was kept count as started once the turn has moved
+        started = data.get('started', data.get('turn', 0) > 0 or data.get('round', 1) > 1)
+        encounter = cls(data.get('round', 1), 0, data.get('seq', 0), data.get('message_id'), started)
+        combatants = sorted((Combatant(*fields) for fields in data.get('combatants', ())), key=lambda c: c.key)
+        encounter._order = combatants
+        encounter._keys = [c.key for c in combatants]
+        encounter._names = {c.name.lower(): c for c in combatants}
+        encounter.turn = min(data.get('turn', 0), max(len(combatants) - 1, 0))
+        return encounter
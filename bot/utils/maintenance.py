@@ -0,0 +1,92 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from .character_store import CharacterStore
+
+logger = logging.getLogger(__name__)
+
+# Counters summed across guilds; see CharacterStore.check
+COUNTERS = (
+    'characters', 'notes', 'bytes_before', 'bytes_after', 'missing', 'corrupt',
+    'stale', 'unlisted', 'leftovers', 'duplicates', 'rewritten',
+)
+MAX_REPORTED_PROBLEMS = 50
+
+# Each worker process checks guilds with its own store
+_worker_store: Optional[CharacterStore] = None
+
+def _init_worker(data_dir: str, fmt: str, max_bytes: int) -> None:
+    global _worker_store
+    _worker_store = CharacterStore(Path(data_dir), fmt, max_bytes=max_bytes)
+
+def _check_guild(job: Tuple[int, bool]) -> Tuple[int, Dict[str, Any]]:
+    guild_id, repair = job
+    try:
+        report = _worker_store.check(guild_id, repair)
+    except Exception as e:
+        # One bad guild shouldn't end the run
+        logger.exception(f"Error checking guild {guild_id}")
+        report = {'failed': True, 'problems': [f"check failed: {e}"]}
+    finally:
+        _worker_store.evict(guild_id)
+    return guild_id, report
+
+def _check_all(
+    data_dir: Path, fmt: str, guild_ids: Iterable[int], repair: bool, workers: int, max_bytes: int
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    jobs = [(guild_id, repair) for guild_id in guild_ids]
+    if workers <= 1:
+        _init_worker(str(data_dir), fmt, max_bytes)
+        yield from map(_check_guild, jobs)
+        return
+
+    # Guilds are mostly small, so hand them out in chunks to keep overhead down
+    chunksize = max(1, min(64, len(jobs) // (workers * 8)))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(str(data_dir), fmt, max_bytes)) as pool:
+        yield from pool.map(_check_guild, jobs, chunksize=chunksize)
+
+def check_data_dir(
+    data_dir: Path,
+    fmt: str = 'compact',
+    repair: bool = False,
+    workers: Optional[int] = None,
+    max_bytes: int = 64 * 1024 * 1024,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Check (and with ``repair``, fix and compact) every guild in a data directory.
+
+    Guilds are spread over ``workers`` processes, one CPU each by default,
+    every process with its own store bounded by ``max_bytes``. Returns the
+    summed counters of CharacterStore.check plus guild totals, the first
+    problems found (prefixed with their guild id) and the time taken. Run it
+    while the bot is stopped: repairs rewrite files the bot may have cached.
+    """
+    start = time.perf_counter()
+    data_dir = Path(data_dir)
+    guild_ids = sorted(CharacterStore(data_dir, fmt).guild_ids())
+    workers = workers or os.cpu_count() or 1
+
+    totals: Dict[str, Any] = dict.fromkeys(COUNTERS, 0)
+    totals.update(guilds=len(guild_ids), legacy=0, failed=0, problem_guilds=0, problems=[])
+    for done, (guild_id, report) in enumerate(_check_all(data_dir, fmt, guild_ids, repair, workers, max_bytes), 1):
+        for counter in COUNTERS:
+            totals[counter] += report.get(counter, 0)
+        totals['legacy'] += bool(report.get('legacy'))
+        totals['failed'] += bool(report.get('failed'))
+        if report['problems']:
+            totals['problem_guilds'] += 1
+        for problem in report['problems']:
+            if len(totals['problems']) >= MAX_REPORTED_PROBLEMS:
+                break
+            totals['problems'].append(f"{guild_id}: {problem}")
+        if progress and (done % 100 == 0 or done == len(guild_ids)):
+            progress(done, len(guild_ids))
+
+    totals['workers'] = workers
+    totals['seconds'] = time.perf_counter() - start
+    return totals
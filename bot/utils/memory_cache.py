@@ -0,0 +1,125 @@
+import itertools
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+def approx_size(obj: Any) -> int:
+    """Rough deep size in bytes of JSON-like data (dicts, lists, strings, numbers)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += approx_size(key) + approx_size(value)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approx_size(item)
+    return size
+
+def approx_mapping_size(mapping: Dict[Any, Any], sample: int = 32) -> int:
+    """Estimate a large dict's deep size from its first ``sample`` items"""
+    if len(mapping) <= sample:
+        return approx_size(mapping)
+    per_item = sum(
+        approx_size(key) + approx_size(value)
+        for key, value in itertools.islice(mapping.items(), sample)
+    ) / sample
+    return sys.getsizeof(mapping) + int(per_item * len(mapping))
+
+class SizedLRUCache:
+    """
+    Least-recently-used cache bounded by the approximate size of its entries.
+
+    Callers give each entry a size in bytes and call ``evict`` once they are
+    done with the entries they just touched; the oldest entries are then
+    dropped until the total fits ``max_bytes``. ``on_evict`` runs before an
+    entry is dropped, so unsaved changes can be written back. The most
+    recent entry is never evicted, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, max_bytes: int, on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Get an entry without counting a hit or refreshing its position"""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def touch(self, key: Hashable) -> None:
+        """Mark an entry most recently used without counting a hit"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+
+    def set(self, key: Hashable, value: Any, size: int) -> None:
+        self.pop(key)
+        self._entries[key] = (value, size)
+        self.bytes += size
+
+    def resize(self, key: Hashable, delta: int) -> None:
+        """Adjust the recorded size of an entry that grew or shrank in place"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = (entry[0], entry[1] + delta)
+            self.bytes += delta
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.bytes -= entry[1]
+        return entry[0]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches ``predicate``, without calling ``on_evict``"""
+        stale = [key for key in self._entries if predicate(key)]
+        for key in stale:
+            self.pop(key)
+        return len(stale)
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits its budget"""
+        evicted = 0
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if self.on_evict is not None:
+                # May write back or even invalidate other entries
+                self.on_evict(key, self._entries[key][0])
+            if self.pop(key) is not None:
+                self.evictions += 1
+                evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Discord's limit on message content
+MAX_CONTENT_LENGTH = 2000
+
+class _Outgoing:
+    """A queued send or edit and everyone waiting on it"""
+    __slots__ = ('call', 'kwargs', 'message_id', 'frame', 'batchable', 'futures')
+
+    def __init__(self, call: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any],
+                 message_id: Optional[int], frame: bool, batchable: bool = False):
+        self.call = call
+        self.kwargs = kwargs
+        # Set for edits; sends have no message yet
+        self.message_id = message_id
+        self.frame = frame
+        # Sends whose callers never touch the message again, so it can be shared
+        self.batchable = batchable
+        # (future, whether its caller queued a frame and so never sees errors)
+        self.futures: List[Tuple[asyncio.Future, bool]] = []
+
+class OutboundScheduler:
+    """
+    Per-channel queue for outgoing messages and edits.
+
+    Each channel's queue is drained in order by one task, so a busy channel
+    waits on its own queue rather than piling requests onto discord.py's
+    rate limiter. While an edit is queued, later edits to the same message
+    replace its content instead of queueing behind it. Animation frames are
+    best effort: a frame that reaches the front of a backed-up queue is
+    dropped. When a channel is hot (``hot_depth`` or more queued), a short
+    batchable text reply is appended to a queued batchable one before it,
+    and both callers get the same message. Only replies nobody edits or
+    deletes later should be sent batchable.
+    """
+
+    def __init__(self, hot_depth: int = 3):
+        self.hot_depth = hot_depth
+        self._queues: Dict[int, Deque[_Outgoing]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.sent = 0
+        self.edits = 0
+        self.coalesced_edits = 0
+        self.dropped_frames = 0
+        self.batched_replies = 0
+        self.peak_depth = 0
+
+    def send(self, channel_id: int, send: Callable[..., Awaitable[Any]], content: Optional[str] = None,
+             batchable: bool = False, **kwargs: Any) -> "asyncio.Future[Any]":
+        """
+        Queue ``send(content, **kwargs)``; the future resolves to the message sent.
+
+        A ``batchable`` text reply may be merged into another batchable reply,
+        so its message can be shared with other callers.
+        """
+        queue = self._queues.setdefault(channel_id, deque())
+        if batchable and content is not None and not kwargs and queue and len(queue) >= self.hot_depth:
+            last = queue[-1]
+            if (last.batchable and set(last.kwargs) == {'content'}
+                    and len(last.kwargs['content']) + len(content) < MAX_CONTENT_LENGTH):
+                last.kwargs['content'] += "\n" + content
+                self.batched_replies += 1
+                return self._wait(last, False)
+        kwargs['content'] = content
+        return self._enqueue(channel_id, _Outgoing(send, kwargs, None, False, batchable))
+
+    def edit(self, channel_id: int, message: Any, frame: bool = False, **kwargs: Any) -> "asyncio.Future[Any]":
+        """
+        Queue ``message.edit(**kwargs)``, merged into an edit of the same message if one is waiting.
+
+        Frames resolve to None if dropped and never raise; other edits raise
+        whatever the edit raised.
+        """
+        for pending in self._queues.get(channel_id, ()):
+            if pending.message_id == message.id:
+                if pending.frame:
+                    self.dropped_frames += 1
+                pending.kwargs.update(kwargs)
+                pending.frame = pending.frame and frame
+                self.coalesced_edits += 1
+                return self._wait(pending, frame)
+        return self._enqueue(channel_id, _Outgoing(message.edit, kwargs, message.id, frame))
+
+    def _wait(self, outgoing: _Outgoing, frame: bool) -> "asyncio.Future[Any]":
+        future = asyncio.get_running_loop().create_future()
+        outgoing.futures.append((future, frame))
+        return future
+
+    def _enqueue(self, channel_id: int, outgoing: _Outgoing) -> "asyncio.Future[Any]":
+        future = self._wait(outgoing, outgoing.frame)
+        queue = self._queues.setdefault(channel_id, deque())
+        queue.append(outgoing)
+        self.peak_depth = max(self.peak_depth, len(queue))
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._drain(channel_id))
+        return future
+
+    async def _drain(self, channel_id: int) -> None:
+        queue = self._queues[channel_id]
+        try:
+            while queue:
+                outgoing = queue.popleft()
+                if outgoing.frame and queue:
+                    self.dropped_frames += 1
+                    self._resolve(outgoing, None)
+                    continue
+                try:
+                    result = await outgoing.call(**outgoing.kwargs)
+                except Exception as e:
+                    if outgoing.frame:
+                        logger.debug(f"Animation frame in channel {channel_id} failed: {e}")
+                    self._resolve(outgoing, None, e)
+                    continue
+                if outgoing.message_id is None:
+                    self.sent += 1
+                else:
+                    self.edits += 1
+                self._resolve(outgoing, result)
+        finally:
+            del self._workers[channel_id]
+            if not queue:
+                del self._queues[channel_id]
+
+    @staticmethod
+    def _resolve(outgoing: _Outgoing, result: Any, error: Optional[BaseException] = None) -> None:
+        for future, frame in outgoing.futures:
+            if future.done():
+                continue
+            if error is not None and not frame:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def depth(self, channel_id: int) -> int:
+        """Sends and edits waiting in a channel's queue"""
+        return len(self._queues.get(channel_id, ()))
+
+    async def close(self) -> None:
+        """Let every queue drain"""
+        if self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        depths = sorted(((len(queue), channel_id) for channel_id, queue in self._queues.items()), reverse=True)
+        return {
+            'channels': len(depths),
+            'queued': sum(depth for depth, _ in depths),
+            'hot': sum(depth >= self.hot_depth for depth, _ in depths),
+            'peak_depth': self.peak_depth,
+            'deepest': depths[:5],
+            'sent': self.sent,
+            'edits': self.edits,
+            'coalesced_edits': self.coalesced_edits,
+            'dropped_frames': self.dropped_frames,
+            'batched_replies': self.batched_replies,
+        }
@@ -0,0 +1,154 @@
+import asyncio
+import cProfile
+import io
+import marshal
+import pstats
+import time
+import tracemalloc
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+# Allocation frames from the profilers themselves, left out of memory diffs
+MEMORY_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+def percentiles(samples: List[float], points: Sequence[int] = (50, 90, 99)) -> Dict[int, float]:
+    """Nearest-rank percentiles of ``samples``; sorts them in place"""
+    samples.sort()
+    if not samples:
+        return {point: 0.0 for point in points}
+    return {point: samples[min(len(samples) - 1, len(samples) * point // 100)] for point in points}
+
+async def measure_loop_lag(duration: float, interval: float = 0.05) -> List[float]:
+    """How late the event loop woke a sleeper, sampled every ``interval`` seconds for ``duration``"""
+    lags = []
+    deadline = time.perf_counter() + duration
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            return lags
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+class ProfileReport(NamedTuple):
+    """A finished profile: totals, the top functions as text and the raw stats for pstats or snakeviz"""
+    seconds: float
+    calls: int
+    cpu_seconds: float
+    text: str
+    raw: bytes
+
+class LoopProfiler:
+    """
+    cProfile over the event loop thread, switched on and off by command.
+
+    Everything the loop runs while it is on is profiled: command handlers,
+    listeners, and discord.py's own gateway and HTTP handling. Storage calls
+    on their worker threads are not. When off it costs nothing; no hook
+    is installed.
+    """
+
+    def __init__(self):
+        self._profile: Optional[cProfile.Profile] = None
+        self._started = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._profile is not None
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started if self.running else 0.0
+
+    def start(self) -> None:
+        """Start profiling; raises ValueError if this or another profiler is already running"""
+        if self.running:
+            raise ValueError("The profiler is already running")
+        profile = cProfile.Profile()
+        profile.enable()
+        self._profile = profile
+        self._started = time.perf_counter()
+
+    def stop(self, top: int = 30, sort: str = 'cumulative', restrict: Optional[str] = None) -> ProfileReport:
+        """Stop profiling and report the ``top`` functions by ``sort``, optionally only those matching ``restrict``"""
+        if not self.running:
+            raise ValueError("The profiler isn't running")
+        profile, self._profile = self._profile, None
+        profile.disable()
+        seconds = time.perf_counter() - self._started
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats(sort)
+        stats.print_stats(*([restrict] if restrict else []), top)
+        # pstats.Stats.dump_stats writes the same marshalled dict
+        return ProfileReport(seconds, stats.total_calls, stats.total_tt, stream.getvalue(), marshal.dumps(stats.stats))
+
+class MemoryDiff(NamedTuple):
+    """Allocation growth between two snapshots"""
+    seconds: float
+    current: int
+    peak: int
+    size_diff: int
+    count_diff: int
+    text: str
+
+class MemoryProfiler:
+    """
+    tracemalloc snapshots, each diffed against the one before.
+
+    tracemalloc slows every allocation while tracing, so it only runs
+    between ``start`` and ``stop``.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._taken = 0.0
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        """Start tracing with ``frames`` of traceback per allocation and take the baseline snapshot"""
+        if self.running:
+            raise ValueError("Memory tracing is already running")
+        tracemalloc.start(frames)
+        self._snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_NOISE)
+        self._taken = time.perf_counter()
+
+    def snapshot(self, top: int = 30, group_by: Optional[str] = None) -> MemoryDiff:
+        """
+        Take a snapshot and diff it against the previous one; the top ``top`` changes by size.
+
+        Grouped by whole traceback when tracing keeps more than one frame, otherwise by line.
+        """
+        if not self.running or self._snapshot is None:
+            raise ValueError("Memory tracing isn't running")
+        group_by = group_by or ('traceback' if tracemalloc.get_traceback_limit() > 1 else 'lineno')
+        snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_NOISE)
+        now = time.perf_counter()
+        diff = snapshot.compare_to(self._snapshot, group_by)
+        seconds = now - self._taken
+        self._snapshot, self._taken = snapshot, now
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"{len(diff)} {group_by} groups changed over {seconds:.1f}s"]
+        for stat in diff[:top]:
+            lines.append(str(stat))
+            if len(stat.traceback) > 1:
+                lines.extend(f"    {line}" for line in stat.traceback.format())
+        return MemoryDiff(
+            seconds,
+            current,
+            peak,
+            sum(stat.size_diff for stat in diff),
+            sum(stat.count_diff for stat in diff),
+            "\n".join(lines),
+        )
+
+    def stop(self) -> None:
+        self._snapshot = None
+        tracemalloc.stop()
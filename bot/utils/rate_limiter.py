@@ -0,0 +1,153 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+DICE_PATTERN = re.compile(r'(\d*)d(\d+)', re.IGNORECASE)
+
+ANIMATION_FRAMES = 6
+
+# Extra cost for commands that rewrite the guild's character file
+STORE_WRITE_COMMANDS = {
+    "char create", "char delete", "char backstory", "char note", "char clearnotes",
+    "char modify name", "char modify nickname", "char modify role", "char modify system",
+    "char use", "char macro set", "char macro delete",
+}
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second"""
+
+    __slots__ = ('tokens', 'updated', 'notified_until')
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+        self.notified_until = 0.0
+
+    def refill(self, rate: float, capacity: float, now: float) -> None:
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+class RateLimiter:
+    """Set of token buckets keyed by id, bounded with LRU eviction"""
+
+    def __init__(self, rate: float, capacity: float, max_buckets: int = 10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self.evictions = 0
+
+    def bucket(self, key: Hashable, now: float) -> TokenBucket:
+        """Get the refilled bucket for ``key``, creating it if needed"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.capacity, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket.refill(self.rate, self.capacity, now)
+        return bucket
+
+    def retry_after(self, bucket: TokenBucket, cost: float) -> float:
+        """Seconds until ``bucket`` can afford ``cost`` (0 if it already can)"""
+        # A command costing more than the whole bucket only needs a full bucket
+        cost = min(cost, self.capacity)
+        if bucket.tokens >= cost:
+            return 0.0
+        return (cost - bucket.tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class CommandRateLimiter:
+    """Cost-weighted limiter applying user, channel and guild buckets together"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], max_buckets: int = 10000):
+        self.limiters = {
+            scope: RateLimiter(rate, capacity, max_buckets)
+            for scope, (rate, capacity) in limits.items()
+        }
+        self.throttled = 0
+
+    def acquire(self, keys: Dict[str, Optional[Hashable]], cost: float,
+                now: Optional[float] = None) -> Optional[Tuple[str, float, bool]]:
+        """
+        Charge ``cost`` to every scope's bucket, or none of them.
+
+        Args:
+            keys: Scope name to bucket key (None skips the scope, e.g. guild in DMs)
+            cost: Tokens the command costs
+
+        Returns:
+            None if allowed, otherwise (scope, retry_after, should_notify)
+        """
+        now = time.monotonic() if now is None else now
+
+        buckets = []
+        for scope, key in keys.items():
+            if key is None or scope not in self.limiters:
+                continue
+            limiter = self.limiters[scope]
+            bucket = limiter.bucket(key, now)
+            wait = limiter.retry_after(bucket, cost)
+            if wait > 0:
+                self.throttled += 1
+                # Only tell the user once per throttled window
+                notify = now >= bucket.notified_until
+                if notify:
+                    bucket.notified_until = now + wait
+                return scope, wait, notify
+            buckets.append((limiter, bucket))
+
+        for limiter, bucket in buckets:
+            bucket.tokens -= min(cost, limiter.capacity)
+        return None
+
+    def stats(self) -> Dict:
+        """Return bucket counts and eviction/throttle counters"""
+        return {
+            'throttled': self.throttled,
+            'scopes': {
+                scope: {'buckets': len(limiter), 'evictions': limiter.evictions}
+                for scope, limiter in self.limiters.items()
+            }
+        }
+
+def count_dice(text: str) -> int:
+    """Count the dice requested in an expression like 2d20+1d6"""
+    return sum(int(num) if num else 1 for num, _ in DICE_PATTERN.findall(text))
+
+def estimate_cost(command_name: str, args: str, animations: bool = False,
+                  dice_per_token: int = 20) -> float:
+    """
+    Estimate the cost of a command invocation in tokens.
+
+    Every command costs one token. Dice rolls add one token per
+    ``dice_per_token`` dice, animated rolls add half a token per animation
+    edit and character mutations add the cost of a store write.
+    """
+    cost = 1.0
+
+    if command_name in ("roll", "multiroll"):
+        dice = count_dice(args)
+        if command_name == "multiroll":
+            times, _, _ = args.strip().partition(' ')
+            dice *= int(times) if times.isdigit() else 1
+        cost += dice / dice_per_token
+        if command_name == "roll" and animations:
+            cost += ANIMATION_FRAMES * 0.5  # Half a token per animation frame edit
+    elif command_name == "stats":
+        blocks = args.lower().replace('×', 'x').split('x')[-1].strip()
+        cost += int(blocks) / 2 if blocks.isdigit() else 0
+    elif command_name == "char bulkcreate":
+        count, _, _ = args.strip().partition(' ')
+        cost += 2 + (int(count) / 50 if count.isdigit() else 0)
+    elif command_name in ("char export", "char import"):
+        cost += 5  # Walks or writes a whole guild
+    elif command_name in STORE_WRITE_COMMANDS:
+        cost += 2
+
+    return cost
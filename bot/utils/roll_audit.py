@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .dice_source import SeededDice
+from .roll_history import ROLL_KINDS
+
+logger = logging.getLogger(__name__)
+
+# Where the bot keeps audit chains, relative to the working directory
+DEFAULT_AUDIT_DIR = Path("data/audit")
+
+AUDIT_SUFFIX = ".audit"
+
+# A seed entry starts a new stream; the kinds after it are rolls
+AUDIT_KINDS = ('seed',) + ROLL_KINDS
+SEED_BYTES = 32
+
+# Entry: size, kind, timestamp, user, total, payload length; then the payload
+# (the expression, or the seed) and a trailer of roll id and chain digest
+ENTRY_HEADER = struct.Struct('<IBdQqH')
+ENTRY_TRAILER = struct.Struct('<I32s')
+DIGEST_SIZE = 32
+GENESIS = bytes(DIGEST_SIZE)
+
+def chain_digest(previous: bytes, entry: bytes) -> bytes:
+    """Digest of an entry (everything before its digest) chained to the one before it"""
+    return hashlib.blake2b(previous + entry, digest_size=DIGEST_SIZE).digest()
+
+class AuditEntry(NamedTuple):
+    roll_id: int
+    kind: str
+    timestamp: float
+    user_id: int
+    total: int
+    expression: str
+    seed: bytes
+    digest: bytes
+
+class VerifyResult(NamedTuple):
+    """What a chain walk found: the entry if present, and the first roll id whose digest didn't match"""
+    entry: Optional[AuditEntry]
+    broken_at: Optional[int]
+    entries_checked: int
+
+class _Chain:
+    """A channel's current seed, the next roll id to hand out and the last digest written"""
+    __slots__ = ('seed', 'next_id', 'digest')
+
+    def __init__(self, seed: bytes, next_id: int, digest: bytes):
+        self.seed = seed
+        self.next_id = next_id
+        self.digest = digest
+
+def _read_entries(data: bytes) -> Iterator[Tuple[bytes, int, int, float, int, int, bytes, bytes]]:
+    """Yield (signed bytes, roll id, kind, timestamp, user, total, payload, digest) for each whole entry"""
+    offset = 0
+    while offset + ENTRY_HEADER.size <= len(data):
+        size, kind, timestamp, user_id, total, length = ENTRY_HEADER.unpack_from(data, offset)
+        end = offset + size
+        if size != ENTRY_HEADER.size + length + ENTRY_TRAILER.size or end > len(data) or kind >= len(AUDIT_KINDS):
+            return
+        payload = data[offset + ENTRY_HEADER.size:end - ENTRY_TRAILER.size]
+        roll_id, digest = ENTRY_TRAILER.unpack_from(data, end - ENTRY_TRAILER.size)
+        yield data[offset:end - DIGEST_SIZE], roll_id, kind, timestamp, user_id, total, payload, digest
+        offset = end
+
+class RollAudit:
+    """
+    Tamper-evident record of every roll, one hash chain per channel.
+
+    Each channel gets a fresh random seed the first time it rolls after
+    startup, logged as a seed entry. Roll ``n`` draws its dice from
+    ``SeededDice(seed, n)`` and logs (roll id, expression, total) chained to
+    the entry before it, so ``verify`` can check the chain and replay the roll.
+    Entries are appended in batches by a background task, like RollHistory.
+    ``open``, ``draw`` and ``record`` must be called from the event loop.
+    """
+
+    def __init__(self, data_dir: Path = DEFAULT_AUDIT_DIR, batch_size: int = 256, flush_interval: float = 5.0):
+        self.data_dir = Path(data_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._chains: Dict[int, _Chain] = {}
+        self._pending: Dict[int, List[bytes]] = {}
+        self._pending_count = 0
+        self._write_lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def _path(self, channel_id: int) -> Path:
+        return self.data_dir / f"{channel_id}{AUDIT_SUFFIX}"
+
+    def _read_tail(self, channel_id: int) -> Tuple[int, bytes]:
+        """Last roll id and digest in a channel's chain, cutting off a torn entry after it"""
+        path = self._path(channel_id)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return 0, GENESIS
+
+        last_id, digest, offset = 0, GENESIS, 0
+        for signed, roll_id, _, _, _, _, _, stored in _read_entries(data):
+            last_id, digest = roll_id, stored
+            offset += len(signed) + DIGEST_SIZE
+        if offset < len(data):
+            # A crash mid-append; drop the partial entry so new ones chain onto the last whole one
+            logger.warning(f"Truncating roll audit for channel {channel_id} at byte {offset} of {len(data)}")
+            with open(path, 'r+b') as fp:
+                fp.truncate(offset)
+        return last_id, digest
+
+    async def open(self, channel_id: int) -> None:
+        """Pick up a channel's chain and start a new seed for it, once per run"""
+        if channel_id in self._chains:
+            return
+        loop = asyncio.get_running_loop()
+        last_id, digest = await loop.run_in_executor(None, self._read_tail, channel_id)
+        if channel_id in self._chains:
+            return
+        chain = self._chains[channel_id] = _Chain(os.urandom(SEED_BYTES), last_id + 1, digest)
+        self._append(channel_id, chain, last_id, 'seed', 0, 0, chain.seed)
+
+    def draw(self, channel_id: int) -> Tuple[int, SeededDice]:
+        """Reserve the next roll id in an open channel, with the dice it rolls"""
+        chain = self._chains[channel_id]
+        roll_id = chain.next_id
+        chain.next_id += 1
+        return roll_id, SeededDice(chain.seed, roll_id)
+
+    def record(self, channel_id: int, roll_id: int, user_id: int, kind: str, expression: str, total: int) -> None:
+        """Chain a drawn roll's result onto its channel's log"""
+        self._append(channel_id, self._chains[channel_id], roll_id, kind, user_id, total, expression.encode('utf-8'))
+
+    def _append(
+        self, channel_id: int, chain: _Chain, roll_id: int, kind: str, user_id: int, total: int, payload: bytes
+    ) -> None:
+        header = ENTRY_HEADER.pack(
+            ENTRY_HEADER.size + len(payload) + ENTRY_TRAILER.size,
+            AUDIT_KINDS.index(kind), time.time(), user_id, total, len(payload)
+        )
+        signed = header + payload + struct.pack('<I', roll_id)
+        chain.digest = chain_digest(chain.digest, signed)
+        self._pending.setdefault(channel_id, []).append(signed + chain.digest)
+        self._pending_count += 1
+        if self._pending_count >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    def _write(self, batches: Dict[int, bytes]) -> Dict[int, bytes]:
+        """Append each channel's entries; returns the ones that failed"""
+        failed = {}
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        for channel_id, payload in batches.items():
+            try:
+                with open(self._path(channel_id), 'ab') as fp:
+                    start = fp.tell()
+                    try:
+                        fp.write(payload)
+                        fp.flush()
+                    except OSError:
+                        fp.truncate(start)
+                        raise
+            except OSError as e:
+                logger.error(f"Error writing roll audit for channel {channel_id}: {e}")
+                failed[channel_id] = payload
+        return failed
+
+    async def flush(self) -> None:
+        """Write every pending entry"""
+        async with self._write_lock:
+            if not self._pending:
+                return
+            batches = {channel_id: b''.join(entries) for channel_id, entries in self._pending.items()}
+            self._pending.clear()
+            self._pending_count = 0
+            try:
+                failed = await asyncio.get_running_loop().run_in_executor(None, self._write, batches)
+            except Exception:
+                logger.exception("Error writing roll audit")
+                failed = batches
+            # Put failures back ahead of anything chained since, so the chain stays in order
+            for channel_id, payload in failed.items():
+                self._pending.setdefault(channel_id, []).insert(0, payload)
+                self._pending_count += 1
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self) -> None:
+        """Write everything pending and stop the writer"""
+        self._closing = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _writer(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def verify_chain(self, channel_id: int, roll_id: int) -> VerifyResult:
+        """Walk a channel's chain up to ``roll_id``, checking every digest on the way"""
+        try:
+            data = self._path(channel_id).read_bytes()
+        except FileNotFoundError:
+            return VerifyResult(None, None, 0)
+
+        digest, seed, checked = GENESIS, b'', 0
+        for signed, entry_id, kind, timestamp, user_id, total, payload, stored in _read_entries(data):
+            digest = chain_digest(digest, signed)
+            checked += 1
+            if digest != stored:
+                return VerifyResult(None, entry_id, checked)
+            if AUDIT_KINDS[kind] == 'seed':
+                seed = payload
+            elif entry_id == roll_id:
+                entry = AuditEntry(
+                    entry_id, AUDIT_KINDS[kind], timestamp, user_id, total,
+                    payload.decode('utf-8', errors='replace'), seed, digest
+                )
+                return VerifyResult(entry, None, checked)
+        return VerifyResult(None, None, checked)
+
+    async def verify(self, channel_id: int, roll_id: int) -> VerifyResult:
+        """Flush, then check the chain up to ``roll_id`` off the event loop"""
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(None, self.verify_chain, channel_id, roll_id)
@@ -0,0 +1,413 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Where the bot keeps roll logs, relative to the working directory
+DEFAULT_ROLL_DIR = Path("data/rolls")
+
+LOG_SUFFIX = ".rolls"
+SNAPSHOT_SUFFIX = ".stats.json"
+SNAPSHOT_VERSION = 1
+
+# Rolls with no guild (DMs) are logged under guild 0
+DM_GUILD = 0
+# Aggregate key for a whole guild, next to its users' keys
+GUILD_TOTAL = 0
+
+ROLL_KINDS = ('roll', 'advantage', 'disadvantage', 'multiroll')
+
+# Record: size, timestamp, channel, user, kind, modifier, total, group count;
+# then per group its sides and dice count followed by the faces
+RECORD_HEADER = struct.Struct('<IdQQBiiH')
+GROUP_HEADER = struct.Struct('<IH')
+
+# Face histograms are kept for dice up to a d100; bigger dice are only counted
+HISTOGRAM_MAX_SIDES = 100
+
+# Seconds between aggregate snapshots of a busy guild; startup replays the log after the last one
+SNAPSHOT_INTERVAL = 60.0
+
+Groups = Sequence[Tuple[int, Sequence[int]]]
+
+def _face_format(sides: int) -> str:
+    """Smallest struct code holding a face of a die with ``sides`` sides"""
+    if sides <= 0xFF:
+        return 'B'
+    if sides <= 0xFFFF:
+        return 'H'
+    return 'I'
+
+def encode_record(
+    timestamp: float, channel_id: int, user_id: int, kind: str, groups: Groups, modifier: int, total: int
+) -> bytes:
+    """Pack one roll into its log record"""
+    body = bytearray()
+    for sides, faces in groups:
+        body += GROUP_HEADER.pack(sides, len(faces))
+        body += struct.pack(f'<{len(faces)}{_face_format(sides)}', *faces)
+    header = RECORD_HEADER.pack(
+        RECORD_HEADER.size + len(body), timestamp, channel_id, user_id,
+        ROLL_KINDS.index(kind), modifier, total, len(groups)
+    )
+    return header + bytes(body)
+
+class RollRecord(NamedTuple):
+    timestamp: float
+    channel_id: int
+    user_id: int
+    kind: str
+    modifier: int
+    total: int
+    groups: List[Tuple[int, List[int]]]
+
+def decode_records(data: bytes, offset: int = 0) -> Iterator[Tuple[int, RollRecord]]:
+    """Yield (end offset, record) for each whole record in ``data`` from ``offset``"""
+    while offset + RECORD_HEADER.size <= len(data):
+        size, timestamp, channel_id, user_id, kind, modifier, total, group_count = (
+            RECORD_HEADER.unpack_from(data, offset)
+        )
+        end = offset + size
+        if size < RECORD_HEADER.size or end > len(data) or kind >= len(ROLL_KINDS):
+            return
+
+        groups = []
+        position = offset + RECORD_HEADER.size
+        for _ in range(group_count):
+            sides, count = GROUP_HEADER.unpack_from(data, position)
+            position += GROUP_HEADER.size
+            face_struct = struct.Struct(f'<{count}{_face_format(sides)}')
+            groups.append((sides, list(face_struct.unpack_from(data, position))))
+            position += face_struct.size
+        if position != end:
+            return
+
+        yield end, RollRecord(timestamp, channel_id, user_id, ROLL_KINDS[kind], modifier, total, groups)
+        offset = end
+
+class RollAggregate:
+    """Running totals for one user or guild: rolls, dice and a face histogram per die size"""
+    __slots__ = ('rolls', 'dice', 'faces')
+
+    def __init__(self):
+        self.rolls = 0
+        self.dice = 0
+        self.faces: Dict[int, List[int]] = {}
+
+    def add(self, groups: Groups) -> None:
+        self.rolls += 1
+        for sides, faces in groups:
+            self.dice += len(faces)
+            if sides > HISTOGRAM_MAX_SIDES:
+                continue
+            histogram = self.faces.get(sides)
+            if histogram is None:
+                histogram = self.faces[sides] = [0] * sides
+            for face in faces:
+                histogram[face - 1] += 1
+
+    def merge(self, other: 'RollAggregate') -> None:
+        self.rolls += other.rolls
+        self.dice += other.dice
+        for sides, counts in other.faces.items():
+            histogram = self.faces.setdefault(sides, [0] * sides)
+            for i, count in enumerate(counts):
+                histogram[i] += count
+
+    def count(self, sides: int, face: Optional[int] = None) -> int:
+        """Dice of ``sides`` rolled, or how many of them came up ``face``"""
+        histogram = self.faces.get(sides)
+        if histogram is None:
+            return 0
+        return histogram[face - 1] if face is not None else sum(histogram)
+
+    def average(self, sides: int) -> Optional[float]:
+        histogram = self.faces.get(sides)
+        rolled = sum(histogram) if histogram else 0
+        if not rolled:
+            return None
+        return sum(face * count for face, count in enumerate(histogram, 1)) / rolled
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rolls': self.rolls,
+            'dice': self.dice,
+            'faces': {str(sides): list(counts) for sides, counts in self.faces.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RollAggregate':
+        aggregate = cls()
+        aggregate.rolls = int(data['rolls'])
+        aggregate.dice = int(data['dice'])
+        aggregate.faces = {int(sides): [int(c) for c in counts] for sides, counts in data['faces'].items()}
+        return aggregate
+
+class _Batch(NamedTuple):
+    """Records taken for writing from one guild, and the snapshot to write after them"""
+    payload: bytes
+    offset: int
+    snapshot: Optional[Dict[str, Any]]
+
+class RollHistory:
+    """
+    Append-only log of every roll, one binary file per guild, with running
+    per-user and per-guild aggregates.
+
+    ``record`` packs a roll and updates the aggregates in memory; a background
+    task appends pending records in batches, every ``flush_interval`` seconds
+    or once ``batch_size`` are waiting, on the default executor. Aggregates are
+    snapshotted next to the log with the log size they cover, so ``load``
+    only replays records written after the last snapshot. ``record`` and
+    ``stats`` must be called from the event loop.
+    """
+
+    def __init__(self, data_dir: Path = DEFAULT_ROLL_DIR, batch_size: int = 256, flush_interval: float = 5.0):
+        self.data_dir = Path(data_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # guild -> user (or GUILD_TOTAL) -> aggregate
+        self._lifetime: Dict[int, Dict[int, RollAggregate]] = {}
+        self._session: Dict[int, Dict[int, RollAggregate]] = {}
+        self._pending: Dict[int, List[bytes]] = {}
+        self._pending_count = 0
+        # Log size per guild once everything taken for writing is written
+        self._offsets: Dict[int, int] = {}
+        self._snapshotted: Dict[int, float] = {}
+        self._dirty: set = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def _log_path(self, guild_id: int) -> Path:
+        return self.data_dir / f"{guild_id}{LOG_SUFFIX}"
+
+    def _snapshot_path(self, guild_id: int) -> Path:
+        return self.data_dir / f"{guild_id}{SNAPSHOT_SUFFIX}"
+
+    def load(self) -> int:
+        """Rebuild aggregates from snapshots and log tails; returns the records replayed"""
+        replayed = 0
+        if not self.data_dir.exists():
+            return replayed
+        for path in self.data_dir.glob(f"*{LOG_SUFFIX}"):
+            try:
+                guild_id = int(path.name[:-len(LOG_SUFFIX)])
+            except ValueError:
+                continue
+            replayed += self._load_guild(guild_id)
+        return replayed
+
+    def _load_guild(self, guild_id: int) -> int:
+        path = self._log_path(guild_id)
+        size = path.stat().st_size
+
+        offset = 0
+        users: Dict[int, RollAggregate] = {}
+        try:
+            snapshot = json.loads(self._snapshot_path(guild_id).read_text(encoding='utf-8'))
+            if snapshot.get('version') == SNAPSHOT_VERSION and snapshot['offset'] <= size:
+                users = {int(user_id): RollAggregate.from_dict(a) for user_id, a in snapshot['users'].items()}
+                offset = snapshot['offset']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable roll stats for guild {guild_id}, replaying its log: {e}")
+            users, offset = {}, 0
+
+        users[GUILD_TOTAL] = RollAggregate()
+        for aggregate in list(users.values()):
+            if aggregate is not users[GUILD_TOTAL]:
+                users[GUILD_TOTAL].merge(aggregate)
+        self._lifetime[guild_id] = users
+
+        # Only the tail past the snapshot is read, however long the log has grown
+        with open(path, 'rb') as fp:
+            fp.seek(offset)
+            tail = fp.read()
+
+        replayed, consumed = 0, 0
+        for consumed, record in decode_records(tail):
+            self._aggregate(self._lifetime, guild_id, record.user_id, record.groups)
+            replayed += 1
+        offset += consumed
+
+        if offset < size:
+            # A torn write at the end; drop it so appends stay aligned
+            logger.warning(f"Truncating roll log for guild {guild_id} at byte {offset} of {size}")
+            with open(path, 'r+b') as fp:
+                fp.truncate(offset)
+
+        self._offsets[guild_id] = offset
+        if replayed:
+            self._dirty.add(guild_id)
+        return replayed
+
+    @staticmethod
+    def _aggregate(table: Dict[int, Dict[int, RollAggregate]], guild_id: int, user_id: int, groups: Groups) -> None:
+        users = table.setdefault(guild_id, {})
+        for key in (user_id, GUILD_TOTAL):
+            aggregate = users.get(key)
+            if aggregate is None:
+                aggregate = users[key] = RollAggregate()
+            aggregate.add(groups)
+
+    def record(
+        self,
+        guild_id: Optional[int],
+        channel_id: int,
+        user_id: int,
+        kind: str,
+        groups: Groups,
+        modifier: int = 0,
+        total: int = 0,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        """Log a roll and fold it into the aggregates"""
+        guild_id = guild_id or DM_GUILD
+        record = encode_record(timestamp or time.time(), channel_id, user_id, kind, groups, modifier, total)
+        self._pending.setdefault(guild_id, []).append(record)
+        self._pending_count += 1
+        self._dirty.add(guild_id)
+
+        self._aggregate(self._lifetime, guild_id, user_id, groups)
+        self._aggregate(self._session, guild_id, user_id, groups)
+
+        if self._pending_count >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    def stats(self, guild_id: Optional[int], user_id: int = GUILD_TOTAL, session: bool = False) -> RollAggregate:
+        """Aggregate for a user (or the whole guild), since the log began or since the bot started"""
+        table = self._session if session else self._lifetime
+        return table.get(guild_id or DM_GUILD, {}).get(user_id) or RollAggregate()
+
+    def pending(self) -> int:
+        return self._pending_count
+
+    def _take_batches(self, snapshot_all: bool = False) -> Dict[int, _Batch]:
+        """Hand pending records, and snapshots that are due, to the writer"""
+        now = time.monotonic()
+        batches = {}
+        for guild_id in self._dirty:
+            payload = b''.join(self._pending.pop(guild_id, ()))
+            offset = self._offsets.get(guild_id, 0)
+            self._offsets[guild_id] = offset + len(payload)
+
+            snapshot = None
+            if snapshot_all or now - self._snapshotted.get(guild_id, 0.0) >= SNAPSHOT_INTERVAL:
+                snapshot = {
+                    'version': SNAPSHOT_VERSION,
+                    'offset': offset + len(payload),
+                    'users': {
+                        str(user_id): aggregate.to_dict()
+                        for user_id, aggregate in self._lifetime.get(guild_id, {}).items()
+                        if user_id != GUILD_TOTAL
+                    },
+                }
+                self._snapshotted[guild_id] = now
+            elif not payload:
+                # Nothing to write yet; keep it dirty for its snapshot
+                continue
+            batches[guild_id] = _Batch(payload, offset, snapshot)
+
+        for guild_id, batch in batches.items():
+            if batch.snapshot is not None:
+                self._dirty.discard(guild_id)
+        self._pending_count = sum(len(records) for records in self._pending.values())
+        return batches
+
+    def _requeue(self, guild_id: int, batch: _Batch) -> None:
+        """Put back a batch that failed to write, ahead of anything recorded since"""
+        if batch.payload:
+            self._pending.setdefault(guild_id, []).insert(0, batch.payload)
+            self._pending_count += 1
+        self._offsets[guild_id] = batch.offset
+        self._snapshotted.pop(guild_id, None)
+        self._dirty.add(guild_id)
+
+    def _write_batches(self, batches: Dict[int, _Batch]) -> Dict[int, _Batch]:
+        """Append each batch to its guild's log, then its snapshot; returns the batches that failed"""
+        failed = {}
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        for guild_id, batch in batches.items():
+            try:
+                if batch.payload:
+                    with open(self._log_path(guild_id), 'ab') as fp:
+                        start = fp.tell()
+                        try:
+                            fp.write(batch.payload)
+                            fp.flush()
+                        except OSError:
+                            fp.truncate(start)
+                            raise
+                if batch.snapshot is not None:
+                    path = self._snapshot_path(guild_id)
+                    tmp_path = path.with_name(path.name + '.tmp')
+                    tmp_path.write_text(json.dumps(batch.snapshot, separators=(',', ':')), encoding='utf-8')
+                    os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Error writing roll history for guild {guild_id}: {e}")
+                failed[guild_id] = batch
+        return failed
+
+    def flush(self, snapshot: bool = False) -> int:
+        """Write pending records now, on the calling thread; returns the records written"""
+        pending = self._pending_count
+        failed = self._write_batches(self._take_batches(snapshot))
+        for guild_id, batch in failed.items():
+            self._requeue(guild_id, batch)
+        return pending - self._pending_count
+
+    async def start(self) -> None:
+        """Load the aggregates and start the background writer"""
+        loop = asyncio.get_running_loop()
+        replayed = await loop.run_in_executor(None, self.load)
+        if replayed:
+            logger.info(f"Replayed {replayed} roll records past the last snapshots")
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self) -> None:
+        """Write everything pending, snapshot every changed guild and stop the writer"""
+        self._closing = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+
+    async def _writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            closing = self._closing
+            batches = self._take_batches(snapshot_all=closing)
+            if batches:
+                try:
+                    failed = await loop.run_in_executor(None, self._write_batches, batches)
+                except Exception:
+                    logger.exception("Error writing roll history")
+                    failed = batches
+                for guild_id, batch in failed.items():
+                    self._requeue(guild_id, batch)
+            if closing:
+                return
+
+    def read(self, guild_id: Optional[int]) -> Iterator[RollRecord]:
+        """Every record written for a guild, oldest first; pending records aren't included"""
+        try:
+            data = self._log_path(guild_id or DM_GUILD).read_bytes()
+        except FileNotFoundError:
+            return
+        for _, record in decode_records(data):
+            yield record
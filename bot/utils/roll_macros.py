@@ -0,0 +1,104 @@
+import re
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from .dice_parser import DiceParser, RollPlan
+from .stat_systems import get_stat_system
+
+# A stat reference like +@STR or -@dex
+STAT_REF_PATTERN = re.compile(r'([+-]?)\s*@([A-Za-z]+)')
+MACRO_NAME_PATTERN = re.compile(r'[a-z][a-z0-9_-]{0,23}')
+# Names like "shield2" hold a die (d2), so !roll would roll them instead
+DICE_IN_NAME_PATTERN = re.compile(r'd\d')
+
+MAX_MACROS = 25
+MAX_MACRO_LENGTH = 100
+
+# Methods whose stats are 3-18 ability scores, referenced by their modifier
+ABILITY_SCORE_METHODS = ("4d6_drop_lowest", "3d6", "2d6+6", "standard_array")
+
+# Ad-hoc expressions (like 1d20+@STR) compiled per book before it starts over
+MAX_COMPILED_EXPRESSIONS = 64
+
+def stat_value(system: str, value: int) -> int:
+    """What ``@STAT`` adds to a roll: the ability modifier for 3-18 scores, otherwise the stat itself"""
+    stat_system = get_stat_system(system)
+    if stat_system is None or stat_system.method in ABILITY_SCORE_METHODS:
+        return (value - 10) // 2
+    return value
+
+def resolve_stat_refs(expression: str, system: str, stats: Dict[str, int]) -> str:
+    """Replace every @STAT in ``expression`` with the character's signed value for it"""
+    def substitute(match: re.Match) -> str:
+        sign, stat = match.group(1) or '+', match.group(2).upper()
+        if stat not in stats:
+            raise ValueError(f"Unknown stat @{stat}. Available: {', '.join('@' + name for name in stats)}")
+        value = stat_value(system, stats[stat])
+        return f"{value if sign == '+' else -value:+d}"
+
+    return STAT_REF_PATTERN.sub(substitute, expression)
+
+def validate_macro(name: str, expression: str, system: str, stats: Dict[str, int], parser: DiceParser) -> Optional[str]:
+    """Problem with a macro for a character with these stats, or None if it's fine"""
+    if not MACRO_NAME_PATTERN.fullmatch(name):
+        return "Macro names are up to 24 letters, digits, - or _, starting with a letter"
+    if DICE_IN_NAME_PATTERN.search(name):
+        return f"`{name}` would be read as a dice expression; pick another name"
+    if len(expression) > MAX_MACRO_LENGTH:
+        return f"Macros are limited to {MAX_MACRO_LENGTH} characters"
+    try:
+        if parser.compile(resolve_stat_refs(expression, system, stats)) is None:
+            return f"`{expression}` has no dice to roll"
+    except ValueError as e:
+        return str(e)
+    return None
+
+def normalize_stats(stats: Optional[Dict[str, int]]) -> Dict[str, int]:
+    """A character's stats keyed by upper-case name, as @STAT references look them up"""
+    return {stat.upper(): value for stat, value in (stats or {}).items()}
+
+class CompiledRoll(NamedTuple):
+    """A roll ready to go: the resolved expression (as audited and replayed) and its plan"""
+    expression: str
+    plan: RollPlan
+
+class RerollPlan(NamedTuple):
+    """What a roll message rolled, kept so a 🔁 reaction can roll it again without parsing"""
+    author_id: int
+    batch: Tuple[Tuple[str, CompiledRoll], ...]
+    character: Optional[str]
+
+class MacroBook:
+    """
+    A user's active character with its macros and stat references compiled.
+
+    Expressions compile on first use and stay compiled until the book is
+    dropped, which the Characters cog does whenever the character's stats,
+    system or macros change, so a cached roll needs neither a character
+    lookup nor a parse.
+    """
+    __slots__ = ('char_id', 'name', 'system', 'stats', 'macros', '_compiled')
+
+    def __init__(self, char_id: str, document: Dict[str, Any]):
+        self.char_id = char_id
+        self.name: str = document['name']
+        self.system: str = document.get('system') or "dnd"
+        self.stats = normalize_stats(document.get('stats'))
+        self.macros: Dict[str, str] = dict(document.get('macros') or {})
+        self._compiled: Dict[str, CompiledRoll] = {}
+
+    def compile(self, text: str, parser: DiceParser) -> CompiledRoll:
+        """Compile a macro name or an expression with @STAT references; raises ValueError if it can't"""
+        compiled = self._compiled.get(text)
+        if compiled is not None:
+            return compiled
+
+        expression = self.macros.get(text.lower().strip(), text)
+        resolved = resolve_stat_refs(expression, self.system, self.stats)
+        plan = parser.compile(resolved)
+        if plan is None:
+            raise ValueError(f"`{text}` is neither a dice expression nor one of {self.name}'s macros")
+
+        if len(self._compiled) >= MAX_COMPILED_EXPRESSIONS:
+            self._compiled.clear()
+        compiled = self._compiled[text] = CompiledRoll(resolved, plan)
+        return compiled
@@ -0,0 +1,101 @@
+from typing import Callable, Dict, List, Optional
+
+from .dice_source import DiceSource, dice_source
+
+STANDARD_ARRAY = [15, 14, 13, 12, 10, 8]
+CORTEX_DICE = [4, 6, 8, 10, 12, 6]  # d4, d6, d8, d10, d12, extra d6
+
+def _chunks(values: List[int], size: int) -> List[List[int]]:
+    """Split a flat list of rolls into consecutive groups"""
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+def _roll_4d6_drop_lowest(count: int, source: DiceSource) -> List[Dict]:
+    """Roll 4d6, drop lowest"""
+    results = []
+    for group in _chunks(source.roll_many(count * 4, 6), 4):
+        group.sort(reverse=True)
+        results.append({
+            'total': group[0] + group[1] + group[2],
+            'kept': group[:3],
+            'dropped': group[3]
+        })
+    return results
+
+def _roll_3d6(count: int, source: DiceSource) -> List[Dict]:
+    """Roll 3d6 straight"""
+    return [
+        {'total': sum(group), 'rolls': group}
+        for group in _chunks(source.roll_many(count * 3, 6), 3)
+    ]
+
+def _roll_heroic(count: int, source: DiceSource) -> List[Dict]:
+    """Roll 2d6+6 for heroic characters"""
+    return [
+        {'total': sum(group) + 6, 'rolls': group + [6]}  # Show the +6 bonus
+        for group in _chunks(source.roll_many(count * 2, 6), 2)
+    ]
+
+def _roll_special(count: int, source: DiceSource) -> List[Dict]:
+    """Roll SPECIAL stats: 5 + 1d5"""
+    return [
+        {'total': 5 + roll, 'rolls': [5, roll]}  # Show base 5 + roll
+        for roll in source.roll_many(count, 5)
+    ]
+
+def _deal(values: List[int], count: int, source: DiceSource) -> List[int]:
+    """Deal ``count`` values from freshly shuffled copies of ``values``"""
+    dealt = []
+    while len(dealt) < count:
+        deck = list(values)
+        source.shuffle(deck)
+        dealt.extend(deck)
+    return dealt[:count]
+
+def _roll_standard_array(count: int, source: DiceSource) -> List[Dict]:
+    """Return standard array values in random order"""
+    return [{'total': value} for value in _deal(STANDARD_ARRAY, count, source)]
+
+def _roll_cortex(count: int, source: DiceSource) -> List[Dict]:
+    """Roll Cortex system dice steps"""
+    results = []
+    for die_size in _deal(CORTEX_DICE, count, source):
+        roll = source.roll(die_size)
+        results.append({'total': roll, 'rolls': [f"d{die_size}: {roll}"]})
+    return results
+
+# Stat rolling methods, each rolling ``count`` stats in one pooled draw
+STAT_METHODS: Dict[str, Callable[[int, DiceSource], List[Dict]]] = {
+    "4d6_drop_lowest": _roll_4d6_drop_lowest,
+    "3d6": _roll_3d6,
+    "2d6+6": _roll_heroic,
+    "standard_array": _roll_standard_array,
+    "5+1d5": _roll_special,
+    "cortex": _roll_cortex,
+}
+
+def roll_stat_blocks(method: str, blocks: int, stats_per_block: int,
+                     source: Optional[DiceSource] = None) -> List[List[Dict]]:
+    """
+    Roll several stat blocks at once.
+
+    Args:
+        method: Key into STAT_METHODS
+        blocks: Number of stat blocks to generate
+        stats_per_block: Stats in each block (6 for most systems, 7 for SPECIAL)
+        source: Dice source to draw from (defaults to the shared buffer)
+
+    Returns:
+        One list of stat dicts per block
+    """
+    if method not in STAT_METHODS:
+        raise ValueError(f"Unknown stat method: {method}")
+    if blocks < 1:
+        return []
+
+    source = source or dice_source
+    if method in ("standard_array", "cortex"):
+        # Each block deals its own shuffled set of values
+        return [STAT_METHODS[method](stats_per_block, source) for _ in range(blocks)]
+
+    stats = STAT_METHODS[method](blocks * stats_per_block, source)
+    return [stats[i:i + stats_per_block] for i in range(0, len(stats), stats_per_block)]
@@ -0,0 +1,180 @@
+import json
+import logging
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config.config import Config
+from .stat_blocks import CORTEX_DICE, STANDARD_ARRAY, STAT_METHODS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STAT_NAMES = ["STR", "DEX", "CON", "INT", "WIS", "CHA"]
+SPECIAL_STAT_NAMES = ["STR", "PER", "END", "CHA", "INT", "AGI", "LCK"]
+
+RATINGS = ["🌟 Exceptional!", "✨ Great!", "👍 Good", "👌 Average", "💪 Challenging"]
+
+# A distribution is a mapping of total -> number of outcomes, over a common denominator
+Distribution = Tuple[Dict[int, int], int]
+
+def _die(sides: int) -> Distribution:
+    return {face: 1 for face in range(1, sides + 1)}, sides
+
+def _convolve(a: Distribution, b: Distribution) -> Distribution:
+    """Distribution of the sum of two independent distributions"""
+    counts: Dict[int, int] = {}
+    for x, cx in a[0].items():
+        for y, cy in b[0].items():
+            counts[x + y] = counts.get(x + y, 0) + cx * cy
+    return counts, a[1] * b[1]
+
+def _sum_of(dist: Distribution, times: int) -> Distribution:
+    """Distribution of the sum of ``times`` independent copies"""
+    result: Distribution = ({0: 1}, 1)
+    for _ in range(times):
+        result = _convolve(result, dist)
+    return result
+
+def _shift(dist: Distribution, offset: int) -> Distribution:
+    return {total + offset: count for total, count in dist[0].items()}, dist[1]
+
+def _4d6_drop_lowest() -> Distribution:
+    counts: Dict[int, int] = {}
+    for rolls in product(range(1, 7), repeat=4):
+        total = sum(rolls) - min(rolls)
+        counts[total] = counts.get(total, 0) + 1
+    return counts, 6 ** 4
+
+# Exact per-stat distributions for the independent methods
+_STAT_DISTRIBUTIONS = {
+    "4d6_drop_lowest": _4d6_drop_lowest(),
+    "3d6": _sum_of(_die(6), 3),
+    "2d6+6": _shift(_sum_of(_die(6), 2), 6),
+    "5+1d5": _shift(_die(5), 5),
+}
+
+def block_distribution(method: str, num_stats: int) -> Optional[Distribution]:
+    """Exact distribution of a stat block total, or None if it can't be derived"""
+    if method in _STAT_DISTRIBUTIONS:
+        return _sum_of(_STAT_DISTRIBUTIONS[method], num_stats)
+
+    # Dealt methods only have a fixed total when the whole set is dealt
+    if method == "standard_array" and num_stats == len(STANDARD_ARRAY):
+        return {sum(STANDARD_ARRAY): 1}, 1
+    if method == "cortex" and num_stats == len(CORTEX_DICE):
+        result: Distribution = ({0: 1}, 1)
+        for sides in CORTEX_DICE:
+            result = _convolve(result, _die(sides))
+        return result
+
+    return None
+
+class StatSystem:
+    """A stat rolling system with metadata precomputed at registration"""
+
+    def __init__(self, key: str, name: str, description: str, method: str,
+                 rating_thresholds: List[int], stat_names: Optional[List[str]] = None):
+        if method not in STAT_METHODS:
+            raise ValueError(f"Unknown stat method: {method}")
+        if len(rating_thresholds) != len(RATINGS) - 1:
+            raise ValueError(f"Expected {len(RATINGS) - 1} rating thresholds")
+
+        self.key = key
+        self.name = name
+        self.description = description
+        self.method = method
+        self.rating_thresholds = list(rating_thresholds)
+        self.stat_names = list(stat_names or DEFAULT_STAT_NAMES)
+
+        distribution = block_distribution(method, len(self.stat_names))
+        self.expected_total: Optional[float] = None
+        self.rating_odds: Optional[Dict[str, float]] = None
+        if distribution is not None:
+            counts, denominator = distribution
+            self.expected_total = sum(total * count for total, count in counts.items()) / denominator
+            odds = [0] * len(RATINGS)
+            for total, count in counts.items():
+                odds[self._rating_index(total)] += count
+            self.rating_odds = {rating: count / denominator for rating, count in zip(RATINGS, odds)}
+
+    def _rating_index(self, total: int) -> int:
+        for i, threshold in enumerate(self.rating_thresholds):
+            if total >= threshold:
+                return i
+        return len(RATINGS) - 1
+
+    def rate(self, total: int) -> str:
+        """Rate a stat block total against this system's thresholds"""
+        return RATINGS[self._rating_index(total)]
+
+# Built-in systems, registered once at import
+STAT_SYSTEMS: Dict[str, StatSystem] = {}
+
+def register_stat_system(system: StatSystem) -> None:
+    """Add or replace a stat system in the shared registry"""
+    STAT_SYSTEMS[system.key] = system
+
+for _system in [
+    StatSystem("dnd", "D&D 5e Standard", "4d6, drop lowest",
+               "4d6_drop_lowest", [78, 72, 66, 60]),
+    StatSystem("adnd", "AD&D 2e Method I", "3d6 straight",
+               "3d6", [72, 66, 60, 54]),
+    StatSystem("pathfinder", "Pathfinder Point Buy Equivalent", "4d6, drop lowest, reroll if total < 70",
+               "4d6_drop_lowest", [78, 74, 70, 66]),
+    StatSystem("heroic", "Heroic Array", "2d6+6 for each stat",
+               "2d6+6", [84, 78, 72, 66]),
+    StatSystem("standard", "Standard Array", "Fixed values: 15, 14, 13, 12, 10, 8",
+               "standard_array", [72, 72, 72, 72]),  # Always the same
+    StatSystem("special", "SPECIAL System (Fallout)", "5 + 1d5 for each SPECIAL stat",
+               "5+1d5", [49, 45, 42, 39], SPECIAL_STAT_NAMES),
+    StatSystem("cortex", "Cortex System", "Dice steps: d4, d6, d8, d10, d12 distributed",
+               "cortex", [54, 48, 42, 36]),  # Based on average die values
+]:
+    register_stat_system(_system)
+
+def load_stat_systems(path: Path) -> int:
+    """
+    Load user-defined stat systems from a JSON file.
+
+    The file maps system keys to objects with ``name``, ``description``,
+    ``method`` (one of STAT_METHODS), ``rating_thresholds`` and optionally
+    ``stats``. Invalid entries are logged and skipped.
+
+    Returns:
+        Number of systems registered
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            definitions = json.load(f)
+    except (ValueError, IOError) as e:
+        logger.error(f"Error loading stat systems from {path}: {e}")
+        return 0
+    if not isinstance(definitions, dict):
+        logger.error(f"Error loading stat systems from {path}: expected an object of systems")
+        return 0
+
+    loaded = 0
+    for key, definition in definitions.items():
+        if not isinstance(definition, dict):
+            logger.error(f"Skipping invalid stat system '{key}': expected an object")
+            continue
+        try:
+            register_stat_system(StatSystem(
+                key.lower(),
+                definition.get("name", key),
+                definition.get("description", ""),
+                definition["method"],
+                definition["rating_thresholds"],
+                definition.get("stats")
+            ))
+            loaded += 1
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Skipping invalid stat system '{key}': {e}")
+    return loaded
+
+if Config.STAT_SYSTEMS_FILE:
+    load_stat_systems(Path(Config.STAT_SYSTEMS_FILE))
+
+def get_stat_system(key: str) -> Optional[StatSystem]:
+    """Look up a stat system by key (case insensitive)"""
+    return STAT_SYSTEMS.get(key.lower())
@@ -0,0 +1,93 @@
+import gzip
+import json
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Optional codecs, used only when installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# File suffix for each storage format
+FORMAT_SUFFIXES: Dict[str, str] = {
+    'pretty': '.json',
+    'compact': '.json',
+    'gzip': '.json.gz',
+    'zstd': '.json.zst',
+    'msgpack': '.msgpack',
+}
+
+def available_formats() -> Dict[str, bool]:
+    """Map every known format to whether it can be used in this environment"""
+    return {
+        fmt: (fmt != 'msgpack' or msgpack is not None) and (fmt != 'zstd' or zstandard is not None)
+        for fmt in FORMAT_SUFFIXES
+    }
+
+def resolve_format(fmt: str) -> str:
+    """Validate a configured format, falling back to compact JSON if it can't be used"""
+    fmt = (fmt or 'compact').lower()
+    if fmt not in FORMAT_SUFFIXES:
+        logger.warning(f"Unknown storage format '{fmt}', using compact JSON")
+        return 'compact'
+    if not available_formats()[fmt]:
+        logger.warning(f"Storage format '{fmt}' needs an optional package that isn't installed, using compact JSON")
+        return 'compact'
+    return fmt
+
+def _json_bytes(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def encode(data: Any, fmt: str) -> bytes:
+    """Serialize data in the given format"""
+    if fmt == 'pretty':
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    if fmt == 'compact':
+        return _json_bytes(data)
+    if fmt == 'gzip':
+        # Fast compression level; character data is mostly text and compresses well anyway
+        return gzip.compress(_json_bytes(data), compresslevel=1, mtime=0)
+    if fmt == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(_json_bytes(data))
+    if fmt == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True)
+    raise ValueError(f"Unknown storage format: {fmt}")
+
+def detect_format(raw: bytes) -> str:
+    """Guess the format of serialized data from its leading bytes"""
+    if raw.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if raw.startswith(ZSTD_MAGIC):
+        return 'zstd'
+
+    stripped = raw.lstrip()
+    if not stripped or stripped[:1] in (b'{', b'['):
+        return 'pretty' if b'\n' in stripped[:64] else 'compact'
+    return 'msgpack'
+
+def decode(raw: bytes) -> Any:
+    """Deserialize data in any supported format"""
+    fmt = detect_format(raw)
+    if fmt == 'gzip':
+        raw = gzip.decompress(raw)
+    elif fmt == 'zstd':
+        if zstandard is None:
+            raise ValueError("Data is zstd-compressed but zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    elif fmt == 'msgpack':
+        if msgpack is None:
+            raise ValueError("Data is msgpack-encoded but msgpack is not installed")
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+    return json.loads(raw.decode('utf-8')) if raw.strip() else {}
@@ -0,0 +1,135 @@
+import heapq
+import math
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from .memory_cache import approx_mapping_size
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "he", "her",
+    "his", "in", "is", "it", "its", "of", "on", "or", "she", "that", "the", "their",
+    "they", "this", "to", "was", "were", "with",
+})
+
+# Document id: (owner user key, character id, field, note index or -1 for backstory)
+DocId = Tuple[str, str, str, int]
+
+def tokenize(text: str) -> List[str]:
+    """Split text into casefolded search terms"""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.casefold())
+        if token not in STOPWORDS
+    ]
+
+class TextIndex:
+    """
+    Incremental inverted index over character backstories and notes.
+
+    Each backstory and each note is its own document. Postings map a term
+    to the documents containing it with their term frequency, and queries
+    are ranked with BM25 so only the posting lists of the query terms are
+    touched.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[DocId, int]] = {}
+        self._doc_terms: Dict[DocId, Dict[str, int]] = {}
+        self._doc_lengths: Dict[DocId, int] = {}
+        self._char_docs: Dict[Tuple[str, str], Set[DocId]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def approx_size(self) -> int:
+        """Rough memory use in bytes; postings hold the same counts as the per-document maps"""
+        return 2 * approx_mapping_size(self._doc_terms)
+
+    def add_document(self, doc_id: DocId, text: Optional[str]) -> None:
+        """Index (or re-index) a single backstory or note"""
+        self.remove_document(doc_id)
+        if not text:
+            return
+
+        counts: Dict[str, int] = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        if not counts:
+            return
+
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+        self._doc_terms[doc_id] = counts
+        self._doc_lengths[doc_id] = length = sum(counts.values())
+        self._total_length += length
+        self._char_docs.setdefault(doc_id[:2], set()).add(doc_id)
+
+    def remove_document(self, doc_id: DocId) -> None:
+        counts = self._doc_terms.pop(doc_id, None)
+        if counts is None:
+            return
+
+        for term in counts:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+        docs = self._char_docs.get(doc_id[:2])
+        if docs is not None:
+            docs.discard(doc_id)
+            if not docs:
+                del self._char_docs[doc_id[:2]]
+
+    def index_character(self, user_key: str, char_id: str, char_data: dict) -> None:
+        """Replace every document belonging to a character"""
+        self.remove_character(user_key, char_id)
+        self.add_document((user_key, char_id, 'backstory', -1), char_data.get('backstory'))
+        for i, note in enumerate(char_data.get('notes') or []):
+            self.add_document((user_key, char_id, 'note', i), note)
+
+    def remove_character(self, user_key: str, char_id: str) -> None:
+        for doc_id in list(self._char_docs.get((user_key, char_id), ())):
+            self.remove_document(doc_id)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[DocId, float]]:
+        """Return up to ``limit`` (doc_id, score) pairs ranked by BM25"""
+        terms = set(tokenize(query))
+        if not terms or not self._doc_terms:
+            return []
+
+        num_docs = len(self._doc_terms)
+        avg_length = self._total_length / num_docs
+        doc_lengths = self._doc_lengths
+        scores: Dict[DocId, float] = {}
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * doc_lengths[doc_id] / avg_length))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+def snippet(text: str, query: str, width: int = 120) -> str:
+    """Cut a window of ``text`` around the first query term it contains"""
+    lowered = text.casefold()
+    positions = [lowered.find(term) for term in tokenize(query)]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(0, min(positions) - width // 3) if positions else 0
+
+    excerpt = text[start:start + width]
+    if start > 0:
+        excerpt = "..." + excerpt
+    if start + width < len(text):
+        excerpt += "..."
+    return excerpt
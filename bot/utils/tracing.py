@@ -0,0 +1,157 @@
+import asyncio
+import contextlib
+import functools
+import itertools
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from config.config import Config
+
+# What every span and unsampled trace returns: entering it does nothing
+_NOOP = contextlib.nullcontext()
+
+class Trace:
+    """One sampled invocation: its spans as (name, start ns, end ns), in the order they finished"""
+    __slots__ = ('id', 'name', 'attrs', 'start', 'end', 'spans')
+
+    def __init__(self, trace_id: int, name: str, attrs: Dict[str, Any]):
+        self.id = trace_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter_ns()
+        self.end: Optional[int] = None
+        self.spans: List[Tuple[str, int, int]] = []
+
+    @property
+    def duration(self) -> float:
+        """Milliseconds from start to finish, or so far"""
+        return ((self.end or time.perf_counter_ns()) - self.start) / 1e6
+
+    def breakdown(self) -> Dict[str, float]:
+        """Milliseconds spent in each span name, largest first"""
+        totals: Dict[str, float] = {}
+        for name, start, end in self.spans:
+            totals[name] = totals.get(name, 0.0) + (end - start) / 1e6
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+# The trace the running task belongs to
+_current: "ContextVar[Optional[Trace]]" = ContextVar('trace', default=None)
+
+class _Span:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        # Tasks started during a trace inherit it; drop their spans once it's over
+        if self.trace.end is None:
+            self.trace.spans.append((self.name, self.start, time.perf_counter_ns()))
+        return False
+
+class _TraceScope:
+    __slots__ = ('tracer', 'trace', 'token')
+
+    def __init__(self, tracer: "Tracer", trace: Trace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self) -> Trace:
+        self.token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        self.trace.end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.trace.attrs['error'] = exc_type.__name__
+        self.tracer._finished.append(self.trace)
+        return False
+
+class Tracer:
+    """
+    Sampled per-invocation timing traces kept in a ring buffer.
+
+    ``trace`` starts a trace for a command or listener, sampled at
+    ``sample_rate``. ``span`` times a step of whichever trace the current
+    task is in, so helpers deep in a cog or in storage need no handle
+    passed down to them. Unsampled, both return a shared no-op context
+    manager, so the cost is a context variable read. The last ``capacity``
+    finished traces are kept and can be exported as Chrome trace-event
+    JSON (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, sample_rate: float = 0.0, capacity: int = 256):
+        self.sample_rate = sample_rate
+        self._finished: Deque[Trace] = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+
+    def trace(self, name: str, **attrs: Any):
+        """Context manager tracing one invocation; yields the Trace, or None if not sampled or already traced"""
+        if _current.get() is not None:
+            # Already inside a trace: its spans carry on in that one
+            return _NOOP
+        rate = self.sample_rate
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return _NOOP
+        return _TraceScope(self, Trace(next(self._ids), name, attrs))
+
+    @staticmethod
+    def span(name: str):
+        """Context manager timing a step of the current trace, if there is one"""
+        trace = _current.get()
+        if trace is None:
+            return _NOOP
+        return _Span(trace, name)
+
+    def recent(self) -> List[Trace]:
+        return list(self._finished)
+
+    def slowest(self, count: int = 5) -> List[Trace]:
+        return sorted(self._finished, key=lambda trace: trace.duration, reverse=True)[:count]
+
+    def clear(self) -> None:
+        self._finished.clear()
+
+    @staticmethod
+    def chrome_trace(traces: List[Trace]) -> Dict[str, Any]:
+        """Trace-event JSON with each invocation on its own row, its spans nested by time"""
+        events = []
+        for trace in traces:
+            events.append({
+                'name': trace.name, 'cat': 'invocation', 'ph': 'X', 'pid': 1, 'tid': trace.id,
+                'ts': trace.start / 1000, 'dur': (trace.end - trace.start) / 1000, 'args': trace.attrs,
+            })
+            events.extend(
+                {'name': name, 'cat': 'span', 'ph': 'X', 'pid': 1, 'tid': trace.id, 'ts': start / 1000, 'dur': (end - start) / 1000}
+                for name, start, end in trace.spans
+            )
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': trace.id, 'args': {'name': f"#{trace.id} {trace.name}"}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator timing every call of a function, sync or async, as a span"""
+    def decorate(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+tracer = Tracer(Config.TRACE_SAMPLE_RATE, Config.TRACE_BUFFER_SIZE)
@@ -13,14 +13,56 @@ class Config:
     MAX_DICE = int(os.getenv('MAX_DICE', 100))
     MAX_SIDES = int(os.getenv('MAX_SIDES', 1000))
     MAX_MULTIROLL = int(os.getenv('MAX_MULTIROLL', 10))
+    MAX_STAT_BLOCKS = int(os.getenv('MAX_STAT_BLOCKS', 10))
+    MAX_BATCH_ROLLS = int(os.getenv('MAX_BATCH_ROLLS', 10))  # Expressions per !roll a; b; c
+    ENABLE_REROLL_REACTIONS = os.getenv('ENABLE_REROLL_REACTIONS', 'true').lower() == 'true'
+    REROLL_TTL = int(os.getenv('REROLL_TTL', 900))  # Seconds a roll message can be rerolled with 🔁
+    REROLL_CACHE_SIZE = int(os.getenv('REROLL_CACHE_SIZE', 5000))
+    ENABLE_INLINE_ROLLS = os.getenv('ENABLE_INLINE_ROLLS', 'true').lower() == 'true'  # [[1d20+3]] in chat
+    MAX_INLINE_ROLLS = int(os.getenv('MAX_INLINE_ROLLS', 10))  # Inline rolls answered per message
+    
+    # Stat Systems Configuration
+    STAT_SYSTEMS_FILE = os.getenv('STAT_SYSTEMS_FILE')  # Optional JSON file with extra systems
+    
+    # Character Configuration
+    MAX_BULK_CREATE = int(os.getenv('MAX_BULK_CREATE', 500))
+    MAX_COMBATANTS = int(os.getenv('MAX_COMBATANTS', 300))  # Per channel encounter
+    CHARACTER_CACHE_TTL = float(os.getenv('CHARACTER_CACHE_TTL', 30))  # Seconds a rendered character embed stays cached
+    CHARACTER_CACHE_SIZE = int(os.getenv('CHARACTER_CACHE_SIZE', 1024))
+    SEARCH_RESULTS = int(os.getenv('SEARCH_RESULTS', 5))
+    CHARACTER_FORMAT = os.getenv('CHARACTER_FORMAT', 'compact')  # pretty, compact, gzip, zstd or msgpack
+    CHARACTER_MEMORY_MB = float(os.getenv('CHARACTER_MEMORY_MB', 64))  # Budget for cached character data
+    
+    # Dice Buffer Configuration
+    DICE_BUFFER_SIZE = int(os.getenv('DICE_BUFFER_SIZE', 1024))
+    DICE_BUFFER_LOW_WATER = int(os.getenv('DICE_BUFFER_LOW_WATER', 128))
+    
+    # Roll History Configuration
+    ENABLE_ROLL_HISTORY = os.getenv('ENABLE_ROLL_HISTORY', 'true').lower() == 'true'
+    ROLL_HISTORY_BATCH_SIZE = int(os.getenv('ROLL_HISTORY_BATCH_SIZE', 256))  # Pending rolls that trigger a write
+    ROLL_HISTORY_FLUSH_SECONDS = float(os.getenv('ROLL_HISTORY_FLUSH_SECONDS', 5))  # Longest a roll waits to be written
+    ENABLE_ROLL_AUDIT = os.getenv('ENABLE_ROLL_AUDIT', 'true').lower() == 'true'  # Hash-chained, replayable rolls
     
     # Animation Configuration
     ENABLE_ANIMATIONS = os.getenv('ENABLE_ANIMATIONS', 'true').lower() == 'true'
+    OUTBOUND_HOT_DEPTH = int(os.getenv('OUTBOUND_HOT_DEPTH', 3))  # Queued messages that make a channel hot
     ANIMATION_DELAY = float(os.getenv('ANIMATION_DELAY', 0.2))
     
+    # Rate Limit Configuration (rates in tokens per second, bursts in tokens)
+    ENABLE_RATE_LIMIT = os.getenv('ENABLE_RATE_LIMIT', 'true').lower() == 'true'
+    RATE_LIMIT_USER_RATE = float(os.getenv('RATE_LIMIT_USER_RATE', 1.0))
+    RATE_LIMIT_USER_BURST = float(os.getenv('RATE_LIMIT_USER_BURST', 20))
+    RATE_LIMIT_CHANNEL_RATE = float(os.getenv('RATE_LIMIT_CHANNEL_RATE', 3.0))
+    RATE_LIMIT_CHANNEL_BURST = float(os.getenv('RATE_LIMIT_CHANNEL_BURST', 40))
+    RATE_LIMIT_GUILD_RATE = float(os.getenv('RATE_LIMIT_GUILD_RATE', 10.0))
+    RATE_LIMIT_GUILD_BURST = float(os.getenv('RATE_LIMIT_GUILD_BURST', 120))
+    RATE_LIMIT_MAX_BUCKETS = int(os.getenv('RATE_LIMIT_MAX_BUCKETS', 10000))
+    
     # Development Configuration
     ENABLE_DEV_COMMANDS = os.getenv('ENABLE_DEV_COMMANDS', 'false').lower() == 'true'
     ENABLE_HOT_RELOAD = os.getenv('ENABLE_HOT_RELOAD', 'false').lower() == 'true'
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0.0))  # Share of commands traced; 0 turns tracing off
+    TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', 256))  # Recent traces kept for !traces
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
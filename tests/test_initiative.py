@@ -0,0 +1,39 @@
+import unittest
+
+from bot.utils.initiative import Encounter
+
+def names(encounter: Encounter, count: int):
+    return [combatant.name for _, combatant in encounter.upcoming(count)]
+
+class EncounterOrderTest(unittest.TestCase):
+    def test_fresh_encounter_starts_with_highest_initiative(self):
+        encounter = Encounter()
+        encounter.add("Goblin", 5, 2, 1)
+        encounter.add("Gandalf", 20, 1, 1)
+        encounter.add("Orc", 12, 0, 1)
+
+        self.assertEqual(encounter.current.name, "Gandalf")
+        self.assertEqual(names(encounter, 3), ["Gandalf", "Orc", "Goblin"])
+
+    def test_turn_tracks_current_combatant_once_started(self):
+        encounter = Encounter()
+        for name, initiative in (("Goblin", 5), ("Gandalf", 20), ("Orc", 12)):
+            encounter.add(name, initiative, 0, 1)
+        self.assertEqual(encounter.advance().name, "Orc")
+
+        encounter.add("Wolf", 25, 0, 1)
+        self.assertEqual(encounter.current.name, "Orc")
+        self.assertEqual(names(encounter, 4), ["Orc", "Goblin", "Wolf", "Gandalf"])
+
+    def test_round_trip_keeps_order_and_turn(self):
+        encounter = Encounter()
+        for name, initiative in (("Goblin", 5), ("Gandalf", 20), ("Orc", 12)):
+            encounter.add(name, initiative, 0, 1)
+        encounter.advance()
+
+        restored = Encounter.from_dict(encounter.to_dict())
+        self.assertTrue(restored.started)
+        self.assertEqual(names(restored, 3), names(encounter, 3))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Tuple
+
+from bot.utils.dice_parser import DiceParser
+from bot.utils.dice_source import SeededDice
+from bot.utils.roll_audit import ENTRY_TRAILER, RollAudit
+
+CHANNEL = 10
+
+class RollAuditTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name)
+        self.log = self.data_dir / f"{CHANNEL}.audit"
+        self.parser = DiceParser()
+
+    def total(self, expression: str, dice: SeededDice) -> int:
+        return self.parser.format_result(self.parser.parse_expression(expression, source=dice))['total']
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def roll(self, audit: RollAudit, expression: str, user_id: int = 7) -> Tuple[int, int]:
+        await audit.open(CHANNEL)
+        roll_id, dice = audit.draw(CHANNEL)
+        total = self.total(expression, dice)
+        audit.record(CHANNEL, roll_id, user_id, 'roll', expression, total)
+        return roll_id, total
+
+    async def test_verified_rolls_replay_from_their_seed(self):
+        audit = RollAudit(self.data_dir)
+        rolls = [await self.roll(audit, expression) for expression in ("1d20+5", "4d6", "2d8-1")]
+
+        for roll_id, total in rolls:
+            verified = await audit.verify(CHANNEL, roll_id)
+            self.assertIsNone(verified.broken_at)
+            entry = verified.entry
+            self.assertEqual((entry.roll_id, entry.user_id, entry.total), (roll_id, 7, total))
+            self.assertEqual(self.total(entry.expression, SeededDice(entry.seed, entry.roll_id)), total)
+
+        missing = await audit.verify(CHANNEL, 99)
+        self.assertIsNone(missing.entry)
+        self.assertIsNone(missing.broken_at)
+
+    async def test_tampering_breaks_the_chain(self):
+        audit = RollAudit(self.data_dir)
+        first, _ = await self.roll(audit, "1d20")
+        second, _ = await self.roll(audit, "1d20")
+        await audit.flush()
+
+        # Rewrite the second roll's total, the 8 bytes before its payload ("1d20") and trailer
+        data = bytearray(self.log.read_bytes())
+        total_at = len(data) - ENTRY_TRAILER.size - len("1d20") - 10
+        data[total_at:total_at + 8] = (100).to_bytes(8, 'little', signed=True)
+        self.log.write_bytes(bytes(data))
+
+        self.assertIsNotNone(audit.verify_chain(CHANNEL, first).entry)
+        self.assertEqual(audit.verify_chain(CHANNEL, second).broken_at, second)
+
+    async def test_reopening_truncates_a_torn_entry(self):
+        audit = RollAudit(self.data_dir)
+        await self.roll(audit, "1d20")
+        await audit.flush()
+        whole = self.log.stat().st_size
+        with open(self.log, 'ab') as fp:
+            fp.write(b"\x40\x00\x00\x00\x01torn")
+
+        # The next run picks up after the last whole entry and chains onto it
+        restarted = RollAudit(self.data_dir)
+        with self.assertLogs('bot.utils.roll_audit', 'WARNING'):
+            roll_id, total = await self.roll(restarted, "1d6")
+        self.assertEqual(roll_id, 2)
+        await restarted.flush()
+        self.assertGreater(self.log.stat().st_size, whole)
+
+        verified = restarted.verify_chain(CHANNEL, roll_id)
+        self.assertIsNone(verified.broken_at)
+        self.assertEqual(verified.entry.total, total)
+        self.assertEqual(verified.entries_checked, 4)
+
+if __name__ == "__main__":
+    unittest.main()
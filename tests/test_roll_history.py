@@ -0,0 +1,90 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from bot.utils.roll_history import RECORD_HEADER, RollHistory, decode_records, encode_record
+
+def write_rolls(history: RollHistory, count: int, user_id: int = 7) -> None:
+    for i in range(count):
+        history.record(1, 10, user_id, 'roll', [(20, [i % 20 + 1]), (6, [1, 6])], modifier=2, total=i + 9)
+
+class RecordFormatTest(unittest.TestCase):
+    def test_round_trip(self):
+        groups = [(20, [20]), (6, [1, 2, 6]), (1000, [999]), (100000, [70000])]
+        data = encode_record(1.5, 10, 2**40, 'advantage', groups, -3, 70000)
+
+        (end, record), = decode_records(data)
+        self.assertEqual(end, len(data))
+        self.assertEqual(record.timestamp, 1.5)
+        self.assertEqual((record.channel_id, record.user_id, record.kind), (10, 2**40, 'advantage'))
+        self.assertEqual((record.modifier, record.total), (-3, 70000))
+        self.assertEqual(record.groups, [(sides, list(faces)) for sides, faces in groups])
+
+    def test_stops_before_a_truncated_record(self):
+        first = encode_record(1.0, 10, 7, 'roll', [(20, [4])], 0, 4)
+        second = encode_record(2.0, 10, 7, 'roll', [(20, [5]), (8, [3])], 0, 8)
+        for cut in (1, RECORD_HEADER.size, len(second) - 1):
+            decoded = list(decode_records(first + second[:cut]))
+            self.assertEqual([end for end, _ in decoded], [len(first)])
+
+class RollHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_replays_only_past_the_snapshot(self):
+        history = RollHistory(self.data_dir)
+        write_rolls(history, 5)
+        history.flush(snapshot=True)
+        write_rolls(history, 3)
+        history.flush()
+
+        reloaded = RollHistory(self.data_dir)
+        self.assertEqual(reloaded.load(), 3)
+        self.assertEqual(reloaded.stats(1, 7).rolls, 8)
+        self.assertEqual(reloaded.stats(1).dice, 24)
+        self.assertEqual(reloaded.stats(1).count(6, 6), 8)
+
+    def test_load_truncates_a_torn_record(self):
+        history = RollHistory(self.data_dir)
+        write_rolls(history, 4)
+        history.flush()
+        log = self.data_dir / "1.rolls"
+        whole = log.stat().st_size
+        with open(log, 'ab') as fp:
+            fp.write(encode_record(9.0, 10, 7, 'roll', [(20, [1])], 0, 1)[:-1])
+
+        reloaded = RollHistory(self.data_dir)
+        with self.assertLogs('bot.utils.roll_history', 'WARNING'):
+            self.assertEqual(reloaded.load(), 0)
+        self.assertEqual(reloaded.stats(1).rolls, 4)
+        self.assertEqual(log.stat().st_size, whole)
+
+        # New records line up after the last whole one
+        write_rolls(reloaded, 1)
+        reloaded.flush()
+        self.assertEqual(len(list(reloaded.read(1))), 5)
+
+    def test_failed_write_is_requeued_in_order(self):
+        history = RollHistory(self.data_dir)
+        (self.data_dir / "1.rolls").mkdir()
+        write_rolls(history, 2)
+        with self.assertLogs('bot.utils.roll_history', 'ERROR'):
+            history.flush()
+        self.assertTrue(history.pending())
+
+        (self.data_dir / "1.rolls").rmdir()
+        write_rolls(history, 1, user_id=8)
+        history.flush(snapshot=True)
+        self.assertEqual(history.pending(), 0)
+        self.assertEqual([record.user_id for record in history.read(1)], [7, 7, 8])
+
+        reloaded = RollHistory(self.data_dir)
+        self.assertEqual(reloaded.load(), 0)
+        self.assertEqual(reloaded.stats(1).rolls, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from bot.utils.stat_systems import STAT_SYSTEMS, load_stat_systems
+
+HOMEBREW = {"homebrew": {"name": "Homebrew", "method": "3d6", "rating_thresholds": [72, 66, 60, 54]}}
+
+class LoadStatSystemsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "systems.json"
+
+    def tearDown(self):
+        STAT_SYSTEMS.pop("homebrew", None)
+        self.tmp.cleanup()
+
+    def load(self, definitions) -> int:
+        self.path.write_text(json.dumps(definitions), encoding='utf-8')
+        return load_stat_systems(self.path)
+
+    def test_registers_valid_systems(self):
+        self.assertEqual(self.load(HOMEBREW), 1)
+        self.assertEqual(STAT_SYSTEMS["homebrew"].name, "Homebrew")
+
+    def test_top_level_must_be_an_object(self):
+        with self.assertLogs('bot.utils.stat_systems', 'ERROR'):
+            self.assertEqual(self.load(["homebrew"]), 0)
+            self.assertEqual(self.load("homebrew"), 0)
+
+    def test_skips_entries_that_are_not_objects(self):
+        with self.assertLogs('bot.utils.stat_systems', 'ERROR') as logs:
+            self.assertEqual(self.load(dict(HOMEBREW, foo=3, bar=[1, 2])), 1)
+        self.assertEqual(len(logs.output), 2)
+        self.assertNotIn("foo", STAT_SYSTEMS)
+
+if __name__ == "__main__":
+    unittest.main()